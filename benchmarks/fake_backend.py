@@ -0,0 +1,497 @@
+"""
+本地假Ad Manager后端 - 供基准测试在进程内替代真实API
+
+同时模拟新版 google-ads-admanager 的 *ServiceClient 类和旧版 googleads 的
+GetService 服务，数据集大小和每次调用的延迟可以配置。只实现服务器实际
+用到的方法和过滤条件（=、IN、LIKE、>、>=、<= 和 OrderBy，以及新版的
+parent_id / order_id、filter 中的 = / OR / 比较和 order_by）。
+"""
+
+import base64
+import csv
+import gzip
+import io
+import itertools
+import random
+import re
+import sys
+import threading
+import time
+import types
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+SDK_MODULE = "google.ads.admanager"
+LAST_MODIFIED = "2024-01-01T00:00:00"
+
+# 实体类型：(旧版服务, 旧版列表方法, 旧版获取方法, 旧版创建方法, 新版客户端, 新版列表方法, 新版字段, 新版ID字段)
+ENTITY_SERVICES = {
+    "ad_units": ("InventoryService", "getAdUnitsByStatement", "getAdUnit", "createAdUnits",
+                 "AdUnitServiceClient", "list_ad_units", "ad_units", "ad_unit_id"),
+    "orders": ("OrderService", "getOrdersByStatement", "getOrder", "createOrders",
+               "OrderServiceClient", "list_orders", "orders", "order_id"),
+    "line_items": ("LineItemService", "getLineItemsByStatement", "getLineItem", "createLineItems",
+                   "LineItemServiceClient", "list_line_items", "line_items", "line_item_id"),
+    "creatives": ("CreativeService", "getCreativesByStatement", "getCreative", None,
+                  "CreativeServiceClient", "list_creatives", "creatives", "creative_id"),
+}
+
+# 新版SDK请求参数 → 旧版字段名
+SDK_PARENT_FILTERS = {"parent_id": "parentId", "order_id": "orderId"}
+
+# 旧版 PQL 表 → 实体类型
+PQL_TABLES = {"Ad_Unit": "ad_units", "Line_Item": "line_items"}
+
+# 按序号循环分配的状态，使过滤条件有可区分的结果
+ORDER_STATUSES = ("APPROVED", "PAUSED", "DRAFT")
+LINE_ITEM_STATUSES = ("DELIVERING", "READY", "PAUSED")
+
+
+def _snake_case(name: str) -> str:
+    return "".join("_" + c.lower() if c.isupper() else c for c in name)
+
+
+class FakeAdManager:
+    """内存中的Ad Manager网络：广告单元树、订单、行项目、创意和报告"""
+
+    def __init__(self, dataset_size: int = 1000, latency: float = 0.02,
+                 jitter: float = 0.2, seed: int = 7, network_code: str = "12345"):
+        self.dataset_size = max(dataset_size, 1)
+        self.latency = latency
+        self.jitter = jitter
+        self.network_code = network_code
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(10_000_000)
+        self.calls = 0
+        self.entities: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_id: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._report_jobs: Dict[int, Tuple[List[str], List[str]]] = {}
+        self._generate()
+
+    # ----- 数据 -----
+
+    def _generate(self):
+        rng = self._random
+        n = self.dataset_size
+        ad_units = [{"id": 1000, "name": "root", "parentId": None}]
+        for i in range(1, n):
+            ad_units.append({"id": 1000 + i, "name": f"ad_unit_{i}",
+                             "parentId": 1000 + rng.randrange(i)})
+        for unit in ad_units:
+            unit.update(description="", targetWindow="BLANK", status="ACTIVE")
+
+        orders = [{"id": 2_000_000 + i, "name": f"order_{i}", "advertiserId": 300 + rng.randrange(20),
+                   "status": ORDER_STATUSES[i % 3], "currencyCode": "USD",
+                   "startDateTime": f"2024-{i % 12 + 1:02d}-01T00:00:00", "endDateTime": "2024-12-31T23:59:59"}
+                  for i in range(max(n // 5, 1))]
+        line_items = [{"id": 3_000_000 + i, "name": f"line_item_{i}",
+                       "orderId": orders[rng.randrange(len(orders))]["id"],
+                       "status": LINE_ITEM_STATUSES[i % 3], "lineItemType": "STANDARD", "costType": "CPM",
+                       "costPerUnit": {"currencyCode": "USD", "microAmount": 1_000_000},
+                       "startDateTime": f"2024-{i % 12 + 1:02d}-01T00:00:00",
+                       "endDateTime": f"2024-{i % 12 + 1:02d}-28T23:59:59"}
+                      for i in range(n)]
+        creatives = [{"id": 4_000_000 + i, "name": f"creative_{i}", "advertiserId": 300 + rng.randrange(20),
+                      "size": {"width": 300, "height": 250}, "isNativeEligible": False}
+                     for i in range(max(n // 2, 1))]
+        for kind, records in (("ad_units", ad_units), ("orders", orders),
+                              ("line_items", line_items), ("creatives", creatives)):
+            for record in records:
+                record["lastModifiedDateTime"] = LAST_MODIFIED
+            self.entities[kind] = records
+            self._by_id[kind] = {str(r["id"]): r for r in records}
+
+    def sample_ids(self, kind: str, count: int) -> List[str]:
+        records = self.entities[kind]
+        return [str(self._random.choice(records)["id"]) for _ in range(count)]
+
+    # ----- 调用模拟 -----
+
+    def call(self):
+        """模拟一次网络往返"""
+        with self._lock:
+            self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def query(self, kind: str, conditions: List[Tuple[str, str, Any]],
+              offset: int, limit: int, order: Optional[Tuple[str, bool]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        with self._lock:
+            records = [r for r in self.entities[kind] if all(_matches(r, c) for c in conditions)]
+        if order:
+            field, ascending = order
+            records.sort(key=lambda r: (r.get(field) is None, r.get(field) or 0, r["id"]), reverse=not ascending)
+        return records[offset:offset + limit], len(records)
+
+    def get(self, kind: str, entity_id) -> Dict[str, Any]:
+        record = self._by_id[kind].get(str(entity_id))
+        if record is None:
+            raise ValueError(f"NotFoundError.NOT_FOUND @ {kind} {entity_id}")
+        return dict(record)
+
+    def create(self, kind: str, specs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        created = []
+        with self._lock:
+            for spec in specs:
+                if not spec.get("name"):
+                    raise ValueError("RequiredError.REQUIRED @ name")
+                record = dict(spec, id=next(self._ids), status="ACTIVE",
+                              lastModifiedDateTime=LAST_MODIFIED)
+                created.append(record)
+            for record in created:
+                self.entities[kind].append(record)
+                self._by_id[kind][str(record["id"])] = record
+        return [dict(r) for r in created]
+
+    def network(self) -> Dict[str, Any]:
+        return {"networkCode": self.network_code, "displayName": "Benchmark Network",
+                "networkCodeForTest": False, "timeZone": "America/New_York"}
+
+    def run_report(self, dimensions: List[str], columns: List[str],
+                   start_date: Optional[Dict[str, int]] = None,
+                   end_date: Optional[Dict[str, int]] = None) -> int:
+        header = [f"Dimension.{d}" for d in dimensions] + [f"Column.{c}" for c in columns]
+        days = [date.today().isoformat()]
+        if start_date and end_date:
+            start, end = date(**start_date), date(**end_date)
+            days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        with self._lock:
+            job_id = next(self._ids)
+            self._report_jobs[job_id] = (header, days)
+        return job_id
+
+    def report_url(self, job_id: int) -> str:
+        """以 data: URL 返回gzip压缩的CSV，urllib 可以直接“下载”"""
+        header, days = self._report_jobs[int(job_id)]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        # 有 DATE 维度时每天一组行，否则只有一组
+        for day in (days if "Dimension.DATE" in header else [None]):
+            for i in range(self.dataset_size):
+                writer.writerow([day if name == "Dimension.DATE" else
+                                 f"value_{i}" if name.startswith("Dimension.") else (i * 7) % 1000
+                                 for name in header])
+        data = gzip.compress(buffer.getvalue().encode("utf-8"))
+        return "data:application/octet-stream;base64," + base64.b64encode(data).decode("ascii")
+
+    # ----- 安装 -----
+
+    def install(self, backend: str):
+        """让服务器使用指定的假SDK：sdk(新版) 或 legacy(旧版，新版导入失败)"""
+        if backend == "sdk":
+            sys.modules[SDK_MODULE] = self.sdk_module()
+        elif backend == "legacy":
+            # sys.modules 中为 None 时 import 抛出 ImportError，服务器回退到旧版
+            sys.modules[SDK_MODULE] = None
+        else:
+            raise ValueError(f"不支持的后端: {backend}")
+
+    def legacy_client(self) -> "FakeLegacyClient":
+        return FakeLegacyClient(self)
+
+    def sdk_module(self) -> types.ModuleType:
+        module = types.ModuleType(SDK_MODULE)
+        backend = self
+        for kind, spec in ENTITY_SERVICES.items():
+            setattr(module, spec[4], _sdk_client_class(backend, spec[4], {spec[5]: (kind, spec[6], spec[7])}))
+        module.NetworkServiceClient = _sdk_client_class(backend, "NetworkServiceClient", {})
+        module.ReportServiceClient = _sdk_client_class(backend, "ReportServiceClient", {})
+        return module
+
+
+def _matches(record: Dict[str, Any], condition: Tuple[str, str, Any]) -> bool:
+    field, op, value = condition
+    actual = record.get(field)
+    if op == "=":
+        return str(actual) == str(value)
+    if op == "in":
+        return str(actual) in value
+    if op == "like":
+        return value.strip("%").lower() in str(actual or "").lower()
+    if op == ">":
+        return str(actual or "") > str(value)
+    if op == ">=":
+        return str(actual or "") >= str(value)
+    if op == "<=":
+        return actual is not None and str(actual) <= str(value)
+    return True
+
+
+# ----- 旧版 googleads -----
+
+class FakeStatementBuilder:
+    """googleads StatementBuilder 的最小实现"""
+
+    def __init__(self):
+        self.select = None
+        self.from_ = None
+        self.where = None
+        self.order = None
+        self.values: Dict[str, Any] = {}
+        self.limit = 500
+        self.offset = 0
+
+    def Select(self, columns: str):
+        self.select = columns
+        return self
+
+    def From(self, table: str):
+        self.from_ = table
+        return self
+
+    def Where(self, clause: str):
+        self.where = clause
+        return self
+
+    def WithBindVariable(self, key: str, value):
+        self.values[key] = value
+        return self
+
+    def OrderBy(self, field: str, ascending: bool = True):
+        self.order = (field, ascending)
+        return self
+
+    def ToStatement(self) -> Dict[str, Any]:
+        return {"select": self.select, "from": self.from_, "where": self.where, "order": self.order,
+                "values": dict(self.values), "limit": self.limit, "offset": self.offset}
+
+
+def _parse_where(where: Optional[str], values: Dict[str, Any]) -> List[Tuple[str, str, Any]]:
+    conditions = []
+    for clause in re.split(r"\s+AND\s+", where or "", flags=re.IGNORECASE):
+        clause = clause.strip()
+        if not clause:
+            continue
+        match = re.match(r"(\w+)\s+IN\s+\(([^)]*)\)", clause, re.IGNORECASE)
+        if match:
+            items = [v.strip() for v in match.group(2).split(",")]
+            conditions.append((match.group(1), "in",
+                               {str(values.get(v[1:])) if v.startswith(":") else v for v in items}))
+            continue
+        match = re.match(r"(\w+)\s+(LIKE|>=|<=|=|>)\s*(:?)(\S+)", clause, re.IGNORECASE)
+        if match:
+            field, op, bind, value = match.groups()
+            conditions.append((field, op.lower(), values.get(value) if bind else value.strip("'\"")))
+    return conditions
+
+
+class FakeLegacyService:
+    def __init__(self, backend: FakeAdManager, name: str):
+        self.backend = backend
+        self.name = name
+        self.methods = {}
+        for kind, spec in ENTITY_SERVICES.items():
+            if spec[0] == name:
+                self.methods[spec[1]] = ("list", kind)
+                self.methods[spec[2]] = ("get", kind)
+                if spec[3]:
+                    self.methods[spec[3]] = ("create", kind)
+
+    def __getattr__(self, attr):
+        if attr not in self.methods:
+            raise AttributeError(f"{self.name} 没有方法 {attr}")
+        operation, kind = self.methods[attr]
+
+        def method(arg):
+            self.backend.call()
+            if operation == "list":
+                conditions = _parse_where(arg["where"], arg["values"])
+                results, total = self.backend.query(kind, conditions, arg["offset"], arg["limit"],
+                                                    arg.get("order"))
+                return {"results": [dict(r) for r in results], "totalResultSetSize": total}
+            if operation == "get":
+                return self.backend.get(kind, arg)
+            return self.backend.create(kind, arg)
+
+        return method
+
+    # PublisherQueryLanguageService
+    def select(self, statement):
+        self.backend.call()
+        kind = PQL_TABLES[statement["from"]]
+        columns = [c.strip() for c in statement["select"].split(",")]
+        conditions = [(field[0].lower() + field[1:], op, value)
+                      for field, op, value in _parse_where(statement["where"], statement["values"])]
+        order = statement.get("order")
+        if order:
+            order = (order[0][0].lower() + order[0][1:], order[1])
+        results, _ = self.backend.query(kind, conditions, statement["offset"], statement["limit"], order)
+
+        def value(v):
+            if isinstance(v, int):
+                return {"xsi_type": "NumberValue", "value": str(v)}
+            return {"xsi_type": "TextValue", "value": v}
+
+        return {
+            "columnTypes": [{"labelName": c} for c in columns],
+            "rows": [{"values": [value(r.get(c[0].lower() + c[1:])) for c in columns]} for r in results]
+        }
+
+    # NetworkService
+    def getCurrentNetwork(self):
+        self.backend.call()
+        return self.backend.network()
+
+    def getAllNetworks(self):
+        self.backend.call()
+        return [self.backend.network()]
+
+    # ReportService
+    def runReportJob(self, report_job):
+        self.backend.call()
+        query = report_job["reportQuery"]
+        return {"id": self.backend.run_report(query["dimensions"], query["columns"],
+                                              query.get("startDate"), query.get("endDate")),
+                "reportJobStatus": "IN_PROGRESS"}
+
+    def getReportJobStatus(self, job_id):
+        self.backend.call()
+        return "COMPLETED"
+
+    def getReportDownloadURL(self, job_id, export_format):
+        self.backend.call()
+        return self.backend.report_url(job_id)
+
+
+class FakeLegacyClient:
+    """googleads AdManagerClient 的最小实现"""
+
+    def __init__(self, backend: FakeAdManager):
+        self.backend = backend
+        self._services: Dict[str, FakeLegacyService] = {}
+
+    def GetService(self, name: str, version: str = None) -> FakeLegacyService:
+        return self._services.setdefault(name, FakeLegacyService(self.backend, name))
+
+    def StatementBuilder(self) -> FakeStatementBuilder:
+        return FakeStatementBuilder()
+
+
+# ----- 新版 google-ads-admanager -----
+
+def _sdk_object(record: Dict[str, Any]) -> types.SimpleNamespace:
+    return types.SimpleNamespace(**{_snake_case(k): v for k, v in record.items()})
+
+
+def _camel_case(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+def _sdk_field(name: str, id_field: str) -> str:
+    if name == id_field:
+        return "id"
+    if name == "update_time":
+        return "lastModifiedDateTime"
+    return _camel_case(name)
+
+
+def _parse_sdk_filter(text: Optional[str], id_field: str) -> List[Tuple[str, str, Any]]:
+    """AND 连接的子句，子句为比较或同一字段 = 的 OR"""
+    conditions = []
+    term_pattern = r'(\w+)\s*(>=|<=|=|>)\s*("(?:[^"\\]|\\.)*"|\S+)'
+    for clause in re.split(r"\s+AND\s+", text or ""):
+        terms = re.findall(term_pattern, clause.strip().strip("()"))
+        if not terms:
+            continue
+        parsed = []
+        for name, op, value in terms:
+            field = _sdk_field(name, id_field)
+            if value.startswith('"'):
+                value = re.sub(r"\\(.)", r"\1", value[1:-1])
+            if field.endswith("DateTime"):
+                value = value.rstrip("Z")
+            parsed.append((field, op, value))
+        if len(parsed) > 1:
+            conditions.append((parsed[0][0], "in", {value for _, _, value in parsed}))
+        elif parsed[0][1] == "=" and parsed[0][2].startswith("*") and parsed[0][2].endswith("*"):
+            conditions.append((parsed[0][0], "like", parsed[0][2].strip("*")))
+        else:
+            conditions.append(parsed[0])
+    return conditions
+
+
+def _parse_sdk_order(text: Optional[str], id_field: str) -> Optional[Tuple[str, bool]]:
+    if not text:
+        return None
+    parts = text.split()
+    return _sdk_field(parts[0], id_field), not (len(parts) > 1 and parts[1].lower() == "desc")
+
+
+def _sdk_client_class(backend: FakeAdManager, class_name: str,
+                      list_methods: Dict[str, Tuple[str, str, str]]):
+    def list_method(kind, field, id_field):
+        def method(self, request=None, metadata=None):
+            backend.call()
+            request = dict(request or {})
+            # x-goog-fieldmask：只返回掩码中的字段
+            mask = dict(metadata or {}).get("x-goog-fieldmask")
+            keep = None
+            if mask:
+                keep = {path.split(".", 1)[1] for path in mask.split(",") if path.startswith(field + ".")}
+            conditions = _parse_sdk_filter(request.get("filter"), id_field)
+            for key, legacy_field in SDK_PARENT_FILTERS.items():
+                if request.get(key):
+                    conditions.append((legacy_field, "=", request[key]))
+            offset = int(request.get("page_token") or 0)
+            size = int(request.get("page_size") or 50)
+            results, total = backend.query(kind, conditions, offset, size,
+                                           _parse_sdk_order(request.get("order_by"), id_field))
+            next_token = str(offset + size) if offset + size < total else ""
+            items = [_sdk_object(r) for r in results]
+            if keep is not None:
+                items = [types.SimpleNamespace(**{k: v for k, v in vars(item).items() if k in keep})
+                         for item in items]
+            return types.SimpleNamespace(**{field: items, "next_page_token": next_token})
+        return method
+
+    def get_network(self, request=None):
+        backend.call()
+        return _sdk_object(backend.network())
+
+    def list_networks(self, request=None):
+        backend.call()
+        return types.SimpleNamespace(networks=[_sdk_object(backend.network())])
+
+    def run_report_job(self, report_job):
+        backend.call()
+        query = report_job["report_query"]
+        return types.SimpleNamespace(id=backend.run_report(query["dimensions"], query["columns"],
+                                                           query.get("start_date"), query.get("end_date")),
+                                     status="IN_PROGRESS")
+
+    def get_report_job_status(self, request=None):
+        backend.call()
+        return "COMPLETED"
+
+    def get_report_download_url(self, request=None):
+        backend.call()
+        return backend.report_url(request["report_job_id"])
+
+    namespace = {"__init__": lambda self, credentials=None: None}
+    if class_name == "NetworkServiceClient":
+        namespace.update(get_network=get_network, list_networks=list_networks)
+    elif class_name == "ReportServiceClient":
+        namespace.update(run_report_job=run_report_job, get_report_job_status=get_report_job_status,
+                         get_report_download_url=get_report_download_url)
+    for method_name, (kind, field, id_field) in list_methods.items():
+        namespace[method_name] = list_method(kind, field, id_field)
+    return type(class_name, (), namespace)
+
+
+class FakeCredentialManager:
+    """不访问Google认证的凭据管理器"""
+
+    identity = "benchmark@example.com"
+    configured_source = "benchmark"
+
+    def get_credentials(self):
+        return None, None
+
+    def invalidate(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"loaded": True, "source": "benchmark"}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+启动基准测试 - 测量从启动进程到 initialize 请求得到响应的时间
+
+MCP客户端频繁启动本服务并对握手设置超时，这里按客户端的方式启动
+`python -m mcp_admanager_ultimate`，发送 initialize 请求并计时。
+
+用法: python benchmarks/startup.py [--runs 10] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INITIALIZE_REQUEST = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2024-11-05",
+        "capabilities": {},
+        "clientInfo": {"name": "startup-benchmark", "version": "1.0.0"}
+    }
+}
+
+
+def measure_once() -> float:
+    """启动一次服务进程，返回 initialize 响应耗时（毫秒）"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "mcp_admanager_ultimate"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env,
+        cwd=ROOT
+    )
+    try:
+        process.stdin.write((json.dumps(INITIALIZE_REQUEST) + "\n").encode("utf-8"))
+        process.stdin.flush()
+        line = process.stdout.readline()
+        elapsed = (time.perf_counter() - started) * 1000
+        response = json.loads(line)
+        if response.get("id") != INITIALIZE_REQUEST["id"] or "result" not in response:
+            raise RuntimeError(f"意外的响应: {line!r}")
+        return elapsed
+    finally:
+        process.stdin.close()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量服务启动到 initialize 响应的时间")
+    parser.add_argument("--runs", type=int, default=10, help="重复次数（默认10）")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    result = {
+        "benchmark": "startup_to_initialize",
+        "runs": args.runs,
+        "min_ms": round(min(samples), 1),
+        "median_ms": round(statistics.median(samples), 1),
+        "max_ms": round(max(samples), 1)
+    }
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"startup → initialize ({args.runs} 次): "
+              f"最小 {result['min_ms']} ms, 中位数 {result['median_ms']} ms, 最大 {result['max_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+基准测试套件 - 用本地假后端测量各工具的延迟、吞吐量和内存
+
+在进程内启动服务器，通过管道连接它的 stdin/stdout，由 main() 使用的同一个
+JSON-RPC 分发循环处理请求；Ad Manager API 由 fake_backend 模拟，可配置数据集
+大小和每次调用的延迟。按混合比例重放 list、get、create 和 report 请求，按
+工具和操作报告 p50/p95/p99 延迟、每秒请求数和峰值RSS。
+
+用法: python benchmarks/suite.py [--backend legacy|sdk] [--requests 500]
+                                 [--concurrency 4] [--dataset-size 1000]
+                                 [--latency-ms 20] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_backend import FakeAdManager, FakeCredentialManager  # noqa: E402
+
+
+def _mix(backend: FakeAdManager, sdk: bool) -> List[Tuple[str, str, int, Callable[[], Dict[str, Any]]]]:
+    """(工具, 操作, 权重, 参数生成函数)
+
+    新版SDK路径只实现了 list，get 和 create 在 sdk 后端中用 get_many 代替或省略。
+    """
+    counter = iter(range(10 ** 9))
+    mix = [
+        ("manage_inventory", "list", 15, lambda: {"action": "list", "max_items": 100}),
+        ("manage_orders", "list", 10, lambda: {"action": "list", "max_items": 100}),
+        ("manage_line_items", "list", 10,
+         lambda: {"action": "list", "order_id": backend.sample_ids("orders", 1)[0]}),
+        ("manage_line_items", "get_many", 8,
+         lambda: {"action": "get_many", "ids": backend.sample_ids("line_items", 50)}),
+        ("generate_report", "report", 5,
+         lambda: {"report_type": "inventory", "use_cache": False, "preview_rows": 5}),
+        ("manage_networks", "get_current", 4, lambda: {"action": "get_current"}),
+    ]
+    if sdk:
+        mix.append(("manage_inventory", "get_many", 20,
+                    lambda: {"action": "get_many", "ids": backend.sample_ids("ad_units", 1)}))
+    else:
+        mix += [
+            ("manage_inventory", "get", 20,
+             lambda: {"action": "get", "ad_unit_id": backend.sample_ids("ad_units", 1)[0]}),
+            ("manage_orders", "get", 10,
+             lambda: {"action": "get", "order_id": backend.sample_ids("orders", 1)[0]}),
+            ("manage_inventory", "create", 5,
+             lambda: {"action": "create", "ad_unit_name": f"bench_unit_{next(counter)}",
+                      "parent_id": "1000"}),
+            ("manage_orders", "bulk_create", 3,
+             lambda: {"action": "bulk_create", "items": [
+                 {"name": f"bench_order_{next(counter)}", "advertiserId": "300", "traffickerId": "1"}
+                 for _ in range(20)]}),
+        ]
+    return mix
+
+
+def current_rss() -> int:
+    """当前进程的常驻内存（字节）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位，Linux 以KB为单位
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class JsonRpcHarness:
+    """通过管道驱动分发器的 JSON-RPC 客户端"""
+
+    def __init__(self, server):
+        from mcp_admanager_ultimate.dispatcher import RequestDispatcher
+
+        request_read, self._request_write = os.pipe()
+        self._response_read, response_write = os.pipe()
+        self._writer = os.fdopen(self._request_write, "w", encoding="utf-8")
+        self._reader = os.fdopen(self._response_read, "r", encoding="utf-8")
+        self.dispatcher = RequestDispatcher(
+            server,
+            stdin=os.fdopen(request_read, "r", encoding="utf-8"),
+            stdout=os.fdopen(response_write, "w", encoding="utf-8")
+        )
+        self._ids = iter(range(1, 10 ** 9))
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[threading.Event, list]] = {}
+        self._server_thread = threading.Thread(target=self._serve, daemon=True)
+        self._reader_thread = threading.Thread(target=self._read, daemon=True)
+        self._server_thread.start()
+        self._reader_thread.start()
+
+    def _serve(self):
+        try:
+            self.dispatcher.serve()
+        finally:
+            self.dispatcher.stdout.close()
+
+    def _read(self):
+        for line in self._reader:
+            message = json.loads(line)
+            with self._lock:
+                event, box = self._pending.pop(message.get("id"), (None, None))
+            if event is not None:
+                box.append(message)
+                event.set()
+
+    def request(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        event, box = threading.Event(), []
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = (event, box)
+            self._writer.write(json.dumps({"jsonrpc": "2.0", "id": request_id,
+                                           "method": method, "params": params}) + "\n")
+            self._writer.flush()
+        event.wait()
+        return box[0]
+
+    def close(self):
+        self._writer.close()
+        self._server_thread.join()
+        self._reader_thread.join()
+
+
+def is_error(response: Dict[str, Any]) -> bool:
+    if "error" in response:
+        return True
+    result = response.get("result") or {}
+    if "error" in result:
+        return True
+    try:
+        payload = json.loads(result["content"][0]["text"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return True
+    return payload.get("success") is False
+
+
+def build_server(backend: FakeAdManager, backend_name: str):
+    from mcp_admanager_ultimate.clients import ServiceClientRegistry
+    from mcp_admanager_ultimate.server import MCPAdManagerEnhancedUltimateServer
+
+    backend.install(backend_name)
+    server = MCPAdManagerEnhancedUltimateServer()
+    server.credential_manager = FakeCredentialManager()
+    server.clients = ServiceClientRegistry(
+        server.credential_manager, backend.legacy_client,
+        scheduler=server.scheduler, network_code=server.network_code
+    )
+    return server
+
+
+def run(args) -> Dict[str, Any]:
+    backend = FakeAdManager(dataset_size=args.dataset_size, latency=args.latency_ms / 1000,
+                            seed=args.seed)
+    server = build_server(backend, args.backend)
+    harness = JsonRpcHarness(server)
+    harness.request("initialize", {"protocolVersion": "2024-11-05", "capabilities": {},
+                                   "clientInfo": {"name": "benchmark-suite", "version": "1.0.0"}})
+
+    mix = _mix(backend, args.backend == "sdk")
+    weights = [entry[2] for entry in mix]
+    rng = random.Random(args.seed)
+    plan = [rng.choices(mix, weights)[0] for _ in range(args.requests)]
+    plan_lock = threading.Lock()
+    samples: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    samples_lock = threading.Lock()
+
+    def worker():
+        while True:
+            with plan_lock:
+                if not plan:
+                    return
+                tool, action, _, make_args = plan.pop()
+                arguments = make_args()
+            started = time.perf_counter()
+            response = harness.request("tools/call", {"name": tool, "arguments": arguments})
+            elapsed = (time.perf_counter() - started) * 1000
+            rss = current_rss()
+            with samples_lock:
+                entry = samples.setdefault((tool, action), {"latencies": [], "errors": 0, "peak_rss": 0})
+                entry["latencies"].append(elapsed)
+                entry["errors"] += is_error(response)
+                entry["peak_rss"] = max(entry["peak_rss"], rss)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wall = time.perf_counter() - started
+    harness.close()
+    server.entity_sync.stop_background()
+
+    def summarize(latencies: List[float], errors: int, peak_rss: int) -> Dict[str, Any]:
+        return {
+            "count": len(latencies),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "rps": round(len(latencies) / wall, 2),
+            "peak_rss_mb": round(peak_rss / (1024 * 1024), 1)
+        }
+
+    tools = {f"{tool}:{action}": summarize(e["latencies"], e["errors"], e["peak_rss"])
+             for (tool, action), e in sorted(samples.items())}
+    everything = [x for e in samples.values() for x in e["latencies"]]
+    return {
+        "benchmark": "tool_mix",
+        "backend": args.backend,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "dataset_size": args.dataset_size,
+        "latency_ms": args.latency_ms,
+        "wall_seconds": round(wall, 2),
+        "api_calls": backend.calls,
+        "overall": summarize(everything, sum(e["errors"] for e in samples.values()),
+                             max(e["peak_rss"] for e in samples.values())),
+        "tools": tools
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用本地假后端测量各工具的延迟和吞吐量")
+    parser.add_argument("--backend", choices=["legacy", "sdk"], default="legacy",
+                        help="模拟的SDK：legacy(googleads，默认) 或 sdk(google-ads-admanager)")
+    parser.add_argument("--requests", type=int, default=500, help="请求总数（默认500）")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的请求数（默认4）")
+    parser.add_argument("--dataset-size", type=int, default=1000, help="广告单元和行项目数量（默认1000）")
+    parser.add_argument("--latency-ms", type=float, default=20, help="每次API调用的模拟延迟（默认20ms）")
+    parser.add_argument("--rate-limit", type=int, default=1000,
+                        help="每秒API调用上限（默认1000，实际上不限流；传8模拟生产配置）")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子（默认7）")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    parser.add_argument("--verbose", action="store_true", help="保留服务器的stderr日志")
+    args = parser.parse_args()
+
+    # 服务器在导入时读取这些配置，必须在导入前设置
+    cache_dir = tempfile.mkdtemp(prefix="mcp-admanager-bench-")
+    os.environ["GOOGLE_ADMANAGER_CACHE_DIR"] = cache_dir
+    os.environ.setdefault("GOOGLE_ADMANAGER_NETWORK_CODE", "12345")
+    for name in ("GOOGLE_ADMANAGER_RATE_LIMIT", "GOOGLE_ADMANAGER_RATE_BURST",
+                 "GOOGLE_ADMANAGER_SERVICE_RATE_LIMIT", "GOOGLE_ADMANAGER_SERVICE_RATE_BURST"):
+        os.environ[name] = str(args.rate_limit)
+    os.environ.setdefault("GOOGLE_ADMANAGER_MAX_CONCURRENCY", str(args.concurrency))
+
+    stderr = sys.stderr
+    if not args.verbose:
+        sys.stderr = open(os.devnull, "w")
+    try:
+        result = run(args)
+    finally:
+        if sys.stderr is not stderr:
+            sys.stderr.close()
+            sys.stderr = stderr
+
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f"backend={result['backend']} requests={result['requests']} concurrency={result['concurrency']} "
+          f"dataset={result['dataset_size']} latency={result['latency_ms']}ms "
+          f"wall={result['wall_seconds']}s api_calls={result['api_calls']}")
+    header = f"{'tool:action':<34}{'count':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>8}{'rss_mb':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, row in list(result["tools"].items()) + [("overall", result["overall"])]:
+        print(f"{name:<34}{row['count']:>7}{row['errors']:>5}{row['p50_ms']:>9}{row['p95_ms']:>9}"
+              f"{row['p99_ms']:>9}{row['rps']:>8}{row['peak_rss_mb']:>8}")
+
+
+if __name__ == "__main__":
+    main()
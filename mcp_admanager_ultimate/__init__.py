@@ -24,7 +24,13 @@ __author__ = "chre3"
 __email__ = "chremata3@gmail.com"
 __description__ = "增强终极优化版Google Ad Manager MCP服务器，完整功能支持"
 
-from .server import MCPAdManagerEnhancedUltimateServer
-
 __all__ = ["MCPAdManagerEnhancedUltimateServer"]
 
+
+def __getattr__(name):
+    # 延迟导入服务器模块，导入包本身不加载服务器及其依赖
+    if name == "MCPAdManagerEnhancedUltimateServer":
+        from .server import MCPAdManagerEnhancedUltimateServer
+        return MCPAdManagerEnhancedUltimateServer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
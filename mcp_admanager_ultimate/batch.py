@@ -0,0 +1,230 @@
+"""
+批量操作 - 把多个ID合并为少量API调用，把多个实体合并为少量创建调用
+
+旧版 googleads 把ID合并为 `WHERE id IN (...)` 语句，新版SDK使用带ID过滤条件
+的列表调用。ID按API限制分块，各块在有上限的线程池中并行获取。批量创建时
+先在本地校验全部规格，再按批提交并返回逐项结果。
+"""
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from .scheduler import is_transient
+
+# 旧版 PQL 语句单次建议的最大条目数
+MAX_IDS_PER_STATEMENT = 500
+# 新版SDK过滤表达式中每块的ID数量，避免请求URL过长
+MAX_IDS_PER_FILTER = 100
+# 单次调用最多接受的ID数量
+MAX_IDS_PER_CALL = 5000
+# 同时进行的分块请求数量上限
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv("GOOGLE_ADMANAGER_BATCH_CONCURRENCY", "4"))
+
+# get_many 操作共用的参数定义，合并到各工具的 inputSchema.properties 中
+IDS_SCHEMA_PROPERTIES = {
+    "ids": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": f"ID列表（必需当action='get_many'时，最多{MAX_IDS_PER_CALL}个），一次调用返回全部结果，找不到的ID在missing_ids中单独列出",
+        "maxItems": MAX_IDS_PER_CALL
+    }
+}
+
+
+def normalize_ids(ids: Iterable[Any]) -> List[str]:
+    """校验ID（Ad Manager的ID都是整数）并按原顺序去重"""
+    if ids is None:
+        raise ValueError("get_many 操作需要提供 ids")
+    if isinstance(ids, (str, int)):
+        ids = [ids]
+    result = []
+    seen = set()
+    for value in ids:
+        text = str(value).strip()
+        if not text.isdigit():
+            raise ValueError(f"无效的ID: {value}")
+        text = str(int(text))
+        if text not in seen:
+            seen.add(text)
+            result.append(text)
+    if not result:
+        raise ValueError("get_many 操作需要提供 ids")
+    if len(result) > MAX_IDS_PER_CALL:
+        raise ValueError(f"单次最多获取 {MAX_IDS_PER_CALL} 个ID，收到 {len(result)} 个")
+    return result
+
+
+def chunked(items: Sequence[Any], size: int) -> Iterator[List[Any]]:
+    """按固定大小切分"""
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
+
+
+def fetch_in_chunks(ids: Sequence[str], chunk_size: int,
+                    fetch_chunk: Callable[[List[str]], List[Dict[str, Any]]],
+                    max_workers: int = DEFAULT_BATCH_CONCURRENCY) -> List[Dict[str, Any]]:
+    """分块获取，多个块时并行执行"""
+    chunks = list(chunked(ids, chunk_size))
+    if len(chunks) == 1:
+        return fetch_chunk(chunks[0])
+    records = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)),
+                            thread_name_prefix="mcp-batch") as executor:
+        # 复制调用方的上下文，使分块请求沿用相同的调度优先级
+        futures = [executor.submit(contextvars.copy_context().run, fetch_chunk, chunk)
+                   for chunk in chunks]
+        for future in futures:
+            records.extend(future.result())
+    return records
+
+
+def match_ids(ids: Sequence[str], records: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """按请求顺序排列找到的实体，并返回找不到的ID"""
+    by_id = {str(record.get("id")): record for record in records}
+    found = [by_id[i] for i in ids if i in by_id]
+    missing = [i for i in ids if i not in by_id]
+    return found, missing
+
+
+# 旧版 create* 方法单次提交的实体数量
+MAX_CREATE_BATCH_SIZE = 100
+# 单次调用最多接受的创建规格数量
+MAX_CREATE_ITEMS = 2000
+MAX_NAME_LENGTH = 255
+
+# 批量创建时各类实体的必需字段和整数ID字段
+CREATE_REQUIRED_FIELDS = {
+    "ad_unit": ["name"],
+    "order": ["name", "advertiserId", "traffickerId"],
+    "line_item": ["name", "orderId", "lineItemType", "costType", "startDateTime", "endDateTime"],
+}
+CREATE_ID_FIELDS = {
+    "ad_unit": ["parentId"],
+    "order": ["advertiserId", "traffickerId"],
+    "line_item": ["orderId"],
+}
+# 名称只需在这个字段指定的父级内唯一（订单名称在整个网络内唯一）
+NAME_SCOPE_FIELDS = {
+    "ad_unit": "parentId",
+    "line_item": "orderId",
+}
+# 规格中未提供时使用的默认值（与单个 create 操作一致）
+CREATE_DEFAULTS = {
+    "ad_unit": {"targetWindow": "BLANK", "sizes": []},
+}
+# 旧版 googleads 的创建方法：(服务名, 方法名)
+CREATE_METHODS = {
+    "ad_unit": ("InventoryService", "createAdUnits"),
+    "order": ("OrderService", "createOrders"),
+    "line_item": ("LineItemService", "createLineItems"),
+}
+
+# bulk_create 操作共用的参数定义，合并到各工具的 inputSchema.properties 中
+ITEMS_SCHEMA_PROPERTIES = {
+    "items": {
+        "type": "array",
+        "items": {"type": "object"},
+        "description": f"实体规格列表（必需当action='bulk_create'时，最多{MAX_CREATE_ITEMS}个），字段使用API的驼峰命名，例如 {{\"name\": \"...\", \"parentId\": \"123\"}}。全部规格先在本地校验，任一无效则不提交",
+        "maxItems": MAX_CREATE_ITEMS
+    }
+}
+
+
+def validate_create_specs(kind: str, items: Any) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """本地校验批量创建的规格，返回 (规范化后的实体, 校验错误)"""
+    if not isinstance(items, list) or not items:
+        raise ValueError("bulk_create 操作需要提供 items")
+    if len(items) > MAX_CREATE_ITEMS:
+        raise ValueError(f"单次最多创建 {MAX_CREATE_ITEMS} 个实体，收到 {len(items)} 个")
+
+    entities = []
+    errors = []
+    seen_names = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": "规格必须是对象"})
+            continue
+        problems = []
+        for field in CREATE_REQUIRED_FIELDS[kind]:
+            if item.get(field) in (None, ""):
+                problems.append(f"缺少 {field}")
+        entity = {**CREATE_DEFAULTS.get(kind, {}), **item}
+        for field in CREATE_ID_FIELDS[kind]:
+            if entity.get(field) not in (None, ""):
+                text = str(entity[field]).strip()
+                if not text.isdigit():
+                    problems.append(f"{field} 必须是整数ID")
+                else:
+                    entity[field] = int(text)
+        name = str(item.get("name") or "")
+        if len(name) > MAX_NAME_LENGTH:
+            problems.append(f"name 超过 {MAX_NAME_LENGTH} 个字符")
+        # 同一父级下名称必须唯一，提交前先在请求内部检查
+        scope = NAME_SCOPE_FIELDS.get(kind)
+        name_key = (name, entity.get(scope) if scope else None)
+        if name and name_key in seen_names:
+            problems.append(f"name 与第 {seen_names[name_key]} 项重复")
+        else:
+            seen_names[name_key] = index
+        if problems:
+            errors.append({"index": index, "error": "；".join(problems)})
+        else:
+            entities.append(entity)
+    return entities, errors
+
+
+def bulk_create(create_method: Callable[[List[Dict[str, Any]]], List[Any]],
+                entities: Sequence[Dict[str, Any]],
+                batch_size: int = MAX_CREATE_BATCH_SIZE,
+                max_workers: int = DEFAULT_BATCH_CONCURRENCY) -> List[Dict[str, Any]]:
+    """分批并行提交，返回与输入顺序一致的逐项结果
+
+    API的批量创建是原子的：一批因校验错误失败时逐个重试该批实体，只让真正
+    有问题的实体失败，其余照常创建。超时等临时错误时该批可能已经生效，逐个
+    重试会产生重复的实体，因此整批标记为失败。API返回的实体少于提交的数量时，
+    没有对应结果的项标记为失败。
+    """
+    batches = list(chunked(list(enumerate(entities)), batch_size))
+
+    def submit(batch):
+        try:
+            created = create_method([entity for _, entity in batch]) or []
+            results = [_created_result(index, entity) for (index, _), entity in zip(batch, created)]
+            results.extend({"index": index, "success": False, "error": "API未返回创建结果"}
+                           for index, _ in batch[len(created):])
+            return results
+        except Exception as batch_error:
+            if len(batch) == 1:
+                return [{"index": batch[0][0], "success": False, "error": str(batch_error)}]
+            if is_transient(batch_error):
+                error = f"批量提交遇到临时错误，可能已部分生效，为避免重复创建未逐项重试: {batch_error}"
+                return [{"index": index, "success": False, "error": error} for index, _ in batch]
+        results = []
+        for index, entity in batch:
+            try:
+                created = create_method([entity]) or []
+                results.append(_created_result(index, created[0]) if created else
+                               {"index": index, "success": False, "error": "API未返回创建结果"})
+            except Exception as e:
+                results.append({"index": index, "success": False, "error": str(e)})
+        return results
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches))),
+                            thread_name_prefix="mcp-create") as executor:
+        futures = [executor.submit(contextvars.copy_context().run, submit, batch)
+                   for batch in batches]
+        for future in futures:
+            results.extend(future.result())
+    return sorted(results, key=lambda r: r["index"])
+
+
+def _created_result(index: int, entity) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "success": True,
+        "id": entity.get("id"),
+        "name": entity.get("name")
+    }
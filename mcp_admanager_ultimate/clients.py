@@ -0,0 +1,172 @@
+"""
+服务客户端注册表 - 按需创建并复用Ad Manager服务客户端
+
+新版 google-ads-admanager 的 *ServiceClient 每种只创建一次，并共享同一个
+HTTP连接池；旧版 googleads 的 GetService 结果按服务名和版本缓存。
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .metrics import get_metrics_registry
+from .scheduler import RequestScheduler, ScheduledService
+
+LEGACY_API_VERSION = "v202405"
+
+# 共享连接池大小
+DEFAULT_POOL_SIZE = int(os.getenv("GOOGLE_ADMANAGER_POOL_SIZE", "10"))
+
+
+class ServiceClientRegistry:
+    """懒加载的服务客户端注册表（线程安全）"""
+
+    def __init__(self, credential_manager, legacy_loader: Callable[[], Any],
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 scheduler: Optional[RequestScheduler] = None,
+                 network_code: Optional[str] = None):
+        self.credential_manager = credential_manager
+        self.pool_size = pool_size
+        # 所有服务调用都经过调度器限流和重试
+        self.scheduler = scheduler or RequestScheduler()
+        self.network_code = network_code or "default"
+        self._legacy_loader = legacy_loader
+        self._metrics = get_metrics_registry()
+        self._lock = threading.RLock()
+        self._clients: Dict[str, Any] = {}
+        self._legacy_client = None
+        self._legacy_services: Dict[Tuple[str, str], Any] = {}
+        self._session = None
+        self._created_at: Dict[str, float] = {}
+        self._hits: Dict[str, int] = {}
+        self._sdk_module = None
+        self._sdk_error: Optional[ImportError] = None
+
+    def get_client(self, class_name: str):
+        """获取新版SDK服务客户端，例如 'AdUnitServiceClient'
+
+        SDK不可用时抛出 ImportError，调用方据此回退到旧版 googleads。
+        """
+        with self._lock:
+            client = self._clients.get(class_name)
+            if client is None:
+                module = self._import_sdk()
+                client_class = getattr(module, class_name, None)
+                if client_class is None:
+                    raise ImportError(f"google.ads.admanager 中没有 {class_name}")
+                credentials, _ = self.credential_manager.get_credentials()
+                with self._metrics.timer("client_construct", client=class_name):
+                    client = client_class(credentials=credentials)
+                    self._share_session(client, credentials)
+                client = ScheduledService(client, class_name, self.network_code, self.scheduler)
+                self._clients[class_name] = client
+                self._created_at[class_name] = time.time()
+                print(f"✅ {class_name} 初始化成功", file=sys.stderr)
+            self._hits[class_name] = self._hits.get(class_name, 0) + 1
+            return client
+
+    def _import_sdk(self):
+        """导入新版SDK模块，导入结果（包括失败）只检测一次"""
+        if self._sdk_error is not None:
+            raise self._sdk_error
+        if self._sdk_module is None:
+            try:
+                self._sdk_module = importlib.import_module("google.ads.admanager")
+            except ImportError as e:
+                self._sdk_error = e
+                raise
+        return self._sdk_module
+
+    def get_legacy_client(self):
+        """获取旧版 googleads AdManagerClient（只加载一次）"""
+        with self._lock:
+            if self._legacy_client is None:
+                with self._metrics.timer("client_construct", client="AdManagerClient"):
+                    self._legacy_client = self._legacy_loader()
+                self._created_at["AdManagerClient"] = time.time()
+            return self._legacy_client
+
+    def get_legacy_service(self, service_name: str, version: str = LEGACY_API_VERSION):
+        """获取旧版服务，例如 'InventoryService'，按服务名和版本缓存"""
+        key = (service_name, version)
+        with self._lock:
+            service = self._legacy_services.get(key)
+            if service is None:
+                legacy_client = self.get_legacy_client()
+                with self._metrics.timer("client_construct", client=service_name):
+                    service = legacy_client.GetService(service_name, version=version)
+                service = ScheduledService(service, service_name, self.network_code, self.scheduler)
+                self._legacy_services[key] = service
+                self._created_at[f"{service_name}:{version}"] = time.time()
+            name = f"{service_name}:{version}"
+            self._hits[name] = self._hits.get(name, 0) + 1
+            return service
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池和已创建客户端的状态"""
+        with self._lock:
+            now = time.time()
+            entries = []
+            for name in list(self._clients) + [f"{s}:{v}" for s, v in self._legacy_services]:
+                entries.append({
+                    "name": name,
+                    "age_seconds": round(now - self._created_at.get(name, now), 1),
+                    "hits": self._hits.get(name, 0)
+                })
+            return {
+                "pool_size": self.pool_size,
+                "shared_session": self._session is not None,
+                "legacy_client_loaded": self._legacy_client is not None,
+                "clients": entries,
+                "total": len(entries)
+            }
+
+    def reset(self) -> int:
+        """关闭共享连接池并丢弃所有客户端，返回被丢弃的客户端数量"""
+        with self._lock:
+            dropped = len(self._clients) + len(self._legacy_services)
+            if self._session is not None:
+                try:
+                    self._session.close()
+                except Exception as e:
+                    print(f"⚠️ 关闭连接池失败: {e}", file=sys.stderr)
+            self._session = None
+            self._clients.clear()
+            self._legacy_services.clear()
+            self._legacy_client = None
+            self._created_at.clear()
+            self._hits.clear()
+            return dropped
+
+    def _shared_session(self, credentials):
+        if self._session is None:
+            from google.auth.transport.requests import AuthorizedSession
+            from requests.adapters import HTTPAdapter
+
+            session = AuthorizedSession(credentials)
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    def _share_session(self, client, credentials):
+        """让REST传输层改用共享的会话，避免每个客户端各自建立TLS连接"""
+        transport = getattr(client, "_transport", None)
+        if transport is None or not hasattr(transport, "_session"):
+            return
+        try:
+            shared = self._shared_session(credentials)
+        except ImportError as e:
+            # 缺少 requests 时保留客户端自带的会话
+            print(f"⚠️ 无法创建共享连接池: {e}", file=sys.stderr)
+            return
+        own_session: Optional[Any] = transport._session
+        transport._session = shared
+        if own_session is not None and own_session is not shared:
+            try:
+                own_session.close()
+            except Exception:
+                pass
@@ -0,0 +1,95 @@
+"""
+请求合并 - 同时进行的相同只读工具调用共享一次上游请求
+
+按工具名和规范化后的参数生成键。同一个键已有调用在执行时，后到的调用
+等待它完成并直接使用同一个结果，不再访问API。创建、同步、清空等会修改
+状态的操作从不合并。
+"""
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_COALESCING = os.getenv("GOOGLE_ADMANAGER_COALESCE", "true").lower() in ("1", "true", "yes")
+
+# 会修改状态的操作，每次调用都必须真正执行
+MUTATING_TOOLS = {"export_entities", "cancel_job"}
+MUTATING_ACTIONS = {"create", "bulk_create", "sync", "clear", "reset", "invalidate", "dump",
+                    "define", "refresh", "delete"}
+
+
+def coalesce_key(tool_name: str, arguments: Optional[Dict[str, Any]]) -> Optional[str]:
+    """相同请求得到相同的键；修改状态的调用返回 None"""
+    arguments = arguments or {}
+    if tool_name in MUTATING_TOOLS or arguments.get("action") in MUTATING_ACTIONS:
+        return None
+    # 显式传入的 null 与省略等价
+    arguments = {k: v for k, v in arguments.items() if v is not None}
+    try:
+        canonical = json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+    return f"{tool_name}:{canonical}"
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同一个键同时只执行一次（线程安全）"""
+
+    def __init__(self, enabled: bool = DEFAULT_COALESCING):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: Optional[str], fn: Callable[[], Any]) -> Any:
+        """执行 fn，或等待同一个键正在进行的调用并返回它的结果"""
+        if key is None or not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除再唤醒，之后到达的调用会重新执行而不是拿到旧结果
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._calls),
+                "executed": self._executed,
+                "coalesced": self._coalesced
+            }
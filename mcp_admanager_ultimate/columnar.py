@@ -0,0 +1,293 @@
+"""
+列式报告文件 - 把下载的报告结果转换为 Arrow IPC 或 Parquet 文件
+
+转换与报告下载共用一次流式读取：行先缓冲到固定大小的记录批，写满一批就
+写入文件并释放，内存占用与报告行数无关。列类型按列名确定，与数据出现的
+先后无关：Dimension.* 列保存为字符串（*_ID 为整数），Column.* 计数指标
+保存为 int64，金额、比率、平均值等非整数指标保存为定点小数（decimal128），
+不经过浮点误差。无法用所在列类型表示的个别值保存为空值并计入
+invalid_values，不会中断写入。
+
+读取时使用内存映射，只解码覆盖请求行范围的记录批（Arrow）或行组
+（Parquet），适合对大文件做多次分页查询。需要安装 pyarrow。
+"""
+
+import os
+import sys
+import tempfile
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Any, Dict, List, Optional
+
+FORMAT_ARROW = "arrow"
+FORMAT_PARQUET = "parquet"
+COLUMNAR_FORMATS = (FORMAT_ARROW, FORMAT_PARQUET)
+COLUMNAR_EXTENSIONS = {FORMAT_ARROW: ".arrow", FORMAT_PARQUET: ".parquet"}
+
+ARROW_MAGIC = b"ARROW1"
+PARQUET_MAGIC = b"PAR1"
+
+# 每个记录批（Parquet行组）的行数
+DEFAULT_BATCH_ROWS = 64 * 1024
+DECIMAL_PRECISION = 38
+DECIMAL_SCALE = 9
+# 名称包含这些词的指标列按小数处理
+DECIMAL_HINTS = ("CTR", "RATE", "ECPM", "ECPC", "AVERAGE", "PERCENT", "RATIO", "SHARE",
+                 "REVENUE", "CPM", "CPC", "CPD", "COST", "BID", "PRICE", "AMOUNT", "VALUE")
+
+DEFAULT_QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 10000
+
+TYPE_INT = "int64"
+TYPE_DECIMAL = f"decimal128({DECIMAL_PRECISION}, {DECIMAL_SCALE})"
+TYPE_STRING = "string"
+
+_QUANTUM = Decimal(1).scaleb(-DECIMAL_SCALE)
+
+
+def _pyarrow():
+    """按需导入 pyarrow（可选依赖）"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("列式报告文件需要安装 pyarrow：pip install pyarrow")
+    return pyarrow
+
+
+def columnar_path(directory: str, key: str, fmt: str) -> str:
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"不支持的列式格式: {fmt}")
+    return os.path.join(directory, key + COLUMNAR_EXTENSIONS[fmt])
+
+
+def detect_format(path: str) -> str:
+    """按文件头识别格式"""
+    with open(path, "rb") as f:
+        head = f.read(len(ARROW_MAGIC))
+    if head.startswith(ARROW_MAGIC):
+        return FORMAT_ARROW
+    if head.startswith(PARQUET_MAGIC):
+        return FORMAT_PARQUET
+    raise ValueError(f"不是 Arrow IPC 或 Parquet 文件: {path}")
+
+
+def column_type(name: str, sample: List[Any]) -> str:
+    """确定列类型：Dimension.* / Column.* 只按列名，其他列按样本值取最宽的类型"""
+    upper = name.upper()
+    if upper.startswith("DIMENSION."):
+        return TYPE_INT if upper.endswith("_ID") else TYPE_STRING
+    if upper.startswith("COLUMN."):
+        return TYPE_DECIMAL if any(hint in upper for hint in DECIMAL_HINTS) else TYPE_INT
+    values = [v for v in sample if v is not None]
+    # 没有样本值时无法判断，字符串可以表示任何值
+    if not values or any(not isinstance(v, (int, float)) for v in values):
+        return TYPE_STRING
+    if any(hint in upper for hint in DECIMAL_HINTS) or any(isinstance(v, float) for v in values):
+        return TYPE_DECIMAL
+    return TYPE_INT
+
+
+def _to_int(name: str, value: Any) -> Optional[int]:
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"列 {name} 出现非整数值: {value!r}")
+
+
+def _to_decimal(name: str, value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        # repr(float) 是能还原原始文本的最短表示
+        number = Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+    except ArithmeticError:
+        raise ValueError(f"列 {name} 出现非数值: {value!r}")
+    if not number.is_finite():
+        raise ValueError(f"列 {name} 出现非数值: {value!r}")
+    return number.quantize(_QUANTUM, rounding=ROUND_HALF_EVEN)
+
+
+def _to_string(name: str, value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+_CONVERTERS = {TYPE_INT: _to_int, TYPE_DECIMAL: _to_decimal, TYPE_STRING: _to_string}
+
+
+class ColumnarWriter:
+    """按记录批流式写入报告行；先写临时文件，close 时原子替换目标文件"""
+
+    def __init__(self, path: str, fmt: str = FORMAT_PARQUET, batch_rows: int = DEFAULT_BATCH_ROWS):
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f"不支持的列式格式: {fmt}")
+        self.pa = _pyarrow()
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.format = fmt
+        self.batch_rows = max(1, batch_rows)
+        self.rows = 0
+        self.batches = 0
+        self._header: Optional[List[str]] = None
+        self._types: Optional[List[str]] = None
+        self._schema = None
+        self._buffer: List[List[Any]] = []
+        self._invalid: Dict[str, int] = {}
+        self._writer = None
+        self._file = None
+        self._tmp_path = None
+
+    def write(self, row: Dict[str, Any]):
+        """写入一行（iter_report_rows 产出的字典）"""
+        if self._header is None:
+            self._header = list(row)
+        self._buffer.append([row.get(name) for name in self._header])
+        if len(self._buffer) >= self.batch_rows:
+            self._flush()
+
+    def close(self) -> Dict[str, Any]:
+        """写完剩余的行并落盘，返回文件信息"""
+        self._flush()
+        if self._writer is None:
+            # 空报告：按表头写出只有结构的文件
+            self._open(self._header or [], [[] for _ in self._header or []])
+        self._writer.close()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        self._tmp_path = None
+        return {
+            "path": self.path,
+            "format": self.format,
+            "rows": self.rows,
+            "batches": self.batches,
+            "bytes": os.path.getsize(self.path),
+            "schema": dict(zip(self._header or [], self._types or [])),
+            "invalid_values": dict(self._invalid)
+        }
+
+    def abort(self):
+        """放弃写入并删除临时文件"""
+        try:
+            if self._writer is not None:
+                self._writer.close()
+        except Exception:
+            pass
+        if self._file is not None:
+            self._file.close()
+        if self._tmp_path:
+            try:
+                os.unlink(self._tmp_path)
+            except OSError:
+                pass
+            self._tmp_path = None
+
+    def _open(self, header: List[str], columns: List[List[Any]]):
+        pa = self.pa
+        self._types = [column_type(name, values) for name, values in zip(header, columns)]
+        arrow_types = {TYPE_INT: pa.int64(), TYPE_STRING: pa.string(),
+                       TYPE_DECIMAL: pa.decimal128(DECIMAL_PRECISION, DECIMAL_SCALE)}
+        self._schema = pa.schema([pa.field(name, arrow_types[t]) for name, t in zip(header, self._types)])
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, prefix=".columnar-")
+        self._file = os.fdopen(fd, "wb")
+        if self.format == FORMAT_ARROW:
+            self._writer = pa.ipc.new_file(self._file, self._schema)
+        else:
+            self._writer = pa.parquet.ParquetWriter(self._file, self._schema, compression="zstd")
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        columns = [list(values) for values in zip(*self._buffer)]
+        self._buffer = []
+        if self._writer is None:
+            self._open(self._header, columns)
+        arrays = [
+            self.pa.array([self._convert(name, t, v) for v in values], type=field.type)
+            for name, t, values, field in zip(self._header, self._types, columns, self._schema)
+        ]
+        batch = self.pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        if self.format == FORMAT_ARROW:
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write_table(self.pa.Table.from_batches([batch]), row_group_size=len(batch))
+        self.rows += len(batch)
+        self.batches += 1
+
+    def _convert(self, name: str, type_name: str, value: Any) -> Any:
+        """转换为列类型；无法表示的值保存为空值并计数，不中断整个文件的写入"""
+        try:
+            return _CONVERTERS[type_name](name, value)
+        except ValueError as e:
+            if name not in self._invalid:
+                print(f"⚠️ {e}，保存为空值", file=sys.stderr)
+            self._invalid[name] = self._invalid.get(name, 0) + 1
+            return None
+
+
+def _json_value(value: Any) -> Any:
+    # 小数以字符串返回，保持精度
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def query_columnar(path: str, columns: Optional[List[str]] = None, offset: int = 0,
+                   limit: int = DEFAULT_QUERY_LIMIT) -> Dict[str, Any]:
+    """内存映射读取列式文件的一段行，只解码与行范围重叠的记录批或行组"""
+    pa = _pyarrow()
+    path = os.path.abspath(os.path.expanduser(path))
+    fmt = detect_format(path)
+    offset = max(0, offset or 0)
+    limit = min(max(0, DEFAULT_QUERY_LIMIT if limit is None else limit), MAX_QUERY_LIMIT)
+
+    source = pa.memory_map(path, "r")
+    try:
+        if fmt == FORMAT_ARROW:
+            reader = pa.ipc.open_file(source)
+            schema = reader.schema
+            sizes = [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+
+            def read(i):
+                batch = reader.get_batch(i)
+                return batch.select(columns) if columns else batch
+        else:
+            reader = pa.parquet.ParquetFile(source)
+            schema = reader.schema_arrow
+            sizes = [reader.metadata.row_group(i).num_rows for i in range(reader.num_row_groups)]
+
+            def read(i):
+                return reader.read_row_group(i, columns=columns)
+
+        missing = [c for c in columns or [] if c not in schema.names]
+        if missing:
+            raise ValueError(f"列不存在: {', '.join(missing)}")
+
+        total = sum(sizes)
+        rows: List[Dict[str, Any]] = []
+        start = 0
+        for i, size in enumerate(sizes):
+            end = start + size
+            if len(rows) >= limit:
+                break
+            if end > offset:
+                part = read(i).slice(max(0, offset - start), limit - len(rows))
+                rows.extend({k: _json_value(v) for k, v in row.items()} for row in part.to_pylist())
+            start = end
+    finally:
+        source.close()
+
+    next_offset = offset + len(rows)
+    return {
+        "path": path,
+        "format": fmt,
+        "total_rows": total,
+        "schema": {field.name: str(field.type) for field in schema if not columns or field.name in columns},
+        "offset": offset,
+        "rows": rows,
+        "next_offset": next_offset if next_offset < total else None
+    }
@@ -0,0 +1,209 @@
+"""
+凭据管理 - 进程级共享的Google认证凭据缓存
+
+凭据只加载一次，访问令牌在过期前由后台定时器主动刷新，
+所有工具调用共享同一份凭据，避免每次调用都读取认证文件和交换令牌。
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import get_metrics_registry
+
+ADMANAGER_SCOPES = ["https://www.googleapis.com/auth/dfp"]
+
+# 令牌过期前多少秒开始刷新
+DEFAULT_REFRESH_MARGIN = int(os.getenv("GOOGLE_ADMANAGER_TOKEN_REFRESH_MARGIN", "300"))
+# 刷新失败后的重试间隔（秒）
+REFRESH_RETRY_INTERVAL = 30
+SOURCE_APPLICATION_DEFAULT = "application_default"
+
+
+def configured_credentials_path() -> Optional[str]:
+    """GOOGLE_APPLICATION_CREDS 指定且存在的认证文件"""
+    creds_path = os.getenv('GOOGLE_APPLICATION_CREDS')
+    return creds_path if creds_path and os.path.exists(creds_path) else None
+
+
+class CredentialManager:
+    """加载一次并保持令牌有效的凭据管理器（线程安全）"""
+
+    def __init__(self, refresh_margin: int = DEFAULT_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._lock = threading.RLock()
+        # 只串行化令牌刷新本身；后台刷新不持有 _lock，不阻塞读取凭据
+        self._refresh_lock = threading.Lock()
+        self._metrics = get_metrics_registry()
+        self._credentials = None
+        self._project = None
+        self._source = None
+        self._timer = None
+        self._refresh_count = 0
+        self._last_refresh = None
+        self._last_error = None
+
+    def get_credentials(self) -> Tuple[Any, Optional[str]]:
+        """返回 (credentials, project)，首次调用时加载，令牌失效时同步刷新"""
+        with self._metrics.timer("credential_acquire"), self._lock:
+            if self._credentials is None:
+                self._load()
+            elif not self._credentials.valid:
+                self._refresh()
+            return self._credentials, self._project
+
+    @property
+    def identity(self) -> str:
+        """凭据身份标识，用于按账号区分缓存"""
+        with self._lock:
+            if self._credentials is None:
+                self._load()
+            email = getattr(self._credentials, "service_account_email", None)
+            return email or self._source or "default"
+
+    @property
+    def configured_source(self) -> str:
+        """配置的凭据来源（认证文件路径或应用默认凭据），不加载凭据、不换取令牌"""
+        return configured_credentials_path() or SOURCE_APPLICATION_DEFAULT
+
+    def invalidate(self):
+        """丢弃当前凭据，下次调用时重新加载（例如认证文件被替换后）"""
+        with self._lock:
+            self._cancel_timer()
+            self._credentials = None
+            self._project = None
+            self._source = None
+
+    def close(self):
+        """停止后台刷新"""
+        with self._lock:
+            self._cancel_timer()
+
+    def stats(self) -> Dict[str, Any]:
+        """凭据缓存状态"""
+        with self._lock:
+            expiry = getattr(self._credentials, "expiry", None)
+            return {
+                "loaded": self._credentials is not None,
+                "source": self._source,
+                "valid": bool(self._credentials and self._credentials.valid),
+                "expiry": expiry.isoformat() if expiry else None,
+                "refresh_count": self._refresh_count,
+                "last_refresh": self._last_refresh.isoformat() if self._last_refresh else None,
+                "last_error": self._last_error,
+            }
+
+    def _load(self):
+        """读取认证文件或应用默认凭据，并立即换取访问令牌"""
+        # google-auth 导入较慢，延迟到第一次需要凭据时
+        from google.auth import default
+        from google.oauth2 import service_account
+
+        try:
+            # 优先使用GOOGLE_APPLICATION_CREDS环境变量指定的文件
+            creds_path = configured_credentials_path()
+            if creds_path:
+                print(f"✅ 使用指定的认证文件: {creds_path}", file=sys.stderr)
+                credentials = service_account.Credentials.from_service_account_file(
+                    creds_path,
+                    scopes=ADMANAGER_SCOPES
+                )
+                project = None
+                source = creds_path
+            else:
+                print("⚠️ 未设置GOOGLE_APPLICATION_CREDS环境变量，使用默认认证", file=sys.stderr)
+                credentials, project = default(scopes=ADMANAGER_SCOPES)
+                source = SOURCE_APPLICATION_DEFAULT
+        except Exception as e:
+            print(f"❌ 认证失败: {str(e)}", file=sys.stderr)
+            raise ValueError(f"无法获取认证凭据: {str(e)}")
+
+        self._credentials = credentials
+        self._project = project
+        self._source = source
+        self._refresh()
+
+    def _refresh(self):
+        """刷新访问令牌并安排下一次后台刷新"""
+        from google.auth.transport.requests import Request
+
+        try:
+            with self._refresh_lock:
+                self._credentials.refresh(Request())
+        except Exception as e:
+            self._refresh_failed(e)
+            raise ValueError(f"无法刷新认证令牌: {str(e)}")
+        self._refresh_succeeded()
+
+    def _refresh_succeeded(self):
+        self._refresh_count += 1
+        self._last_refresh = datetime.now()
+        self._last_error = None
+        self._schedule(self._seconds_until_refresh())
+
+    def _refresh_failed(self, error: Exception):
+        self._last_error = str(error)
+        print(f"❌ 令牌刷新失败: {str(error)}", file=sys.stderr)
+        self._schedule(REFRESH_RETRY_INTERVAL)
+
+    def _seconds_until_refresh(self) -> Optional[float]:
+        expiry = getattr(self._credentials, "expiry", None)
+        if expiry is None:
+            return None
+        # google-auth 的 expiry 为不带时区的UTC时间
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        remaining = (expiry - now).total_seconds()
+        return max(remaining - self.refresh_margin, 1.0)
+
+    def _schedule(self, delay: Optional[float]):
+        self._cancel_timer()
+        if delay is None:
+            return
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _background_refresh(self):
+        """不持有 _lock 原地刷新共享的凭据对象，已创建的客户端和共享会话都使用
+        这个对象，刷新后直接拿到新令牌；刷新期间旧令牌在过期前仍可使用"""
+        from google.auth.transport.requests import Request
+
+        with self._lock:
+            current = self._credentials
+        if current is None:
+            return
+        try:
+            with self._refresh_lock:
+                current.refresh(Request())
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        with self._lock:
+            # 刷新期间凭据被丢弃或重新加载时由新凭据安排刷新
+            if self._credentials is not current:
+                return
+            if error is not None:
+                self._refresh_failed(error)
+                return
+            self._refresh_succeeded()
+
+
+_shared_manager = None
+_shared_lock = threading.Lock()
+
+
+def get_credential_manager() -> CredentialManager:
+    """获取进程级共享的凭据管理器"""
+    global _shared_manager
+    with _shared_lock:
+        if _shared_manager is None:
+            _shared_manager = CredentialManager()
+        return _shared_manager
@@ -0,0 +1,170 @@
+"""
+JSON-RPC 请求分发器 - 持续读取请求并并发执行工具调用
+
+tools/call 在线程池中执行，慢请求（例如报告）不会阻塞后续请求。响应在
+完成时立即写出，由 JSON-RPC id 对应到请求；支持 notifications/cancelled
+取消尚未完成的请求：未开始的直接取消，执行中的在下一次服务调用前停止。
+"""
+
+import json
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+from .jobs import JobControl, job_context
+from .output import encode_message
+
+# 同时执行的工具调用数量上限
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("GOOGLE_ADMANAGER_MAX_CONCURRENCY", "4"))
+
+
+class RequestDispatcher:
+    """基于线程池的并发 JSON-RPC 分发器"""
+
+    def __init__(self, server, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None):
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency 必须为正整数")
+        self.server = server
+        self.max_concurrency = max_concurrency
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="mcp-tool")
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Any, Tuple[Future, JobControl]] = {}
+        self._cancelled = set()
+
+    def serve(self):
+        """读取请求直到输入结束，然后等待所有进行中的请求完成"""
+        try:
+            while True:
+                line = self.stdin.readline()
+                if not line:
+                    break
+                self.handle_line(line)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def handle_line(self, line: str):
+        """处理一行输入，tools/call 提交到线程池，其余请求直接处理"""
+        line = line.strip()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            return
+
+        method = request.get("method")
+        params = request.get("params") or {}
+        request_id = request.get("id")
+
+        if method == "notifications/cancelled":
+            self.cancel(params.get("requestId"))
+            return
+        if method and method.startswith("notifications/"):
+            # 通知不需要响应
+            return
+
+        if method == "tools/call":
+            self._submit(request_id, params)
+            return
+
+        try:
+            if method == "initialize":
+                result = self.server.handle_initialize(params)
+            elif method == "tools/list":
+                result = self.server.handle_tools_list()
+            else:
+                result = {"error": f"Unknown method: {method}"}
+            self._write_result(request_id, result)
+        except Exception as e:
+            self._write_error(request_id, e)
+
+    def cancel(self, request_id) -> bool:
+        """取消请求：未开始的直接取消，已在执行的在下一次服务调用前停止并丢弃其响应"""
+        with self._lock:
+            entry = self._in_flight.get(request_id)
+            if entry is None:
+                return False
+            self._cancelled.add(request_id)
+        future, control = entry
+        if future.cancel():
+            print(f"🛑 请求 {request_id} 已取消", file=sys.stderr)
+        else:
+            control.cancel.set()
+            print(f"🛑 请求 {request_id} 正在执行，将在下一次服务调用前停止", file=sys.stderr)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """分发器状态"""
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": len(self._in_flight),
+                "cancelling": len(self._cancelled)
+            }
+
+    def _submit(self, request_id, params: Dict[str, Any]):
+        control = JobControl()
+        future = self._executor.submit(
+            self._call,
+            control,
+            params.get("name"),
+            params.get("arguments", {})
+        )
+        if request_id is not None:
+            with self._lock:
+                self._in_flight[request_id] = (future, control)
+        future.add_done_callback(lambda f: self._on_done(request_id, f))
+
+    def _call(self, control: JobControl, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        with job_context(control):
+            return self.server.handle_tools_call(name, arguments)
+
+    def _on_done(self, request_id, future: Future):
+        with self._lock:
+            entry = self._in_flight.get(request_id)
+            if entry is not None and entry[0] is future:
+                del self._in_flight[request_id]
+            cancelled = request_id in self._cancelled
+            self._cancelled.discard(request_id)
+        # 被取消的请求和通知式调用不发送响应
+        if cancelled or future.cancelled() or request_id is None:
+            return
+        try:
+            self._write_result(request_id, future.result())
+        except Exception as e:
+            self._write_error(request_id, e)
+
+    def _write_result(self, request_id, result: Dict[str, Any]):
+        self._write({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def _write_error(self, request_id, error: Exception):
+        self._write({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {"code": -32603, "message": str(error)}
+        })
+
+    def _write(self, message: Dict[str, Any]):
+        data = encode_message(message) + b"\n"
+        with self._write_lock:
+            # 直接写入字节流，避免再做一次编码转换
+            buffer = getattr(self.stdout, "buffer", None)
+            if buffer is not None:
+                self.stdout.flush()
+                buffer.write(data)
+                buffer.flush()
+            else:
+                self.stdout.write(data.decode("utf-8"))
+                self.stdout.flush()
+
+
+def serve(server, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+    """在标准输入输出上运行MCP协议"""
+    RequestDispatcher(server, max_concurrency=max_concurrency).serve()
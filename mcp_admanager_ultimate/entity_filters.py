@@ -0,0 +1,248 @@
+"""
+实体列表过滤和排序 - 把类型化的过滤表达式下推到API，只传输匹配的实体
+
+同一个过滤表达式编译为三种形式：旧版 StatementBuilder 的 PQL Where（值
+全部通过绑定变量传入）、新版SDK list 请求的 filter / order_by 字符串，以及
+本地实体索引的 SQL 条件。各类实体只接受其具有的字段。
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .entity_index import snake_case
+
+OP_EQUALS = "="
+OP_IN = "IN"
+OP_CONTAINS = "CONTAINS"
+OP_GTE = ">="
+OP_LTE = "<="
+
+MAX_FILTER_VALUES = 100
+MAX_NAME_FILTER_LENGTH = 255
+
+# 过滤键 → (实体字段, 运算符)
+FILTER_KEYS = {
+    "status": ("status", OP_IN),
+    "advertiser_id": ("advertiserId", OP_EQUALS),
+    "name_contains": ("name", OP_CONTAINS),
+    "start_after": ("startDateTime", OP_GTE),
+    "start_before": ("startDateTime", OP_LTE),
+    "end_after": ("endDateTime", OP_GTE),
+    "end_before": ("endDateTime", OP_LTE),
+    "modified_since": ("lastModifiedDateTime", OP_GTE),
+}
+
+# 各类实体支持的过滤键和排序字段
+KIND_FILTER_KEYS = {
+    "ad_unit": ("status", "name_contains", "modified_since"),
+    "order": ("status", "advertiser_id", "name_contains", "start_after", "start_before",
+              "end_after", "end_before", "modified_since"),
+    "line_item": ("status", "name_contains", "start_after", "start_before", "end_after",
+                  "end_before", "modified_since"),
+    "creative": ("advertiser_id", "name_contains", "modified_since"),
+}
+KIND_ORDER_FIELDS = {
+    "ad_unit": ("id", "name", "status", "lastModifiedDateTime"),
+    "order": ("id", "name", "status", "advertiserId", "startDateTime", "endDateTime", "lastModifiedDateTime"),
+    "line_item": ("id", "name", "status", "startDateTime", "endDateTime", "lastModifiedDateTime"),
+    "creative": ("id", "name", "advertiserId", "lastModifiedDateTime"),
+}
+
+# 新版SDK中名称不是旧版字段蛇形形式的字段
+SDK_FIELD_NAMES = {"lastModifiedDateTime": "update_time"}
+
+_STATUS_PATTERN = re.compile(r"^[A-Z][A-Z0-9_]*$")
+
+FILTER_SCHEMA_PROPERTIES = {
+    "filter": {
+        "type": "object",
+        "properties": {
+            "status": {
+                "type": ["string", "array"],
+                "items": {"type": "string"},
+                "description": "状态，多个值之间为OR，例如 [\"DELIVERING\", \"READY\"]"
+            },
+            "advertiser_id": {"type": ["string", "integer"], "description": "广告主ID（订单、创意）"},
+            "name_contains": {"type": "string", "description": "名称包含的文本"},
+            "start_after": {"type": "string", "description": "开始时间不早于（YYYY-MM-DD或YYYY-MM-DDTHH:MM:SS，订单、行项目）"},
+            "start_before": {"type": "string", "description": "开始时间不晚于（订单、行项目）"},
+            "end_after": {"type": "string", "description": "结束时间不早于（订单、行项目）"},
+            "end_before": {"type": "string", "description": "结束时间不晚于（订单、行项目）"},
+            "modified_since": {"type": "string", "description": "在此时间之后修改过（仅实时数据）"}
+        },
+        "additionalProperties": False,
+        "description": "列表过滤条件（可选，仅用于list操作），条件之间为AND，在API端执行，只传输匹配的实体"
+    },
+    "order_by": {
+        "type": "string",
+        "description": "list操作的排序字段（可选），可加 asc/desc，例如 \"startDateTime desc\"。可用字段: id, name, status, advertiserId, startDateTime, endDateTime, lastModifiedDateTime（按实体类型）"
+    }
+}
+
+Condition = Tuple[str, str, Any]
+
+
+def _datetime_value(key: str, value: Any) -> str:
+    """统一为 YYYY-MM-DDTHH:MM:SS；只有日期的 *_before 取当天结束"""
+    text = str(value).strip()
+    try:
+        if len(text) == 10:
+            day = datetime.strptime(text, "%Y-%m-%d")
+            return day.strftime("%Y-%m-%dT23:59:59" if key.endswith("_before") else "%Y-%m-%dT00:00:00")
+        return datetime.fromisoformat(text.rstrip("Z")).strftime("%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        raise ValueError(f"{key}格式应为YYYY-MM-DD或YYYY-MM-DDTHH:MM:SS: {value}")
+
+
+def normalize_filter(kind: str, expression: Optional[Dict[str, Any]]) -> List[Condition]:
+    """校验过滤表达式，返回 (字段, 运算符, 值) 条件列表"""
+    conditions: List[Condition] = []
+    if not expression:
+        return conditions
+    if not isinstance(expression, dict):
+        raise ValueError("filter必须是对象")
+    allowed = KIND_FILTER_KEYS[kind]
+    for key, value in expression.items():
+        if key not in allowed:
+            raise ValueError(f"{kind} 不支持过滤条件 {key!r}，可用条件: {', '.join(allowed)}")
+        if value is None or value == "" or value == []:
+            continue
+        field, op = FILTER_KEYS[key]
+        if key == "status":
+            values = value if isinstance(value, list) else [value]
+            values = [str(v).strip().upper() for v in values]
+            if len(values) > MAX_FILTER_VALUES:
+                raise ValueError(f"status最多{MAX_FILTER_VALUES}个值")
+            bad = [v for v in values if not _STATUS_PATTERN.match(v)]
+            if bad:
+                raise ValueError(f"无效的状态: {', '.join(bad)}")
+            conditions.append((field, op, list(dict.fromkeys(values))))
+        elif key == "advertiser_id":
+            if not str(value).strip().isdigit():
+                raise ValueError(f"advertiser_id必须是数字: {value}")
+            conditions.append((field, op, str(value).strip()))
+        elif key == "name_contains":
+            text = str(value)
+            if len(text) > MAX_NAME_FILTER_LENGTH:
+                raise ValueError(f"name_contains最多{MAX_NAME_FILTER_LENGTH}个字符")
+            conditions.append((field, op, text))
+        else:
+            conditions.append((field, op, _datetime_value(key, value)))
+    return conditions
+
+
+def normalize_order_by(kind: str, order_by: Optional[str]) -> Optional[Tuple[str, bool]]:
+    """解析 "字段 [asc|desc]"，返回 (字段, 是否升序)"""
+    if not order_by:
+        return None
+    parts = str(order_by).split()
+    direction = parts[1].lower() if len(parts) == 2 else "asc"
+    if len(parts) > 2 or direction not in ("asc", "desc"):
+        raise ValueError(f"无效的order_by: {order_by}，格式为 \"字段 [asc|desc]\"")
+    allowed = KIND_ORDER_FIELDS[kind]
+    if parts[0] not in allowed:
+        raise ValueError(f"{kind} 不支持按 {parts[0]!r} 排序，可用字段: {', '.join(allowed)}")
+    return parts[0], direction == "asc"
+
+
+def referenced_fields(conditions: List[Condition], order: Optional[Tuple[str, bool]]) -> List[str]:
+    fields = [field for field, _, _ in conditions]
+    if order:
+        fields.append(order[0])
+    return fields
+
+
+def apply_legacy_filter(statement_builder, conditions: List[Condition],
+                        order: Optional[Tuple[str, bool]] = None,
+                        column: Callable[[str], str] = lambda field: field):
+    """编译为 PQL Where 和 OrderBy，值全部作为绑定变量；column 把字段名映射为列名"""
+    clauses = []
+    for i, (field, op, value) in enumerate(conditions):
+        name = column(field)
+        if op == OP_IN:
+            names = [f"f{i}_{j}" for j in range(len(value))]
+            for bind, item in zip(names, value):
+                statement_builder.WithBindVariable(bind, item)
+            clauses.append(f"{name} IN ({', '.join(':' + bind for bind in names)})")
+            continue
+        bind = f"f{i}"
+        if op == OP_CONTAINS:
+            statement_builder.WithBindVariable(bind, f"%{value}%")
+            clauses.append(f"{name} LIKE :{bind}")
+        else:
+            statement_builder.WithBindVariable(bind, value)
+            clauses.append(f"{name} {op} :{bind}")
+    if clauses:
+        statement_builder.Where(" AND ".join(clauses))
+    if order:
+        statement_builder.OrderBy(column(order[0]), ascending=order[1])
+    return statement_builder
+
+
+def sdk_field(field: str) -> str:
+    return SDK_FIELD_NAMES.get(field, snake_case(field))
+
+
+def _sdk_literal(field: str, value: Any) -> str:
+    if field.endswith("DateTime"):
+        return f'"{value}Z"'
+    if isinstance(value, str) and not value.isdigit():
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return str(value)
+
+
+def sdk_filter(conditions: List[Condition]) -> Optional[str]:
+    """编译为新版SDK list 请求的 filter 字符串（AIP-160）"""
+    clauses = []
+    for field, op, value in conditions:
+        name = sdk_field(field)
+        if op == OP_IN:
+            terms = [f"{name} = {_sdk_literal(field, v)}" for v in value]
+            clauses.append(terms[0] if len(terms) == 1 else "(" + " OR ".join(terms) + ")")
+        elif op == OP_CONTAINS:
+            clauses.append(f"{name} = {_sdk_literal(field, '*' + value + '*')}")
+        else:
+            clauses.append(f"{name} {op} {_sdk_literal(field, value)}")
+    return " AND ".join(clauses) or None
+
+
+def sdk_order_by(order: Optional[Tuple[str, bool]]) -> Optional[str]:
+    if not order:
+        return None
+    return sdk_field(order[0]) + ("" if order[1] else " desc")
+
+
+def sdk_list_params(conditions: List[Condition], order: Optional[Tuple[str, bool]]) -> Dict[str, str]:
+    """新版SDK list 请求的 filter 和 order_by（没有条件时为空）"""
+    params = {}
+    text = sdk_filter(conditions)
+    if text:
+        params["filter"] = text
+    if order:
+        params["order_by"] = sdk_order_by(order)
+    return params
+
+
+def index_where(conditions: List[Condition]) -> Tuple[str, List[Any]]:
+    """编译为本地实体索引的 SQL 条件（data 列中的 JSON 字段）"""
+    clauses = []
+    params: List[Any] = []
+    for field, op, value in conditions:
+        if field == "lastModifiedDateTime":
+            raise ValueError("本地实体索引不支持 modified_since，请使用 source='live'")
+        expr = f"json_extract(data, '$.{field}')"
+        if op == OP_IN:
+            clauses.append(f"{expr} IN ({', '.join('?' for _ in value)})")
+            params.extend(value)
+        elif op == OP_CONTAINS:
+            clauses.append(f"{expr} LIKE ? ESCAPE '\\'")
+            escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        elif op == OP_EQUALS:
+            clauses.append(f"CAST({expr} AS TEXT) = ?")
+            params.append(str(value))
+        else:
+            clauses.append(f"{expr} {op} ?")
+            params.append(value)
+    return " AND ".join(clauses), params
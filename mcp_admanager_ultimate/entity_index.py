@@ -0,0 +1,380 @@
+"""
+本地实体索引 - 在SQLite中镜像广告单元、订单、行项目和创意
+
+首次使用时全量同步，之后只拉取修改时间晚于上次同步的实体（旧版
+lastModifiedDateTime，新版 updateTime）。按ID获取和按父级过滤的列表
+直接从本地读取；后台定时增量同步，使数据陈旧程度不超过配置的上限。
+"""
+
+import enum
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .report_cache import DEFAULT_CACHE_DIR
+from .scheduler import PRIORITY_BULK, request_priority
+
+DEFAULT_INDEX_PATH = os.getenv(
+    "GOOGLE_ADMANAGER_INDEX_PATH", os.path.join(DEFAULT_CACHE_DIR, "entities.sqlite3")
+)
+# 本地数据允许的最大陈旧时间（秒）
+DEFAULT_MAX_STALENESS = int(os.getenv("GOOGLE_ADMANAGER_INDEX_MAX_STALENESS", "300"))
+# 本地数据格式的版本，低于此版本的索引在打开时清空并重新全量同步
+INDEX_SCHEMA_VERSION = 1
+# 增量同步时向前多取的时间，覆盖网络时区与UTC的差异，重复的实体按ID覆盖
+SYNC_OVERLAP = timedelta(hours=24)
+
+SOURCE_LIVE = "live"
+SOURCE_INDEX = "index"
+DEFAULT_SOURCE = os.getenv("GOOGLE_ADMANAGER_ENTITY_SOURCE", SOURCE_LIVE).lower()
+
+# get/list 操作共用的数据来源参数，合并到各工具的 inputSchema.properties 中
+SOURCE_SCHEMA_PROPERTIES = {
+    "source": {
+        "type": "string",
+        "enum": [SOURCE_LIVE, SOURCE_INDEX],
+        "description": "数据来源（可选，仅用于get、get_many和list操作）：live(实时调用API), index(从本地实体索引读取，毫秒级返回，数据陈旧程度不超过配置的上限)",
+        "default": DEFAULT_SOURCE
+    }
+}
+
+
+def snake_case(name: str) -> str:
+    """驼峰字段名转换为新版SDK的蛇形字段名"""
+    return "".join("_" + c.lower() if c.isupper() else c for c in name)
+
+
+def _field(value: Any, name: str) -> Any:
+    return value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """带时区的UTC时间；旧版本保存的不带时区的值按UTC处理"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _legacy_datetime(value: Any) -> Optional[str]:
+    """旧版 DateTime（date 加 hour/minute/second）转换为 YYYY-MM-DDTHH:MM:SS，其他值返回 None"""
+    day = _field(value, "date")
+    if day is None or _field(value, "hour") is None:
+        return None
+    try:
+        return datetime(int(_field(day, "year")), int(_field(day, "month")), int(_field(day, "day")),
+                        int(_field(value, "hour")), int(_field(value, "minute") or 0),
+                        int(_field(value, "second") or 0)).strftime("%Y-%m-%dT%H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+def plain_value(value: Any) -> Any:
+    """把SDK返回值转换为可以存为JSON的值
+
+    日期时间统一为 YYYY-MM-DDTHH:MM:SS，使本地索引可以按文本比较时间范围。
+    """
+    if isinstance(value, enum.Enum):
+        return value.name
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    if not isinstance(value, (list, tuple)):
+        text = _legacy_datetime(value)
+        if text is not None:
+            return text
+    if isinstance(value, dict):
+        return {k: plain_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain_value(v) for v in value]
+    return str(value)
+
+
+class EntityKind:
+    """一种实体在两个SDK中的列表方法和字段"""
+
+    def __init__(self, name: str, sdk_client: str, sdk_method: str, sdk_field: str,
+                 sdk_id_field: str, legacy_service: str, legacy_method: str,
+                 fields: List[str], parent_field: Optional[str] = None):
+        self.name = name
+        self.sdk_client = sdk_client
+        self.sdk_method = sdk_method
+        self.sdk_field = sdk_field
+        self.sdk_id_field = sdk_id_field
+        self.legacy_service = legacy_service
+        self.legacy_method = legacy_method
+        self.fields = fields
+        self.parent_field = parent_field
+
+    def from_sdk(self, item, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """转换新版SDK实体，fields 不为空时只读取这些字段"""
+        return {field: plain_value(getattr(item, snake_case(field), None)) for field in fields or self.fields}
+
+    def from_legacy(self, item, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """转换旧版实体，fields 不为空时只读取这些字段"""
+        return {field: plain_value(item.get(field)) for field in fields or self.fields}
+
+
+ENTITY_KINDS = {
+    "ad_unit": EntityKind(
+        "ad_unit", "AdUnitServiceClient", "list_ad_units", "ad_units", "ad_unit_id",
+        "InventoryService", "getAdUnitsByStatement",
+        ["id", "name", "description", "targetWindow", "status", "parentId"],
+        parent_field="parentId"
+    ),
+    "order": EntityKind(
+        "order", "OrderServiceClient", "list_orders", "orders", "order_id",
+        "OrderService", "getOrdersByStatement",
+        ["id", "name", "advertiserId", "status", "currencyCode", "startDateTime", "endDateTime"],
+        parent_field="advertiserId"
+    ),
+    "line_item": EntityKind(
+        "line_item", "LineItemServiceClient", "list_line_items", "line_items", "line_item_id",
+        "LineItemService", "getLineItemsByStatement",
+        ["id", "name", "orderId", "status", "lineItemType", "costType", "costPerUnit",
+         "startDateTime", "endDateTime"],
+        parent_field="orderId"
+    ),
+    "creative": EntityKind(
+        "creative", "CreativeServiceClient", "list_creatives", "creatives", "creative_id",
+        "CreativeService", "getCreativesByStatement",
+        ["id", "name", "advertiserId", "size", "isNativeEligible"],
+        parent_field="advertiserId"
+    ),
+}
+
+
+class EntityIndex:
+    """SQLite实体存储（线程安全）"""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entities (
+                    kind TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    parent_id TEXT,
+                    name TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (kind, id)
+                );
+                CREATE INDEX IF NOT EXISTS entities_parent ON entities (kind, parent_id);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    kind TEXT PRIMARY KEY,
+                    synced_at TEXT NOT NULL,
+                    completed_at REAL NOT NULL
+                );
+            """)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_SCHEMA_VERSION:
+                # 旧格式的日期时间无法按文本比较
+                with conn:
+                    conn.execute("DELETE FROM entities")
+                    conn.execute("DELETE FROM sync_state")
+                conn.execute(f"PRAGMA user_version = {INDEX_SCHEMA_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def upsert(self, kind: str, records: Iterable[Dict[str, Any]]) -> int:
+        spec = ENTITY_KINDS[kind]
+        rows = []
+        for record in records:
+            parent = record.get(spec.parent_field) if spec.parent_field else None
+            rows.append((
+                kind,
+                str(record["id"]),
+                str(parent) if parent is not None else None,
+                record.get("name"),
+                json.dumps(record, ensure_ascii=False, default=str)
+            ))
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entities (kind, id, parent_id, name, data) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+        return len(rows)
+
+    def get(self, kind: str, entity_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT data FROM entities WHERE kind = ? AND id = ?", (kind, str(entity_id))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, kind: str, parent_id=None, limit: int = 1000, offset: int = 0,
+             where: Optional[Tuple[str, List[Any]]] = None,
+             order: Optional[Tuple[str, bool]] = None) -> List[Dict[str, Any]]:
+        """where 为 (SQL条件, 参数)，order 为 (字段, 是否升序)，id 作为次要排序"""
+        sql = "SELECT data FROM entities WHERE kind = ?"
+        params: List[Any] = [kind]
+        if parent_id is not None:
+            sql += " AND parent_id = ?"
+            params.append(str(parent_id))
+        if where and where[0]:
+            sql += " AND " + where[0]
+            params.extend(where[1])
+        sql += " ORDER BY "
+        if order and order[0] != "id":
+            sql += f"json_extract(data, '$.{order[0]}') {'ASC' if order[1] else 'DESC'}, "
+        direction = "DESC" if order and order[0] == "id" and not order[1] else "ASC"
+        sql += f"CAST(id AS INTEGER) {direction}, id {direction} LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def sync_state(self, kind: str) -> Optional[Tuple[datetime, float]]:
+        """(同步开始时带时区的UTC时间, 完成时间戳)，从未同步时为 None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT synced_at, completed_at FROM sync_state WHERE kind = ?", (kind,)
+            ).fetchone()
+        if not row:
+            return None
+        return _as_utc(datetime.fromisoformat(row[0])), row[1]
+
+    def mark_synced(self, kind: str, synced_at: datetime):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (kind, synced_at, completed_at) VALUES (?, ?, ?)",
+                    (kind, _as_utc(synced_at).isoformat(), time.time())
+                )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT kind, COUNT(*) FROM entities GROUP BY kind"
+            ).fetchall()
+        return dict(rows)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM entities")
+                conn.execute("DELETE FROM sync_state")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# fetch_pages(kind, since) 逐页产出转换后的实体，since 为 None 时全量拉取
+FetchPages = Callable[[str, Optional[datetime]], Iterator[List[Dict[str, Any]]]]
+
+
+class EntitySynchronizer:
+    """增量同步实体索引，并在后台保持数据新鲜"""
+
+    def __init__(self, index: EntityIndex, fetch_pages: FetchPages,
+                 max_staleness: int = DEFAULT_MAX_STALENESS):
+        self.index = index
+        self.fetch_pages = fetch_pages
+        self.max_staleness = max_staleness
+        self._locks = {kind: threading.Lock() for kind in ENTITY_KINDS}
+        self._timer = None
+        self._timer_lock = threading.Lock()
+        self._last_error: Optional[str] = None
+        self._listeners: List[Callable[[str, List[Dict[str, Any]]], None]] = []
+
+    def add_listener(self, listener: Callable[[str, List[Dict[str, Any]]], None]):
+        """注册同步回调，每写入一页实体调用一次 listener(kind, records)"""
+        self._listeners.append(listener)
+
+    def sync(self, kind: str, full: bool = False) -> int:
+        """同步一种实体，返回写入的数量"""
+        with self._locks[kind], request_priority(PRIORITY_BULK):
+            state = self.index.sync_state(kind)
+            since = None if full or state is None else state[0] - SYNC_OVERLAP
+            started = datetime.now(timezone.utc)
+            count = 0
+            for records in self.fetch_pages(kind, since):
+                count += self.index.upsert(kind, records)
+                for listener in self._listeners:
+                    listener(kind, records)
+            self.index.mark_synced(kind, started)
+            mode = "全量" if since is None else "增量"
+            print(f"🔄 实体索引{mode}同步 {kind}: {count} 条", file=sys.stderr)
+            return count
+
+    def age(self, kind: str) -> Optional[float]:
+        """距上次同步完成的秒数，从未同步时为 None"""
+        state = self.index.sync_state(kind)
+        return None if state is None else time.time() - state[1]
+
+    def ensure_fresh(self, kind: str):
+        """数据超过陈旧上限时先同步，并启动后台刷新"""
+        age = self.age(kind)
+        if age is None or age > self.max_staleness:
+            self.sync(kind)
+        self.start_background()
+
+    def start_background(self):
+        with self._timer_lock:
+            if self._timer is None:
+                self._schedule()
+
+    def stop_background(self):
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def stats(self) -> Dict[str, Any]:
+        counts = self.index.counts()
+        kinds = {}
+        for kind in ENTITY_KINDS:
+            age = self.age(kind)
+            kinds[kind] = {
+                "count": counts.get(kind, 0),
+                "age_seconds": round(age, 1) if age is not None else None
+            }
+        return {
+            "path": self.index.path,
+            "max_staleness": self.max_staleness,
+            "background_refresh": self._timer is not None,
+            "last_error": self._last_error,
+            "kinds": kinds
+        }
+
+    def _schedule(self):
+        # 以陈旧上限的一半为周期刷新，保证读取时数据不超过上限
+        self._timer = threading.Timer(max(self.max_staleness / 2, 1.0), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        for kind in ENTITY_KINDS:
+            # 只刷新已经使用过的实体类型
+            if self.index.sync_state(kind) is None:
+                continue
+            try:
+                self.sync(kind)
+                self._last_error = None
+            except Exception as e:
+                self._last_error = f"{kind}: {e}"
+                print(f"⚠️ 实体索引后台同步失败 {kind}: {e}", file=sys.stderr)
+        with self._timer_lock:
+            if self._timer is not None:
+                self._schedule()
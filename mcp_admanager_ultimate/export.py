@@ -0,0 +1,183 @@
+"""
+实体导出 - 把完整的实体列表逐页流式写入本地 NDJSON 或 CSV 文件
+
+每拉取一页就写入并释放，内存占用与实体总数无关。每页写完后把文件长度和
+下一页游标记录到检查点文件，中断后可以从检查点继续：先把文件截断到检查点
+记录的长度，再从记录的游标继续拉取，不会重复或遗漏行。启用 gzip 时每页
+是一个独立的 gzip 成员，截断位置总是落在成员边界上。
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .report_cache import DEFAULT_CACHE_DIR
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+EXPORT_FORMATS = (FORMAT_NDJSON, FORMAT_CSV)
+
+DEFAULT_EXPORT_DIR = os.getenv("GOOGLE_ADMANAGER_EXPORT_DIR", os.path.join(DEFAULT_CACHE_DIR, "exports"))
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+def default_export_path(kind: str, fmt: str, compress: bool) -> str:
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    suffix = ".gz" if compress else ""
+    return os.path.join(DEFAULT_EXPORT_DIR, f"{kind}-{timestamp}.{fmt}{suffix}")
+
+
+def checkpoint_path(path: str) -> str:
+    return path + CHECKPOINT_SUFFIX
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(checkpoint_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise ValueError(f"检查点文件损坏: {checkpoint_path(path)}: {e}")
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]):
+    """原子地写入检查点"""
+    target = checkpoint_path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".checkpoint-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return "" if value is None else value
+
+
+def encode_page(records: List[Dict[str, Any]], fmt: str, fields: List[str],
+                header: bool = False) -> bytes:
+    """把一页记录编码为文件内容"""
+    if fmt == FORMAT_NDJSON:
+        return "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+            for record in records
+        ).encode("utf-8")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(fields)
+    for record in records:
+        writer.writerow([_csv_value(record.get(field)) for field in fields])
+    return buffer.getvalue().encode("utf-8")
+
+
+class EntityExport:
+    """一次可续传的导出（检查点跟随输出文件保存）"""
+
+    def __init__(self, kind: str, path: str, fmt: str = FORMAT_NDJSON,
+                 compress: bool = False, fields: Optional[List[str]] = None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        self.kind = kind
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.format = fmt
+        self.compress = compress
+        self.fields = list(fields or [])
+        self.state = {
+            "kind": kind,
+            "format": fmt,
+            "gzip": compress,
+            "bytes": 0,
+            "rows": 0,
+            "pages": 0,
+            "next_page_token": None,
+            "completed": False
+        }
+
+    @classmethod
+    def resume(cls, path: str, kind: str, fields: Optional[List[str]] = None) -> "EntityExport":
+        """从检查点恢复，并把输出文件截断到最后一个完整写入的页"""
+        path = os.path.abspath(os.path.expanduser(path))
+        state = load_checkpoint(path)
+        if state is None:
+            raise ValueError(f"没有找到检查点: {checkpoint_path(path)}")
+        if state.get("kind") != kind:
+            raise ValueError(f"检查点属于 {state.get('kind')}，不是 {kind}")
+        export = cls(kind, path, state["format"], state["gzip"], fields)
+        export.state = state
+        if not state["completed"] and os.path.exists(path):
+            with open(path, "r+b") as f:
+                f.truncate(state["bytes"])
+        return export
+
+    @property
+    def start_token(self) -> Optional[str]:
+        return self.state["next_page_token"]
+
+    @property
+    def completed(self) -> bool:
+        return self.state["completed"]
+
+    def write_pages(self, pages: Iterable, convert, max_rows: Optional[int] = None) -> int:
+        """逐页写入，返回本次写入的行数；达到 max_rows 后在页边界停止"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        written = 0
+        mode = "ab" if self.state["bytes"] else "wb"
+        with open(self.path, mode) as f:
+            for page in pages:
+                records = [convert(item) for item in page.items]
+                data = encode_page(records, self.format, self.fields,
+                                   header=self.format == FORMAT_CSV and self.state["bytes"] == 0)
+                if self.compress:
+                    # 每页一个gzip成员，多个成员连接后仍是合法的gzip文件
+                    data = gzip.compress(data)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                written += len(records)
+                self.state["bytes"] += len(data)
+                self.state["rows"] += len(records)
+                self.state["pages"] += 1
+                self.state["next_page_token"] = page.next_page_token
+                self.state["completed"] = not page.next_page_token
+                save_checkpoint(self.path, self.state)
+                if max_rows is not None and written >= max_rows:
+                    break
+        return written
+
+    def summary(self, written: int) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "path": self.path,
+            "format": self.format,
+            "gzip": self.compress,
+            "rows_written": written,
+            "total_rows": self.state["rows"],
+            "pages": self.state["pages"],
+            "bytes": self.state["bytes"],
+            "completed": self.state["completed"],
+            "next_page_token": self.state["next_page_token"],
+            "checkpoint": None if self.state["completed"] else checkpoint_path(self.path)
+        }
+
+    def finish(self):
+        """导出完成后删除检查点"""
+        if self.state["completed"]:
+            try:
+                os.unlink(checkpoint_path(self.path))
+            except FileNotFoundError:
+                pass
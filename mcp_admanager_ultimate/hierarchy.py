@@ -0,0 +1,192 @@
+"""
+广告单元层级 - 在内存中维护按ID和父级ID索引的广告单元树
+
+树由本地实体索引中的广告单元一次性构建，并预先计算每个节点的祖先路径。
+子树、后代数量和到根节点的路径都在本地回答；实体索引增量同步时只更新
+变化的节点，节点移动时只重新计算被移动子树的路径。
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# tree 操作默认展开的层数
+DEFAULT_TREE_DEPTH = 2
+MAX_TREE_DEPTH = 10
+# 单次 tree 操作最多返回的节点数量
+MAX_TREE_NODES = 5000
+
+# 层级查询共用的参数定义，合并到 manage_inventory 的 inputSchema.properties 中
+HIERARCHY_SCHEMA_PROPERTIES = {
+    "depth": {
+        "type": "integer",
+        "description": f"tree操作展开的层数（可选，默认{DEFAULT_TREE_DEPTH}，最大{MAX_TREE_DEPTH}），更深的节点只返回descendant_count",
+        "minimum": 0,
+        "maximum": MAX_TREE_DEPTH,
+        "default": DEFAULT_TREE_DEPTH
+    }
+}
+
+
+def _key(value) -> Optional[str]:
+    return None if value in (None, "") else str(value)
+
+
+class AdUnitTree:
+    """广告单元树（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._parent: Dict[str, Optional[str]] = {}
+        self._children: Dict[Optional[str], Set[str]] = {}
+        # 每个节点从根到父级的祖先ID
+        self._paths: Dict[str, Tuple[str, ...]] = {}
+        self._descendant_counts: Dict[str, int] = {}
+        self.built = False
+        self.updates = 0
+
+    def build(self, records: Iterable[Dict[str, Any]]):
+        """用全部广告单元重建树"""
+        with self._lock:
+            self._nodes.clear()
+            self._parent.clear()
+            self._children.clear()
+            self._paths.clear()
+            self._descendant_counts.clear()
+            for record in records:
+                node_id = _key(record.get("id"))
+                parent_id = _key(record.get("parentId"))
+                self._nodes[node_id] = record
+                self._parent[node_id] = parent_id
+                self._children.setdefault(parent_id, set()).add(node_id)
+            for root in self.roots():
+                self._reindex(root)
+            self.built = True
+
+    def apply(self, records: Iterable[Dict[str, Any]]) -> int:
+        """增量更新变化的广告单元，返回结构发生变化（新增或移动）的节点数量"""
+        moved = 0
+        with self._lock:
+            for record in records:
+                node_id = _key(record.get("id"))
+                parent_id = _key(record.get("parentId"))
+                known = node_id in self._nodes
+                self._nodes[node_id] = record
+                if known and self._parent[node_id] == parent_id:
+                    continue
+                if known:
+                    # 旧祖先的后代数量失效
+                    self._invalidate_counts(self._paths.get(node_id, ()))
+                    self._children[self._parent[node_id]].discard(node_id)
+                self._parent[node_id] = parent_id
+                self._children.setdefault(parent_id, set()).add(node_id)
+                self._reindex(node_id)
+                self._invalidate_counts(self._paths[node_id])
+                moved += 1
+            self.updates += moved
+        return moved
+
+    def clear(self):
+        with self._lock:
+            self.build([])
+            self.built = False
+
+    def _reindex(self, node_id: str):
+        """重新计算节点及其全部后代的祖先路径"""
+        parent_id = self._parent[node_id]
+        base = self._paths[parent_id] + (parent_id,) if parent_id in self._nodes else ()
+        stack = [(node_id, base)]
+        while stack:
+            current, path = stack.pop()
+            self._paths[current] = path
+            child_path = path + (current,)
+            for child in self._children.get(current, ()):
+                stack.append((child, child_path))
+
+    def _invalidate_counts(self, ancestors: Iterable[str]):
+        for ancestor in ancestors:
+            self._descendant_counts.pop(ancestor, None)
+
+    def __contains__(self, node_id) -> bool:
+        return _key(node_id) in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def roots(self) -> List[str]:
+        """父级不在树中的节点（通常只有网络的根广告单元）"""
+        with self._lock:
+            return sorted((n for n, p in self._parent.items() if p not in self._nodes), key=_sort_key)
+
+    def descendant_count(self, node_id) -> int:
+        """后代数量（缓存，节点变化时只使相关祖先的缓存失效）"""
+        node_id = _key(node_id)
+        with self._lock:
+            cached = self._descendant_counts.get(node_id)
+            if cached is not None:
+                return cached
+            count = 0
+            for child in self._children.get(node_id, ()):
+                count += 1 + self.descendant_count(child)
+            self._descendant_counts[node_id] = count
+            return count
+
+    def path(self, node_id) -> List[Dict[str, Any]]:
+        """从根节点到该节点的路径"""
+        node_id = _key(node_id)
+        with self._lock:
+            if node_id not in self._nodes:
+                raise ValueError(f"广告单元不存在: {node_id}")
+            return [self._summary(n) for n in self._paths[node_id] + (node_id,)]
+
+    def subtree(self, node_id=None, depth: int = DEFAULT_TREE_DEPTH,
+                max_nodes: int = MAX_TREE_NODES) -> Dict[str, Any]:
+        """以 node_id 为根（未指定时为所有根节点）展开 depth 层的子树"""
+        depth = max(0, min(int(depth), MAX_TREE_DEPTH))
+        with self._lock:
+            if node_id is None:
+                roots = self.roots()
+            else:
+                node_id = _key(node_id)
+                if node_id not in self._nodes:
+                    raise ValueError(f"广告单元不存在: {node_id}")
+                roots = [node_id]
+            budget = [max_nodes]
+            nodes = [self._expand(root, depth, budget) for root in roots]
+            return {"nodes": nodes, "truncated": budget[0] < 0}
+
+    def _expand(self, node_id: str, depth: int, budget: List[int]) -> Dict[str, Any]:
+        budget[0] -= 1
+        node = self._summary(node_id)
+        node["descendant_count"] = self.descendant_count(node_id)
+        children = sorted(self._children.get(node_id, ()), key=_sort_key)
+        if depth > 0 and children and budget[0] >= len(children):
+            node["children"] = [self._expand(child, depth - 1, budget) for child in children]
+        elif children and depth > 0:
+            budget[0] = -1
+        return node
+
+    def _summary(self, node_id: str) -> Dict[str, Any]:
+        record = self._nodes[node_id]
+        return {
+            "id": record.get("id"),
+            "name": record.get("name"),
+            "status": record.get("status"),
+            "parentId": record.get("parentId"),
+            "depth": len(self._paths[node_id])
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "built": self.built,
+                "nodes": len(self._nodes),
+                "roots": len(self.roots()),
+                "max_depth": max((len(p) for p in self._paths.values()), default=0),
+                "incremental_updates": self.updates,
+                "cached_counts": len(self._descendant_counts)
+            }
+
+
+def _sort_key(node_id: str):
+    return (0, int(node_id)) if node_id.isdigit() else (1, node_id)
@@ -0,0 +1,442 @@
+"""
+后台作业 - 报告、完整列表和批量创建在工作线程中运行，调用立即返回作业ID
+
+作业的参数、状态和结果保存在本地SQLite中，服务器重启后仍可查询。重启时
+排队中的作业重新排队；运行中被中断的只读作业重新运行，批量创建等不可重复
+执行的作业标记为失败，避免重复创建实体。取消运行中的作业时设置取消标记，
+作业在下一次上游API调用前停止。
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .report_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_JOB_PATH = os.getenv("GOOGLE_ADMANAGER_JOB_PATH", os.path.join(DEFAULT_CACHE_DIR, "jobs.sqlite3"))
+DEFAULT_JOB_WORKERS = int(os.getenv("GOOGLE_ADMANAGER_JOB_WORKERS", "2"))
+# 已结束作业保留的秒数
+DEFAULT_JOB_RETENTION = int(os.getenv("GOOGLE_ADMANAGER_JOB_RETENTION", str(7 * 86400)))
+MAX_WAIT_SECONDS = 60
+DEFAULT_LIST_LIMIT = 20
+MAX_LIST_LIMIT = 200
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_SUCCEEDED = "succeeded"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+JOB_STATES = (STATE_QUEUED, STATE_RUNNING, STATE_SUCCEEDED, STATE_FAILED, STATE_CANCELLED)
+TERMINAL_STATES = (STATE_SUCCEEDED, STATE_FAILED, STATE_CANCELLED)
+
+# 中断后重新运行会产生重复实体的操作
+NON_RESTARTABLE_ACTIONS = {"bulk_create", "create"}
+
+BACKGROUND_SCHEMA_PROPERTIES = {
+    "background": {
+        "type": "boolean",
+        "description": "在后台运行并立即返回job_id（可选，默认false，仅用于报告、列表、同步、刷新、导出和批量创建）。用get_job_status查询进度，get_job_result取结果，cancel_job取消",
+        "default": False
+    }
+}
+
+_current_job: contextvars.ContextVar = contextvars.ContextVar("admanager_job_control", default=None)
+
+
+class JobCancelled(Exception):
+    """作业已被取消"""
+
+
+class JobControl:
+    """运行中作业（或分发器中的请求）的取消标记，interrupted 表示确实因取消而中断"""
+
+    __slots__ = ("cancel", "interrupted")
+
+    def __init__(self):
+        self.cancel = threading.Event()
+        self.interrupted = False
+
+
+@contextlib.contextmanager
+def job_context(control: JobControl):
+    """在当前上下文中设置作业的取消标记"""
+    token = _current_job.set(control)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def raise_if_cancelled():
+    """当前作业已被取消时抛出 JobCancelled（不在作业中时什么都不做）"""
+    control = _current_job.get()
+    if control is not None and control.cancel.is_set():
+        control.interrupted = True
+        raise JobCancelled("作业已取消")
+
+
+def cancel_requested() -> bool:
+    """当前作业是否已请求取消"""
+    control = _current_job.get()
+    return control is not None and control.cancel.is_set()
+
+
+def was_interrupted() -> bool:
+    """当前作业是否已因取消而中断"""
+    control = _current_job.get()
+    return control is not None and control.interrupted
+
+
+def result_error(result: Any) -> Optional[str]:
+    """从MCP工具响应中取出错误信息，成功时返回 None"""
+    if not isinstance(result, dict):
+        return "作业没有返回结果"
+    if result.get("error"):
+        return str(result["error"])
+    try:
+        payload = json.loads(result["content"][0]["text"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+    if isinstance(payload, dict) and payload.get("success") is False:
+        return str(payload.get("error") or "作业失败")
+    return None
+
+
+class JobStore:
+    """作业记录（线程安全）"""
+
+    _COLUMNS = ("id", "tool", "action", "arguments", "state", "created_at", "started_at",
+                "finished_at", "cancel_requested", "error", "result_bytes")
+
+    def __init__(self, path: str = DEFAULT_JOB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    action TEXT,
+                    arguments TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    result_bytes INTEGER,
+                    result TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+            """)
+            self._conn = conn
+        return self._conn
+
+    def insert(self, job_id: str, tool: str, arguments: Dict[str, Any]):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, tool, action, arguments, state, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, tool, arguments.get("action"), json.dumps(arguments, ensure_ascii=False),
+                     STATE_QUEUED, time.time())
+                )
+
+    def update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def transition(self, job_id: str, from_states: List[str], **fields) -> bool:
+        """只在作业处于 from_states 时更新，返回是否更新"""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        placeholders = ", ".join("?" for _ in from_states)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    f"UPDATE jobs SET {assignments} WHERE id = ? AND state IN ({placeholders})",
+                    (*fields.values(), job_id, *from_states)
+                )
+            return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def list(self, state: Optional[str] = None, limit: int = DEFAULT_LIST_LIMIT) -> List[Dict[str, Any]]:
+        sql = f"SELECT {', '.join(self._COLUMNS)} FROM jobs"
+        params: List[Any] = []
+        if state:
+            sql += " WHERE state = ?"
+            params.append(state)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE state IN (?, ?) ORDER BY created_at",
+                (STATE_QUEUED, STATE_RUNNING)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def purge(self, finished_before: float) -> int:
+        """删除早于指定时间结束的作业"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,)
+                )
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _record(self, row) -> Dict[str, Any]:
+        record = dict(zip(self._COLUMNS, row))
+        record["arguments"] = json.loads(record["arguments"])
+        record["cancel_requested"] = bool(record["cancel_requested"])
+        return record
+
+
+RunTool = Callable[[str, Dict[str, Any]], Dict[str, Any]]
+
+
+class JobManager:
+    """在工作线程中运行作业并持久化状态和结果（线程安全）
+
+    工作线程是守护线程：服务器退出时不等待运行中的作业，它们在下次启动时恢复。
+    """
+
+    def __init__(self, store: JobStore, run_tool: RunTool, workers: int = DEFAULT_JOB_WORKERS,
+                 retention: int = DEFAULT_JOB_RETENTION):
+        if workers <= 0:
+            raise ValueError("GOOGLE_ADMANAGER_JOB_WORKERS 必须为正整数")
+        self.store = store
+        self.run_tool = run_tool
+        self.workers = workers
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._cancel: Dict[str, JobControl] = {}
+        self._done: Dict[str, threading.Event] = {}
+        self._started = False
+
+    def start(self):
+        """启动工作线程并恢复上次未完成的作业（只执行一次）"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        if self.retention > 0:
+            self.store.purge(time.time() - self.retention)
+        resumed = 0
+        for job in self.store.unfinished():
+            if job["state"] == STATE_RUNNING and (job["cancel_requested"] or job["action"] in NON_RESTARTABLE_ACTIONS):
+                reason = "作业已取消" if job["cancel_requested"] else "服务器重启时作业中断，为避免重复创建未重新运行"
+                self.store.update(job["id"], state=STATE_CANCELLED if job["cancel_requested"] else STATE_FAILED,
+                                  error=reason, finished_at=time.time())
+                continue
+            self.store.update(job["id"], state=STATE_QUEUED, started_at=None)
+            self._enqueue(job["id"])
+            resumed += 1
+        if resumed:
+            print(f"♻️ 恢复{resumed}个未完成的后台作业", file=sys.stderr)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"mcp-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        self.start()
+        job_id = uuid.uuid4().hex
+        self.store.insert(job_id, tool, arguments)
+        self._enqueue(job_id)
+        print(f"📮 后台作业 {job_id} 已排队: {tool} {arguments.get('action') or ''}".rstrip(), file=sys.stderr)
+        return self.status(job_id)
+
+    def status(self, job_id: str, wait: float = 0) -> Dict[str, Any]:
+        """作业状态（不含结果）；wait>0 时最多等待这么多秒直到作业结束"""
+        self.start()
+        job = self._job(job_id)
+        if wait and job["state"] not in TERMINAL_STATES:
+            done = self._done.get(job_id)
+            if done is not None:
+                done.wait(min(wait, MAX_WAIT_SECONDS))
+                job = self._job(job_id)
+        return self._status(job)
+
+    def result(self, job_id: str, wait: float = 0) -> Dict[str, Any]:
+        """已结束作业的原始工具响应；未结束时返回 None 和状态"""
+        status = self.status(job_id, wait)
+        if status["state"] not in TERMINAL_STATES:
+            return {"status": status, "result": None}
+        return {"status": status, "result": self.store.result(job_id)}
+
+    def list(self, state: Optional[str] = None, limit: int = DEFAULT_LIST_LIMIT) -> List[Dict[str, Any]]:
+        self.start()
+        if state and state not in JOB_STATES:
+            raise ValueError(f"不支持的作业状态: {state}")
+        limit = min(max(1, limit or DEFAULT_LIST_LIMIT), MAX_LIST_LIMIT)
+        return [self._status(job) for job in self.store.list(state, limit)]
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """取消作业：排队中的直接取消，运行中的在下一次API调用前停止"""
+        self.start()
+        job = self._job(job_id)
+        if job["state"] in TERMINAL_STATES:
+            return self._status(job)
+        now = time.time()
+        if self.store.transition(job_id, [STATE_QUEUED], state=STATE_CANCELLED, cancel_requested=1,
+                                 error="作业已取消", finished_at=now):
+            self._finish(job_id)
+        else:
+            self.store.update(job_id, cancel_requested=1)
+            with self._lock:
+                control = self._cancel.get(job_id)
+            if control is not None:
+                control.cancel.set()
+        print(f"🛑 后台作业 {job_id} 已请求取消", file=sys.stderr)
+        return self._status(self._job(job_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = len(self._cancel)
+            started = self._started
+        return {
+            "path": self.store.path,
+            "workers": self.workers,
+            "started": started,
+            "queued": self._queue.qsize(),
+            "running": running,
+            "retention": self.retention,
+            "jobs": self.store.counts() if started else {}
+        }
+
+    def _job(self, job_id: str) -> Dict[str, Any]:
+        if not job_id:
+            raise ValueError("必须提供job_id")
+        job = self.store.get(job_id)
+        if job is None:
+            raise ValueError(f"作业不存在: {job_id}")
+        return job
+
+    def _enqueue(self, job_id: str):
+        with self._lock:
+            self._done.setdefault(job_id, threading.Event())
+        self._queue.put(job_id)
+
+    def _finish(self, job_id: str):
+        with self._lock:
+            self._cancel.pop(job_id, None)
+            done = self._done.pop(job_id, None)
+        if done is not None:
+            done.set()
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                print(f"⚠️ 后台作业 {job_id} 执行异常: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id: str):
+        control = JobControl()
+        with self._lock:
+            self._cancel[job_id] = control
+        try:
+            if not self.store.transition(job_id, [STATE_QUEUED], state=STATE_RUNNING, started_at=time.time()):
+                # 排队期间已被取消或删除
+                return
+            job = self.store.get(job_id)
+            if job["cancel_requested"]:
+                control.cancel.set()
+            try:
+                with job_context(control):
+                    raise_if_cancelled()
+                    result = self.run_tool(job["tool"], job["arguments"])
+                error = result_error(result)
+            except Exception as e:
+                result, error = None, str(e)
+            # 只有确实因取消而中断的作业才标记为已取消；取消请求到达前已经完成的
+            # 作业保留真实结果（例如已创建的实体），状态中的 cancel_requested 为 true。
+            # 中断的作业如果返回了部分结果也一并保存
+            if control.interrupted:
+                state, error = STATE_CANCELLED, "作业已取消"
+            else:
+                state = STATE_FAILED if error else STATE_SUCCEEDED
+            text = json.dumps(result, ensure_ascii=False) if result is not None else None
+            self.store.update(job_id, state=state, error=error, finished_at=time.time(),
+                              result=text, result_bytes=len(text) if text is not None else None)
+            print(f"{'✅' if state == STATE_SUCCEEDED else '⚠️'} 后台作业 {job_id} {state}", file=sys.stderr)
+        finally:
+            self._finish(job_id)
+
+    @staticmethod
+    def _status(job: Dict[str, Any]) -> Dict[str, Any]:
+        started = job["started_at"]
+        finished = job["finished_at"]
+        elapsed = None
+        if started:
+            elapsed = round((finished or time.time()) - started, 3)
+        return {
+            "job_id": job["id"],
+            "tool": job["tool"],
+            "action": job["action"],
+            "state": job["state"],
+            "done": job["state"] in TERMINAL_STATES,
+            "cancel_requested": job["cancel_requested"],
+            "created_at": _isoformat(job["created_at"]),
+            "started_at": _isoformat(started),
+            "finished_at": _isoformat(finished),
+            "elapsed_seconds": elapsed,
+            "error": job["error"],
+            "result_bytes": job["result_bytes"]
+        }
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
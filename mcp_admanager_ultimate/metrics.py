@@ -0,0 +1,219 @@
+"""
+运行指标 - 热路径的调用次数和延迟直方图
+
+记录工具调用、凭据获取、客户端创建、每次上游API调用和JSON序列化的耗时。
+直方图使用固定的对数分桶，每次记录只做一次二分查找和几次加法，开销很小。
+指标可通过 get_metrics 工具查看，也可以按 Prometheus 文本格式定期写入文件。
+"""
+
+import bisect
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 直方图分桶上限（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "admanager"
+
+# 设置后按间隔把 Prometheus 文本写入该文件
+DEFAULT_METRICS_FILE = os.getenv("GOOGLE_ADMANAGER_METRICS_FILE")
+DEFAULT_DUMP_INTERVAL = float(os.getenv("GOOGLE_ADMANAGER_METRICS_INTERVAL", "15"))
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """固定分桶的延迟直方图（由注册表加锁保护）"""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max", "errors")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """按分桶上限估算分位数（落在最后一个桶时取最大值）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.sum * 1000, 2),
+            "mean_ms": round(self.sum / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50) * 1000, 2),
+            "p95_ms": round(self.quantile(0.95) * 1000, 2),
+            "p99_ms": round(self.quantile(0.99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2)
+        }
+
+
+class MetricsRegistry:
+    """按 (指标名, 标签) 保存直方图（线程安全）"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._started = time.time()
+        self._timer = None
+
+    def observe(self, name: str, seconds: float, error: bool = False, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds, error)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """记录代码块耗时，抛出异常时计为错误"""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, error, **labels)
+
+    def snapshot(self, name: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """按指标名返回每组标签的汇总"""
+        with self._lock:
+            result = {}
+            for metric, series in sorted(self._histograms.items()):
+                if name is not None and metric != name:
+                    continue
+                rows = [{"labels": dict(labels), **histogram.summary()}
+                        for labels, histogram in series.items()]
+                rows.sort(key=lambda r: r["total_ms"], reverse=True)
+                result[metric] = rows
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._started = time.time()
+
+    def uptime(self) -> float:
+        return time.time() - self._started
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式（直方图和错误计数）"""
+        lines = []
+        with self._lock:
+            for metric, series in sorted(self._histograms.items()):
+                full = f"{METRIC_PREFIX}_{metric}_seconds"
+                lines.append(f"# TYPE {full} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += n
+                        lines.append(f"{full}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+                    lines.append(f"{full}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{full}_count{_format_labels(labels)} {histogram.count}")
+                lines.append(f"# TYPE {METRIC_PREFIX}_{metric}_errors_total counter")
+                for labels, histogram in sorted(series.items()):
+                    lines.append(f"{METRIC_PREFIX}_{metric}_errors_total{_format_labels(labels)} {histogram.errors}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> int:
+        """原子地把 Prometheus 文本写入文件，返回写入的字节数"""
+        data = self.to_prometheus().encode("utf-8")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return len(data)
+
+    def start_dumping(self, path: str, interval: float = DEFAULT_DUMP_INTERVAL):
+        """在后台按间隔写入 Prometheus 文本"""
+        def run():
+            try:
+                self.dump(path)
+            except OSError as e:
+                print(f"⚠️ 写入指标文件失败 {path}: {e}", file=sys.stderr)
+            self._schedule(run, interval)
+
+        with self._lock:
+            if self._timer is None:
+                self._schedule_locked(run, interval)
+
+    def _schedule(self, run, interval: float):
+        with self._lock:
+            self._schedule_locked(run, interval)
+
+    def _schedule_locked(self, run, interval: float):
+        self._timer = threading.Timer(max(interval, 1.0), run)
+        self._timer.daemon = True
+        self._timer.start()
+
+
+def _format_labels(labels: Labels, **extra) -> str:
+    items = list(labels) + [(k, _format_bound(v)) for k, v in extra.items()]
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape(str(v))}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def _format_bound(value) -> str:
+    return value if isinstance(value, str) else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取进程级共享的指标注册表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+            if DEFAULT_METRICS_FILE:
+                _registry.start_dumping(DEFAULT_METRICS_FILE)
+        return _registry
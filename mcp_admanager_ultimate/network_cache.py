@@ -0,0 +1,84 @@
+"""
+网络元数据缓存 - 按凭据身份缓存网络代码、显示名称和时区
+
+网络元数据几乎不会变化，manage_networks 的结果在较长的TTL内直接从内存
+返回，可通过 invalidate 操作手动失效。其他工具可以读取缓存的网络时区
+（例如计算报告日期范围的"今天"），不需要额外的API调用。
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_NETWORK_CACHE_TTL = int(os.getenv("GOOGLE_ADMANAGER_NETWORK_CACHE_TTL", str(24 * 3600)))
+
+KEY_CURRENT = "current"
+KEY_ALL = "all"
+
+
+def network_today(time_zone: Optional[str]) -> date:
+    """网络时区中的今天；时区未知或无法解析时使用本地日期"""
+    if time_zone:
+        try:
+            from zoneinfo import ZoneInfo
+            return datetime.now(ZoneInfo(time_zone)).date()
+        except Exception as e:
+            print(f"⚠️ 无法解析网络时区 {time_zone}: {e}", file=sys.stderr)
+    return date.today()
+
+
+class NetworkMetadataCache:
+    """按 (凭据身份, 键) 缓存网络元数据（线程安全）"""
+
+    def __init__(self, ttl: int = DEFAULT_NETWORK_CACHE_TTL,
+                 clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, identity: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((identity, key))
+            if entry is None or self._clock() - entry[0] > self.ttl:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[1]
+
+    def put(self, identity: str, key: str, value: Any):
+        with self._lock:
+            self._entries[(identity, key)] = (self._clock(), value)
+
+    def cached_at(self, identity: str, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get((identity, key))
+            return entry[0] if entry else None
+
+    def invalidate(self, identity: Optional[str] = None) -> int:
+        """清除指定身份（未指定时为全部）的缓存，返回清除的条目数"""
+        with self._lock:
+            keys = [k for k in self._entries if identity is None or k[0] == identity]
+            for k in keys:
+                del self._entries[k]
+            return len(keys)
+
+    def time_zone(self, identity: str) -> Optional[str]:
+        """缓存中当前网络的时区，不发起请求；即使已超过TTL也可使用"""
+        with self._lock:
+            entry = self._entries.get((identity, KEY_CURRENT))
+            return entry[1].get("timeZone") if entry else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses
+            }
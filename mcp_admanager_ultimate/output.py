@@ -0,0 +1,108 @@
+"""
+响应输出 - 工具结果的JSON序列化和MCP响应封装
+
+输出模式由环境变量统一控制：pretty（缩进，默认）或 compact（紧凑分隔符）。
+安装了 orjson 时自动使用它序列化；可选在结果中附带 MCP structuredContent，
+客户端无需再解析一次文本。
+"""
+
+import json
+import os
+from typing import Any, Dict
+
+from .metrics import get_metrics_registry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+OUTPUT_MODE_PRETTY = "pretty"
+OUTPUT_MODE_COMPACT = "compact"
+
+DEFAULT_OUTPUT_MODE = os.getenv("GOOGLE_ADMANAGER_OUTPUT_MODE", OUTPUT_MODE_PRETTY).lower()
+DEFAULT_STRUCTURED_CONTENT = os.getenv(
+    "GOOGLE_ADMANAGER_STRUCTURED_CONTENT", "false"
+).lower() in ("1", "true", "yes")
+# auto（有orjson时使用）/ json / orjson
+DEFAULT_JSON_BACKEND = os.getenv("GOOGLE_ADMANAGER_JSON_BACKEND", "auto").lower()
+
+COMPACT_SEPARATORS = (",", ":")
+
+
+def _use_orjson(backend: str) -> bool:
+    if backend == "json":
+        return False
+    if backend == "orjson" and orjson is None:
+        raise ValueError("GOOGLE_ADMANAGER_JSON_BACKEND=orjson 但未安装 orjson")
+    return orjson is not None
+
+
+class OutputFormatter:
+    """按服务器级输出模式序列化工具结果"""
+
+    def __init__(self, mode: str = DEFAULT_OUTPUT_MODE,
+                 structured_content: bool = DEFAULT_STRUCTURED_CONTENT,
+                 backend: str = DEFAULT_JSON_BACKEND):
+        if mode not in (OUTPUT_MODE_PRETTY, OUTPUT_MODE_COMPACT):
+            raise ValueError(f"不支持的输出模式: {mode}")
+        self.mode = mode
+        self.structured_content = structured_content
+        self.use_orjson = _use_orjson(backend)
+        self.metrics = get_metrics_registry()
+
+    @property
+    def backend(self) -> str:
+        return "orjson" if self.use_orjson else "json"
+
+    def dumps(self, obj: Any) -> str:
+        """序列化为文本，保留非ASCII字符"""
+        pretty = self.mode == OUTPUT_MODE_PRETTY
+        if self.use_orjson:
+            try:
+                option = orjson.OPT_INDENT_2 if pretty else 0
+                return orjson.dumps(obj, option=option).decode("utf-8")
+            except TypeError:
+                # orjson 不支持的类型（如非字符串键）回退到标准库
+                pass
+        if pretty:
+            return json.dumps(obj, ensure_ascii=False, indent=2)
+        return json.dumps(obj, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+
+    def tool_result(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """把结果封装为MCP工具响应"""
+        with self.metrics.timer("json_serialize", stage="tool_result"):
+            text = self.dumps(payload)
+        result = {
+            "content": [
+                {
+                    "type": "text",
+                    "text": text
+                }
+            ]
+        }
+        if self.structured_content:
+            result["structuredContent"] = payload
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "backend": self.backend,
+            "structured_content": self.structured_content
+        }
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """紧凑序列化JSON-RPC消息为UTF-8字节（不做ASCII转义，避免二次膨胀）"""
+    with get_metrics_registry().timer("json_serialize", stage="response"):
+        return _encode(message)
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    if orjson is not None and DEFAULT_JSON_BACKEND != "json":
+        try:
+            return orjson.dumps(message)
+        except TypeError:
+            pass
+    return json.dumps(message, ensure_ascii=False, separators=COMPACT_SEPARATORS).encode("utf-8")
@@ -0,0 +1,199 @@
+"""
+分页引擎 - 为所有列表操作逐页拉取数据
+
+新版 google-ads-admanager 使用 page_size/page_token，旧版 googleads（实体
+服务和 PQL 查询）使用 StatementBuilder 的 limit/offset。两者都包装为按页产出的迭代器，调用方
+可以边拉取边处理，不需要先把整个列表缓存在内存中。
+"""
+
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+# 旧版 API 建议的单页大小（googleads SUGGESTED_PAGE_LIMIT）
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+# 单次工具调用默认最多返回的条目数，超出部分通过 next_page_token 继续获取
+DEFAULT_MAX_ITEMS = 1000
+
+OFFSET_TOKEN_PREFIX = "offset:"
+
+
+class Page:
+    """一页结果"""
+
+    def __init__(self, items: List[Any], next_page_token: Optional[str], number: int):
+        self.items = items
+        self.next_page_token = next_page_token
+        self.number = number
+
+
+class Paginator:
+    """按页产出结果的迭代器基类
+
+    迭代结束后 next_page_token 为继续获取的游标（没有更多数据时为 None），
+    可以原样作为下一次调用的 page_token 传入。
+    """
+
+    def __init__(self, page_size: Optional[int] = None, max_items: Optional[int] = None,
+                 page_token: Optional[str] = None):
+        self.page_size = normalize_page_size(page_size)
+        if max_items is not None and int(max_items) <= 0:
+            raise ValueError("max_items 必须为正整数")
+        self.max_items = int(max_items) if max_items is not None else None
+        self.start_token = page_token or None
+        self.next_page_token = self.start_token
+        self.pages_fetched = 0
+        self.items_fetched = 0
+
+    def __iter__(self) -> Iterator[Page]:
+        token = self.start_token
+        while True:
+            size = self.page_size
+            if self.max_items is not None:
+                remaining = self.max_items - self.items_fetched
+                if remaining <= 0:
+                    break
+                # 最后一页只请求剩余数量，保证返回的游标正好接在最后一条之后
+                size = min(size, remaining)
+
+            items, token = self._fetch(token, size)
+            self.pages_fetched += 1
+            self.items_fetched += len(items)
+            self.next_page_token = token
+            yield Page(items, token, self.pages_fetched)
+
+            if not token:
+                break
+
+    def items(self) -> Iterator[Any]:
+        """逐条产出结果"""
+        for page in self:
+            for item in page.items:
+                yield item
+
+    def _fetch(self, token: Optional[str], size: int) -> Tuple[List[Any], Optional[str]]:
+        raise NotImplementedError
+
+
+class SdkPaginator(Paginator):
+    """新版SDK list_* 方法的分页器"""
+
+    def __init__(self, list_method: Callable, request: dict, items_field: str,
+                 metadata: Optional[List[Tuple[str, str]]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.list_method = list_method
+        self.request = dict(request)
+        self.items_field = items_field
+        self.metadata = metadata
+
+    def _fetch(self, token, size):
+        request = dict(self.request)
+        request["page_size"] = size
+        if token:
+            request["page_token"] = token
+        if self.metadata:
+            response = self.list_method(request=request, metadata=self.metadata)
+        else:
+            response = self.list_method(request=request)
+        items = list(getattr(response, self.items_field, None) or [])
+        return items, getattr(response, "next_page_token", None) or None
+
+
+class StatementPaginator(Paginator):
+    """旧版 get*ByStatement 方法的分页器，游标格式为 'offset:<N>'"""
+
+    def __init__(self, fetch_method: Callable, statement_builder, **kwargs):
+        super().__init__(**kwargs)
+        self.fetch_method = fetch_method
+        self.statement_builder = statement_builder
+
+    def _fetch(self, token, size):
+        offset = decode_offset_token(token)
+        self.statement_builder.limit = size
+        self.statement_builder.offset = offset
+        response = self.fetch_method(self.statement_builder.ToStatement())
+
+        items = []
+        total = None
+        if response is not None and 'results' in response and response['results']:
+            items = list(response['results'])
+            if 'totalResultSetSize' in response:
+                total = response['totalResultSetSize']
+
+        next_offset = offset + len(items)
+        if len(items) < size or (total is not None and next_offset >= total):
+            return items, None
+        return items, encode_offset_token(next_offset)
+
+
+class PqlPaginator(Paginator):
+    """旧版 PublisherQueryLanguageService.select 的分页器，每条结果是列名到值的字典"""
+
+    def __init__(self, select_method: Callable, statement_builder, convert_value: Callable,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.select_method = select_method
+        self.statement_builder = statement_builder
+        self.convert_value = convert_value
+
+    def _fetch(self, token, size):
+        offset = decode_offset_token(token)
+        self.statement_builder.limit = size
+        self.statement_builder.offset = offset
+        response = self.select_method(self.statement_builder.ToStatement())
+
+        items = []
+        if response is not None and 'rows' in response and response['rows']:
+            columns = [column['labelName'] for column in response['columnTypes']]
+            items = [dict(zip(columns, (self.convert_value(v) for v in row['values'])))
+                     for row in response['rows']]
+        if len(items) < size:
+            return items, None
+        return items, encode_offset_token(offset + len(items))
+
+
+def normalize_page_size(page_size: Optional[int]) -> int:
+    """校验并限制单页大小"""
+    if page_size is None:
+        return DEFAULT_PAGE_SIZE
+    page_size = int(page_size)
+    if page_size <= 0:
+        raise ValueError("page_size 必须为正整数")
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def encode_offset_token(offset: int) -> str:
+    return f"{OFFSET_TOKEN_PREFIX}{offset}"
+
+
+def decode_offset_token(token: Optional[str]) -> int:
+    if not token:
+        return 0
+    if not token.startswith(OFFSET_TOKEN_PREFIX):
+        raise ValueError(f"无效的 page_token: {token}")
+    try:
+        offset = int(token[len(OFFSET_TOKEN_PREFIX):])
+    except ValueError:
+        raise ValueError(f"无效的 page_token: {token}")
+    if offset < 0:
+        raise ValueError(f"无效的 page_token: {token}")
+    return offset
+
+
+# 列表操作共用的分页参数定义，合并到各工具的 inputSchema.properties 中
+PAGINATION_SCHEMA_PROPERTIES = {
+    "page_size": {
+        "type": "integer",
+        "description": f"单页大小（可选，默认{DEFAULT_PAGE_SIZE}，最大{MAX_PAGE_SIZE}），仅用于list操作",
+        "minimum": 1,
+        "maximum": MAX_PAGE_SIZE
+    },
+    "max_items": {
+        "type": "integer",
+        "description": f"本次调用最多返回的条目数（可选，默认{DEFAULT_MAX_ITEMS}），仅用于list操作。未取完时返回next_page_token",
+        "minimum": 1
+    },
+    "page_token": {
+        "type": "string",
+        "description": "分页游标（可选），传入上一次list操作返回的next_page_token以继续获取"
+    }
+}
@@ -0,0 +1,342 @@
+"""
+报告查询规划 - 自定义维度、列和维度过滤，并合并同时到达的兼容报告请求
+
+日期范围、维度过滤条件和网络都相同的请求在一个很短的窗口内到达时会被合并：
+上游只运行一个包含所有请求维度和列并集的作业，每个请求再从共享的结果在本地
+投影出自己的维度，并按维度值对指标列求和。共享的结果边下载边汇总到各请求的
+投影中，不在内存中保存更宽的原始行。
+
+只有已经有相同范围的请求在运行时才等待合并窗口，单独到达的请求直接运行，
+不增加延迟。因此一批同时到达的请求中，第一个请求单独运行，从第二个请求起
+才合并为一个作业，节省的作业数取决于到达的先后。比率、平均值、去重人数等不可相加
+的指标无法从更细的维度汇总，只有维度完全相同的请求才会与它们合并。
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .sharding import ReportRollup, is_additive
+
+# 有其他相同范围的请求在运行时，第一个请求等待后续请求加入的时间（秒），为0时不合并
+DEFAULT_PLAN_WINDOW = float(os.getenv("GOOGLE_ADMANAGER_REPORT_PLAN_WINDOW", "0.1"))
+
+MAX_DIMENSIONS = 10
+MAX_COLUMNS = 30
+MAX_FILTER_VALUES = 500
+
+FILTER_OPERATORS = ("EQUALS", "NOT_EQUALS", "IN", "NOT_IN", "CONTAINS")
+
+_FIELD_PATTERN = re.compile(r"^[A-Z][A-Z0-9_]*$")
+
+REPORT_QUERY_SCHEMA_PROPERTIES = {
+    "dimensions": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": f"报告维度（可选，最多{MAX_DIMENSIONS}个），例如 [\"DATE\", \"AD_UNIT_NAME\"]。指定后代替report_type的默认维度"
+    },
+    "columns": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": f"报告列（可选，最多{MAX_COLUMNS}个），例如 [\"AD_SERVER_IMPRESSIONS\", \"AD_SERVER_CPM_AND_CPC_REVENUE\"]。指定后代替report_type的默认列"
+    },
+    "dimension_filters": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "dimension": {"type": "string", "description": "过滤的维度，例如 ORDER_ID"},
+                "operator": {"type": "string", "enum": list(FILTER_OPERATORS), "default": "IN"},
+                "values": {"type": "array", "items": {"type": ["string", "integer"]}}
+            },
+            "required": ["dimension", "values"]
+        },
+        "description": "维度过滤条件（可选），多个条件之间为AND，在上游作业中执行"
+    }
+}
+
+
+def normalize_fields(values: Any, name: str, limit: int) -> List[str]:
+    """校验并规范化维度或列名（大写、去重、保持顺序）"""
+    if isinstance(values, str):
+        values = values.split(",")
+    if not isinstance(values, (list, tuple)):
+        raise ValueError(f"{name}必须是字符串数组")
+    fields = []
+    for value in values:
+        field = str(value).strip().upper()
+        if not _FIELD_PATTERN.match(field):
+            raise ValueError(f"无效的{name}: {value!r}")
+        if field not in fields:
+            fields.append(field)
+    if len(fields) > limit:
+        raise ValueError(f"{name}最多{limit}个，收到{len(fields)}个")
+    return fields
+
+
+def normalize_filters(filters: Any) -> List[Dict[str, Any]]:
+    """校验维度过滤条件，返回按维度排序的规范形式"""
+    if not filters:
+        return []
+    if not isinstance(filters, list):
+        raise ValueError("dimension_filters必须是数组")
+    normalized = []
+    for item in filters:
+        if not isinstance(item, dict):
+            raise ValueError("dimension_filters中的每一项必须是对象")
+        dimension = normalize_fields([item.get("dimension", "")], "过滤维度", 1)[0]
+        operator = str(item.get("operator") or "IN").upper()
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"不支持的过滤运算符: {operator}")
+        values = item.get("values")
+        if not isinstance(values, list):
+            values = [values]
+        values = [v for v in values if v is not None and v != ""]
+        if not values:
+            raise ValueError(f"维度 {dimension} 的过滤条件没有值")
+        if len(values) > MAX_FILTER_VALUES:
+            raise ValueError(f"维度 {dimension} 的过滤值最多{MAX_FILTER_VALUES}个")
+        if operator in ("EQUALS", "NOT_EQUALS", "CONTAINS") and len(values) != 1:
+            raise ValueError(f"{operator} 只能有一个值")
+        normalized.append({"dimension": dimension, "operator": operator, "values": values})
+    normalized.sort(key=lambda f: json.dumps(f, sort_keys=True, default=str))
+    return normalized
+
+
+def apply_legacy_filters(statement_builder, filters: List[Dict[str, Any]]):
+    """把过滤条件编译为带绑定变量的 PQL Where（旧版 ReportQuery.statement）"""
+    clauses = []
+    for i, item in enumerate(filters):
+        names = [f"f{i}_{j}" for j in range(len(item["values"]))]
+        for name, value in zip(names, item["values"]):
+            if item["operator"] == "CONTAINS":
+                value = f"%{value}%"
+            statement_builder.WithBindVariable(name, value)
+        placeholders = ", ".join(f":{name}" for name in names)
+        if item["operator"] == "EQUALS":
+            clauses.append(f"{item['dimension']} = :{names[0]}")
+        elif item["operator"] == "NOT_EQUALS":
+            clauses.append(f"{item['dimension']} != :{names[0]}")
+        elif item["operator"] == "CONTAINS":
+            clauses.append(f"{item['dimension']} LIKE :{names[0]}")
+        elif item["operator"] == "NOT_IN":
+            clauses.append(f"NOT {item['dimension']} IN ({placeholders})")
+        else:
+            clauses.append(f"{item['dimension']} IN ({placeholders})")
+    statement_builder.Where(" AND ".join(clauses))
+    # 报告语句不分页
+    statement_builder.limit = None
+    statement_builder.offset = None
+    return statement_builder
+
+
+def sdk_filters(filters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """新版SDK报告定义的 filters"""
+    operations = {"EQUALS": "IN", "NOT_EQUALS": "NOT_IN", "IN": "IN", "NOT_IN": "NOT_IN",
+                  "CONTAINS": "CONTAINS"}
+    return [
+        {
+            "field_filter": {
+                "field": {"dimension": item["dimension"]},
+                "operation": operations[item["operator"]],
+                "values": [{"int_value": v} if isinstance(v, int) else {"string_value": str(v)}
+                           for v in item["values"]]
+            }
+        }
+        for item in filters
+    ]
+
+
+def report_columns(header: List[str], dimensions: List[str], columns: List[str]) -> List[str]:
+    """请求在结果中对应的列：各维度（*_NAME 维度附带上游返回的 *_ID 列）和指标列
+
+    表头不是 Dimension.* / Column.* 形式时原样保留。
+    """
+    if not any(name.startswith(("Dimension.", "Column.")) for name in header):
+        return list(header)
+    wanted = []
+    for dimension in dimensions:
+        wanted.append(f"Dimension.{dimension}")
+        if dimension.endswith("_NAME"):
+            companion = f"Dimension.{dimension[:-len('_NAME')]}_ID"
+            if companion in header and companion not in dimensions:
+                wanted.append(companion)
+    return wanted + [f"Column.{c}" for c in columns]
+
+
+def select_columns(rows: Iterable[Dict[str, Any]], dimensions: List[str],
+                   columns: List[str]) -> Iterator[Dict[str, Any]]:
+    """流式选出请求对应的列，不做汇总"""
+    wanted = None
+    for row in rows:
+        if wanted is None:
+            wanted = report_columns(list(row), dimensions, columns)
+        yield {name: row.get(name) for name in wanted}
+
+
+def project_rows(rows: Iterable[Dict[str, Any]], dimensions: List[str],
+                 columns: List[str]) -> Iterator[Dict[str, Any]]:
+    """从更宽的结果投影出指定的维度和列，并按维度值对指标求和"""
+    return project_all(rows, [ReportRequest(dimensions, columns, None, None)])[0].rows()
+
+
+def project_all(rows: Iterable[Dict[str, Any]], requests: List["ReportRequest"]) -> List[ReportRollup]:
+    """一次流式读取更宽的结果，同时汇总出每个请求的投影"""
+    rollups = [ReportRollup() for _ in requests]
+    wanted = None
+    for row in rows:
+        if wanted is None:
+            header = list(row)
+            wanted = [report_columns(header, r.dimensions, r.columns) for r in requests]
+        for rollup, names in zip(rollups, wanted):
+            rollup.add({name: row.get(name) for name in names})
+    return rollups
+
+
+class ReportRequest:
+    """一次报告查询：维度、列、日期范围和过滤条件"""
+
+    __slots__ = ("dimensions", "columns", "start_date", "end_date", "filters")
+
+    def __init__(self, dimensions: List[str], columns: List[str], start_date: Optional[str],
+                 end_date: Optional[str], filters: Optional[List[Dict[str, Any]]] = None):
+        self.dimensions = list(dimensions)
+        self.columns = list(columns)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.filters = list(filters or [])
+
+    def group_key(self) -> str:
+        """可以合并的请求具有相同的日期范围和过滤条件"""
+        return json.dumps([self.start_date, self.end_date, self.filters], sort_keys=True, default=str)
+
+
+class _PlanGroup:
+    __slots__ = ("members", "closed", "done", "job", "projections", "error")
+
+    def __init__(self, request: ReportRequest):
+        self.members = [request]
+        self.closed = False
+        self.done = threading.Event()
+        self.job = None
+        # 与 members 一一对应的汇总结果
+        self.projections: List[ReportRollup] = []
+        self.error: Optional[BaseException] = None
+
+    def accepts(self, request: ReportRequest) -> bool:
+        if self.closed:
+            return False
+        if all(set(m.dimensions) == set(request.dimensions) for m in self.members):
+            return True
+        return all(is_additive(c) for m in self.members + [request] for c in m.columns)
+
+    def merged(self) -> ReportRequest:
+        """所有成员维度和列的并集"""
+        first = self.members[0]
+        dimensions: List[str] = []
+        columns: List[str] = []
+        for member in self.members:
+            dimensions.extend(d for d in member.dimensions if d not in dimensions)
+            columns.extend(c for c in member.columns if c not in columns)
+        return ReportRequest(dimensions, columns, first.start_date, first.end_date, first.filters)
+
+
+RunReport = Callable[[ReportRequest], Tuple[Dict[str, Any], Iterable[Dict[str, Any]]]]
+
+
+class ReportPlanner:
+    """合并窗口内到达的兼容报告请求（线程安全）"""
+
+    def __init__(self, window: float = DEFAULT_PLAN_WINDOW, sleep: Callable[[float], None] = time.sleep):
+        self.window = window
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._open: Dict[str, List[_PlanGroup]] = {}
+        self._running: Dict[str, int] = {}
+        self._jobs = 0
+        self._requests = 0
+        self._merged = 0
+
+    def execute(self, request: ReportRequest, run: RunReport) -> Tuple[Dict[str, Any], Iterable[Dict[str, Any]], int]:
+        """运行或加入一个合并作业，返回 (作业信息, 本请求的行, 合并的请求数)
+
+        run(request) 运行一个上游作业并返回 (作业信息, 行迭代器)。两条路径返回
+        相同的列（见 report_columns）；只有一个请求时逐行选列，保持流式处理。
+        """
+        key = request.group_key()
+        with self._lock:
+            self._requests += 1
+            running = self._running.get(key, 0)
+            self._running[key] = running + 1
+            groups = self._open.setdefault(key, [])
+            group = next((g for g in groups if g.accepts(request)), None)
+            index = 0
+            if group is not None:
+                index = len(group.members)
+                group.members.append(request)
+                self._merged += 1
+                leader = False
+            else:
+                self._jobs += 1
+                leader = True
+                # 没有其他相同范围的请求在运行时不太可能有请求加入，直接运行
+                if self.window > 0 and running:
+                    group = _PlanGroup(request)
+                    groups.append(group)
+            if not groups:
+                self._open.pop(key, None)
+        try:
+            return self._execute(key, request, group, leader, index, run)
+        finally:
+            with self._lock:
+                self._running[key] -= 1
+                if not self._running[key]:
+                    del self._running[key]
+
+    def _execute(self, key: str, request: ReportRequest, group: Optional[_PlanGroup], leader: bool,
+                 index: int, run: RunReport) -> Tuple[Dict[str, Any], Iterable[Dict[str, Any]], int]:
+        if not leader:
+            group.done.wait()
+            if group.error is not None:
+                raise group.error
+            return group.job, group.projections[index].rows(), len(group.members)
+
+        if group is not None:
+            self._sleep(self.window)
+            with self._lock:
+                group.closed = True
+                groups = self._open.get(key, [])
+                if group in groups:
+                    groups.remove(group)
+                if not groups:
+                    self._open.pop(key, None)
+
+        if group is None or len(group.members) == 1:
+            job, rows = run(request)
+            return job, select_columns(rows, request.dimensions, request.columns), 1
+
+        merged = group.merged()
+        print(f"🧮 合并{len(group.members)}个报告请求为一个作业: "
+              f"{len(merged.dimensions)}个维度, {len(merged.columns)}列", file=sys.stderr)
+        try:
+            group.job, rows = run(merged)
+            group.projections = project_all(rows, group.members)
+        except BaseException as e:
+            group.error = e
+            raise
+        finally:
+            group.done.set()
+        return group.job, group.projections[0].rows(), len(group.members)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "window": self.window,
+                "requests": self._requests,
+                "upstream_jobs": self._jobs,
+                "merged": self._merged
+            }
@@ -0,0 +1,109 @@
+"""
+字段投影 - list/get 操作只请求、转换和返回调用方需要的字段
+
+新版SDK通过 x-goog-fieldmask 请求元数据让服务端只返回这些字段；旧版
+get*ByStatement 总是返回完整实体，请求的字段都在 PQL 表中时（行项目、广告
+单元）改用 PublisherQueryLanguageService 的 SELECT 只取这些列，其余情况在
+本地只转换请求的字段。返回的实体总是包含 id。
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .entity_index import ENTITY_KINDS, plain_value, snake_case
+
+FIELDS_SCHEMA_PROPERTIES = {
+    "fields": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "只返回这些字段（可选，仅用于list、get和get_many操作），例如 [\"name\", \"status\"]。id总是返回。不提供时返回默认字段"
+    }
+}
+
+FIELD_MASK_HEADER = "x-goog-fieldmask"
+
+# 旧版 PQL 表及其列（字段名 → 列名），只列出与实体字段或过滤条件对应的列
+PQL_SERVICE = "PublisherQueryLanguageService"
+PQL_TABLES = {
+    "ad_unit": ("Ad_Unit", {
+        "id": "Id", "name": "Name", "parentId": "ParentId",
+        "lastModifiedDateTime": "LastModifiedDateTime"
+    }),
+    "line_item": ("Line_Item", {
+        "id": "Id", "name": "Name", "orderId": "OrderId", "status": "Status",
+        "lineItemType": "LineItemType", "costType": "CostType",
+        "startDateTime": "StartDateTime", "endDateTime": "EndDateTime",
+        "lastModifiedDateTime": "LastModifiedDateTime"
+    }),
+}
+
+_INTEGER = re.compile(r"^-?\d+$")
+
+
+def normalize_projection(kind: str, fields: Any) -> Optional[List[str]]:
+    """校验请求的字段，返回以 id 开头的字段列表；未请求投影时返回 None"""
+    if fields is None or fields == []:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    if not isinstance(fields, (list, tuple)):
+        raise ValueError("fields必须是字符串数组")
+    allowed = ENTITY_KINDS[kind].fields
+    projection = ["id"]
+    for field in fields:
+        field = str(field).strip()
+        if field not in allowed:
+            raise ValueError(f"{kind} 不支持字段 {field!r}，可用字段: {', '.join(allowed)}")
+        if field not in projection:
+            projection.append(field)
+    return projection
+
+
+def project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """在本地裁剪已转换的实体"""
+    if fields is None or record is None:
+        return record
+    return {field: record.get(field) for field in fields}
+
+
+def field_mask(kind: str, fields: List[str]) -> List[Tuple[str, str]]:
+    """新版SDK list 请求的响应字段掩码元数据"""
+    items_field = ENTITY_KINDS[kind].sdk_field
+    paths = [f"{items_field}.{snake_case(field)}" for field in fields] + ["next_page_token"]
+    return [(FIELD_MASK_HEADER, ",".join(paths))]
+
+
+def pql_columns(kind: str, fields: Optional[List[str]]) -> Optional[Tuple[str, Dict[str, str]]]:
+    """请求的字段都在 PQL 表中时返回 (表名, 字段→列)，否则返回 None"""
+    if fields is None or kind not in PQL_TABLES:
+        return None
+    table, columns = PQL_TABLES[kind]
+    if any(field not in columns for field in fields):
+        return None
+    return table, columns
+
+
+def pql_value(value: Any) -> Any:
+    """PQL Value（TextValue、NumberValue、DateTimeValue 等）转换为普通值"""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        raw = value.get("values", value.get("value"))
+        value_type = value.get("xsi_type")
+    else:
+        raw = getattr(value, "values", None)
+        if raw is None:
+            raw = getattr(value, "value", None)
+        value_type = type(value).__name__
+    if isinstance(raw, list):
+        return [pql_value(v) for v in raw]
+    # NumberValue 的值是字符串
+    if value_type == "NumberValue" and isinstance(raw, str) and _INTEGER.match(raw):
+        return int(raw)
+    return plain_value(raw)
+
+
+def pql_converter(kind: str, fields: List[str]):
+    """把 PQL 结果行（列名 → 值）转换为实体字段"""
+    columns = PQL_TABLES[kind][1]
+    return lambda row: {field: row.get(columns[field]) for field in fields}
@@ -0,0 +1,228 @@
+"""
+报告结果缓存 - 按规范化的报告查询缓存汇总结果到本地磁盘
+
+缓存键是维度、列、日期范围和网络代码的规范化哈希。Ad Manager 会在几天内
+修正近期数据，结束日期早于最终确定期限（与报告物化相同，默认3天）的范围
+不再变化，缓存时间远长于包含近期日期的范围。缓存按总大小做LRU淘汰，
+保存在磁盘上，服务重启后仍然有效。报告的列式文件保存在缓存目录的
+columnar 子目录中，随对应的缓存项一起删除。
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from .columnar import COLUMNAR_EXTENSIONS
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "GOOGLE_ADMANAGER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "mcp-admanager")
+)
+# 缓存总大小上限（字节）
+DEFAULT_MAX_BYTES = int(os.getenv("GOOGLE_ADMANAGER_REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# 早于今天这么多天的数据视为最终数据（报告缓存与报告物化共用）
+DEFAULT_FINAL_AFTER_DAYS = int(os.getenv("GOOGLE_ADMANAGER_ROLLUP_FINAL_AFTER_DAYS", "3"))
+# 包含近期日期或相对日期范围的报告缓存时间（秒）
+RECENT_TTL = int(os.getenv("GOOGLE_ADMANAGER_REPORT_CACHE_TTL", "900"))
+# 数据已最终确定的历史日期范围缓存时间（秒）
+HISTORICAL_TTL = int(os.getenv("GOOGLE_ADMANAGER_REPORT_CACHE_HISTORICAL_TTL", str(7 * 24 * 3600)))
+
+
+def report_cache_key(dimensions: List[str], columns: List[str], start_date: Optional[str],
+                     end_date: Optional[str], network_code: Optional[str],
+                     today: Optional[date] = None, shard_by: Optional[str] = None,
+                     filters: Optional[List[Dict[str, Any]]] = None) -> str:
+    """规范化报告查询并计算哈希
+
+    相对日期范围（未指定开始/结束日期）按当天日期区分，跨天后自动失效。
+    分片运行的报告结果带有分片信息，与不分片的结果分开缓存。
+    """
+    if start_date and end_date:
+        date_range = {"start": start_date, "end": end_date}
+    else:
+        date_range = {"relative": "LAST_7_DAYS", "as_of": (today or date.today()).isoformat()}
+    query = {
+        "dimensions": sorted(dimensions),
+        "columns": sorted(columns),
+        "date_range": date_range,
+        "network_code": network_code or "default"
+    }
+    if shard_by:
+        query["shard_by"] = shard_by
+    if filters:
+        query["filters"] = filters
+    canonical = json.dumps(query, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_closed_range(end_date: Optional[str], today: Optional[date] = None,
+                    final_after_days: int = DEFAULT_FINAL_AFTER_DAYS) -> bool:
+    """日期范围的数据是否已最终确定（结束日期早于今天减去最终确定期限）"""
+    if not end_date:
+        return False
+    try:
+        end = date.fromisoformat(end_date)
+    except ValueError:
+        return False
+    return end < (today or date.today()) - timedelta(days=final_after_days)
+
+
+class ReportCache:
+    """磁盘上的报告结果缓存，带TTL和按大小的LRU淘汰（线程安全）"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 recent_ttl: int = RECENT_TTL, historical_ttl: int = HISTORICAL_TTL,
+                 final_after_days: int = DEFAULT_FINAL_AFTER_DAYS):
+        self.directory = directory or os.path.join(DEFAULT_CACHE_DIR, "reports")
+        self.columnar_directory = os.path.join(self.directory, "columnar")
+        self.max_bytes = max_bytes
+        self.recent_ttl = recent_ttl
+        self.historical_ttl = historical_ttl
+        self.final_after_days = final_after_days
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def ttl_for(self, end_date: Optional[str], today: Optional[date] = None) -> int:
+        if is_closed_range(end_date, today, self.final_after_days):
+            return self.historical_ttl
+        return self.recent_ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取未过期的缓存项，命中时刷新其LRU时间"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._misses += 1
+                return None
+            if entry.get("expires_at", 0) <= time.time():
+                self._remove(path)
+                self._misses += 1
+                return None
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            self._hits += 1
+            return entry
+
+    def put(self, key: str, value: Dict[str, Any], ttl: int):
+        """写入缓存项（先写临时文件再替换），然后按大小淘汰"""
+        now = time.time()
+        entry = {"created_at": now, "expires_at": now + ttl, "value": value}
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            except OSError as e:
+                print(f"⚠️ 写入报告缓存失败: {e}", file=sys.stderr)
+                return
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp_path, self._path(key))
+            except BaseException as e:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                if not isinstance(e, (OSError, TypeError, ValueError)):
+                    raise
+                # 写缓存失败（磁盘或结果无法序列化）不影响报告本身
+                print(f"⚠️ 写入报告缓存失败: {e}", file=sys.stderr)
+                return
+            self._evict()
+
+    def clear(self) -> int:
+        """删除所有缓存项，返回删除数量"""
+        with self._lock:
+            entries = self._entries()
+            for path, _, _ in entries:
+                self._remove(path)
+            return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries()
+            return {
+                "directory": self.directory,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _entries(self):
+        """(路径, 大小, 最近使用时间) 列表
+
+        大小包含缓存项的列式文件；没有对应缓存项的列式文件单独作为一项，
+        使它们同样计入总大小并被淘汰。
+        """
+        entries = {}
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries[name[:-len(".json")]] = [path, st.st_size, st.st_mtime]
+        try:
+            names = os.listdir(self.columnar_directory)
+        except OSError:
+            names = []
+        extensions = tuple(COLUMNAR_EXTENSIONS.values())
+        for name in names:
+            if not name.endswith(extensions):
+                continue
+            try:
+                st = os.stat(os.path.join(self.columnar_directory, name))
+            except OSError:
+                continue
+            key = os.path.splitext(name)[0]
+            entry = entries.get(key)
+            if entry is None:
+                entries[key] = [self._path(key), st.st_size, st.st_mtime]
+            else:
+                entry[1] += st.st_size
+        return [tuple(entry) for entry in entries.values()]
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        # 最久未使用的先淘汰
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str):
+        key = os.path.basename(path)[:-len(".json")]
+        paths = [path] + [os.path.join(self.columnar_directory, key + ext)
+                          for ext in COLUMNAR_EXTENSIONS.values()]
+        for target in paths:
+            try:
+                os.remove(target)
+            except OSError:
+                pass
@@ -0,0 +1,169 @@
+"""
+报告流水线 - 提交报告作业、轮询状态、下载并解析结果
+
+作业状态按指数退避轮询；结果（gzip压缩的CSV）按块流式下载并逐行解压、
+解析为带类型的行，只保留汇总值和有限数量的预览行，不把整个报告读入内存。
+"""
+
+import codecs
+import csv
+import os
+import sys
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+EXPORT_FORMAT = "CSV_DUMP"
+
+# 轮询总超时（秒）
+DEFAULT_REPORT_TIMEOUT = int(os.getenv("GOOGLE_ADMANAGER_REPORT_TIMEOUT", "300"))
+INITIAL_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 30.0
+POLL_BACKOFF_FACTOR = 2.0
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 60
+DEFAULT_PREVIEW_ROWS = 20
+
+STATUS_COMPLETED = "COMPLETED"
+STATUS_FAILED = "FAILED"
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def normalize_status(status: Any) -> str:
+    """统一作业状态：新版SDK为枚举，旧版为字符串"""
+    name = getattr(status, "name", None) or str(status)
+    return name.rsplit(".", 1)[-1].upper()
+
+
+def wait_for_report(get_status: Callable[[], Any], timeout: Optional[float] = None,
+                    initial_interval: float = INITIAL_POLL_INTERVAL,
+                    max_interval: float = MAX_POLL_INTERVAL,
+                    sleep: Callable[[float], None] = time.sleep) -> str:
+    """按指数退避轮询作业状态，直到完成；失败或超时时抛出 ValueError"""
+    timeout = DEFAULT_REPORT_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+    while True:
+        status = normalize_status(get_status())
+        if status == STATUS_COMPLETED:
+            return status
+        if status == STATUS_FAILED:
+            raise ValueError("报告作业失败")
+        if time.monotonic() + interval > deadline:
+            raise ValueError(f"报告作业在{timeout}秒内未完成（当前状态: {status}）")
+        sleep(interval)
+        interval = min(interval * POLL_BACKOFF_FACTOR, max_interval)
+
+
+def stream_download(url: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    """按块下载报告文件"""
+    import urllib.request
+
+    with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_text_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """逐块解压（如为gzip）并解码，按行产出文本（保留换行符）"""
+    decompressor = None
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    first = True
+    pending = ""
+    for chunk in chunks:
+        if first:
+            if chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            first = False
+        data = decompressor.decompress(chunk) if decompressor else chunk
+        pending += decoder.decode(data)
+        # 最后一段可能不完整，留到下一块
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    if decompressor:
+        pending += decoder.decode(decompressor.flush())
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def parse_value(value: str) -> Any:
+    """把CSV字段转换为 int/float，无法转换时保留字符串"""
+    if value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def iter_report_rows(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """把报告文件解析为带类型的行，第一行为表头"""
+    reader = csv.reader(iter_text_lines(chunks))
+    header = next(reader, None)
+    if not header:
+        return
+    for values in reader:
+        if not values:
+            continue
+        yield {name: parse_value(value) for name, value in zip(header, values)}
+
+
+def tee_rows(rows: Iterable[Dict[str, Any]], sink: Callable[[Dict[str, Any]], None]) -> Iterator[Dict[str, Any]]:
+    """把每一行同时交给 sink"""
+    for row in rows:
+        sink(row)
+        yield row
+
+
+def summarize_rows(rows: Iterable[Dict[str, Any]],
+                   preview_rows: int = DEFAULT_PREVIEW_ROWS,
+                   sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """汇总报告行：行数、指标列合计和前 preview_rows 行预览
+
+    Ad Manager 的表头形如 Dimension.AD_UNIT_NAME / Column.AD_SERVER_CLICKS，
+    只对 Column.* 指标列求和；没有该前缀时对所有数值列求和。指定 sink 时
+    每一行同时交给它（例如写入列式文件）。
+    """
+    if sink is not None:
+        rows = tee_rows(rows, sink)
+    columns: List[str] = []
+    totals: Dict[str, Any] = {}
+    preview = []
+    row_count = 0
+    metric_columns = None
+    for row in rows:
+        if metric_columns is None:
+            columns = list(row)
+            metric_columns = [c for c in columns if c.startswith("Column.")] or columns
+        row_count += 1
+        if len(preview) < preview_rows:
+            preview.append(row)
+        for name in metric_columns:
+            value = row.get(name)
+            if isinstance(value, (int, float)):
+                totals[name] = totals.get(name, 0) + value
+    return {
+        "columns": columns,
+        "row_count": row_count,
+        "totals": totals,
+        "preview": preview,
+        "truncated": row_count > len(preview)
+    }
+
+
+def download_and_summarize(url: str, preview_rows: int = DEFAULT_PREVIEW_ROWS,
+                           sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """流式下载并汇总报告"""
+    print("⬇️ 正在下载报告结果", file=sys.stderr)
+    return summarize_rows(iter_report_rows(stream_download(url)), preview_rows, sink)
@@ -0,0 +1,453 @@
+"""
+报告物化 - 在SQLite中按天保存报告行，按需或定时只补齐缺失和未最终确定的日期
+
+每个物化报告（视图）由名称、维度、列和过滤条件定义。刷新时找出范围内缺失
+的日期和尚未最终确定的近期日期，把连续的日期合并为一个带 DATE 维度的上游
+作业，再按天替换本地的行。周、月和任意日期范围的查询直接在本地按天聚合，
+不再创建上游作业。Ad Manager 会在几天内修正近期数据，早于
+GOOGLE_ADMANAGER_ROLLUP_FINAL_AFTER_DAYS 天的日期视为最终数据，不再刷新。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .planner import ReportRequest, is_additive
+from .report_cache import DEFAULT_CACHE_DIR, DEFAULT_FINAL_AFTER_DAYS
+from .scheduler import PRIORITY_BULK, request_priority
+
+DEFAULT_ROLLUP_PATH = os.getenv(
+    "GOOGLE_ADMANAGER_ROLLUP_PATH", os.path.join(DEFAULT_CACHE_DIR, "report_rollups.sqlite3")
+)
+# 未最终确定的日期至少间隔多少秒才重新拉取
+DEFAULT_REFETCH_INTERVAL = int(os.getenv("GOOGLE_ADMANAGER_ROLLUP_REFETCH_INTERVAL", "900"))
+# 后台刷新所有视图的间隔（秒），为0时不在后台刷新
+DEFAULT_REFRESH_INTERVAL = int(os.getenv("GOOGLE_ADMANAGER_ROLLUP_REFRESH_INTERVAL", "3600"))
+DEFAULT_TRAILING_DAYS = 30
+MAX_TRAILING_DAYS = 400
+# 一个上游作业最多覆盖的天数
+MAX_SPAN_DAYS = 31
+
+GRANULARITY_TOTAL = "total"
+GRANULARITY_DAY = "day"
+GRANULARITY_WEEK = "week"
+GRANULARITY_MONTH = "month"
+GRANULARITIES = (GRANULARITY_TOTAL, GRANULARITY_DAY, GRANULARITY_WEEK, GRANULARITY_MONTH)
+
+# SQLite 中把日期归到所在的周（周一）或月
+_PERIOD_SQL = {
+    GRANULARITY_TOTAL: "NULL",
+    GRANULARITY_DAY: "day",
+    GRANULARITY_WEEK: "date(day, 'weekday 0', '-6 days')",
+    GRANULARITY_MONTH: "substr(day, 1, 7)",
+}
+
+DEFAULT_QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 10000
+
+DATE_DIMENSION = "DATE"
+
+
+def _parse_day(value: str, name: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}格式应为YYYY-MM-DD: {value}")
+
+
+def _days(start: date, end: date) -> List[str]:
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def contiguous_spans(days: Iterable[str], max_days: int = MAX_SPAN_DAYS) -> List[Tuple[str, str]]:
+    """把日期合并为连续的 (开始, 结束) 区间，每段不超过 max_days 天"""
+    spans = []
+    start = previous = None
+    for day in sorted(date.fromisoformat(d) for d in days):
+        if start is not None and day == previous + timedelta(days=1) and (day - start).days < max_days:
+            previous = day
+            continue
+        if start is not None:
+            spans.append((start.isoformat(), previous.isoformat()))
+        start = previous = day
+    if start is not None:
+        spans.append((start.isoformat(), previous.isoformat()))
+    return spans
+
+
+def view_id(dimensions: List[str], columns: List[str], filters: List[Dict[str, Any]]) -> str:
+    canonical = json.dumps({"dimensions": dimensions, "columns": columns, "filters": filters},
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class RollupStore:
+    """按天保存的报告行（线程安全）"""
+
+    def __init__(self, path: str = DEFAULT_ROLLUP_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rollup_views (
+                    name TEXT PRIMARY KEY,
+                    view_id TEXT NOT NULL,
+                    definition TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS rollup_days (
+                    view_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    final INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    PRIMARY KEY (view_id, day)
+                );
+                CREATE TABLE IF NOT EXISTS rollup_rows (
+                    view_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    dims TEXT NOT NULL,
+                    metrics TEXT NOT NULL,
+                    PRIMARY KEY (view_id, day, dims)
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    def define(self, name: str, definition: Dict[str, Any]) -> Dict[str, Any]:
+        """保存视图定义；同名视图的定义改变时删除不再被引用的旧数据"""
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT view_id FROM rollup_views WHERE name = ?", (name,)).fetchone()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rollup_views (name, view_id, definition, created_at) VALUES (?, ?, ?, ?)",
+                    (name, definition["view_id"], json.dumps(definition), time.time())
+                )
+                if old and old[0] != definition["view_id"]:
+                    self._drop_unreferenced(conn, old[0])
+        return definition
+
+    def view(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT definition FROM rollup_views WHERE name = ?", (name,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def views(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT definition FROM rollup_views ORDER BY name"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete(self, name: str) -> bool:
+        """删除视图；没有其他同定义视图引用时一并删除按天数据"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT view_id FROM rollup_views WHERE name = ?", (name,)).fetchone()
+            if not row:
+                return False
+            with conn:
+                conn.execute("DELETE FROM rollup_views WHERE name = ?", (name,))
+                self._drop_unreferenced(conn, row[0])
+            return True
+
+    def _drop_unreferenced(self, conn: sqlite3.Connection, vid: str):
+        if not conn.execute("SELECT 1 FROM rollup_views WHERE view_id = ?", (vid,)).fetchone():
+            conn.execute("DELETE FROM rollup_days WHERE view_id = ?", (vid,))
+            conn.execute("DELETE FROM rollup_rows WHERE view_id = ?", (vid,))
+
+    def day_states(self, vid: str, start: str, end: str) -> Dict[str, Tuple[bool, float]]:
+        """范围内已拉取日期的 (是否最终, 拉取时间)"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT day, final, fetched_at FROM rollup_days WHERE view_id = ? AND day BETWEEN ? AND ?",
+                (vid, start, end)
+            ).fetchall()
+        return {day: (bool(final), fetched_at) for day, final, fetched_at in rows}
+
+    def replace_days(self, vid: str, days: List[str], rows: Dict[str, List[Tuple[str, str]]],
+                     final_before: str):
+        """在一个事务中替换这些日期的行并记录拉取状态"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for day in days:
+                    conn.execute("DELETE FROM rollup_rows WHERE view_id = ? AND day = ?", (vid, day))
+                    day_rows = rows.get(day, [])
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO rollup_rows (view_id, day, dims, metrics) VALUES (?, ?, ?, ?)",
+                        [(vid, day, dims, metrics) for dims, metrics in day_rows]
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO rollup_days (view_id, day, final, fetched_at, row_count) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (vid, day, int(day < final_before), now, len(day_rows))
+                    )
+
+    def aggregate(self, view: Dict[str, Any], start: str, end: str, granularity: str,
+                  limit: int, offset: int) -> Dict[str, Any]:
+        """在本地按周期和维度值对指标求和"""
+        period = _PERIOD_SQL[granularity]
+        sums = ", ".join(f"SUM(json_extract(metrics, '$[{i}]'))" for i in range(len(view["columns"])))
+        where = "WHERE view_id = ? AND day BETWEEN ? AND ?"
+        params = (view["view_id"], start, end)
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                f"SELECT {period} AS period, dims, {sums} FROM rollup_rows {where} "
+                f"GROUP BY period, dims ORDER BY period, dims LIMIT ? OFFSET ?",
+                params + (limit, offset)
+            ).fetchall()
+            groups = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM rollup_rows {where} GROUP BY {period}, dims)", params
+            ).fetchone()[0]
+            totals = conn.execute(f"SELECT {sums} FROM rollup_rows {where}", params).fetchone()
+        dimension_names = [f"Dimension.{d}" for d in view["dimensions"]]
+        column_names = [f"Column.{c}" for c in view["columns"]]
+        results = []
+        for row in rows:
+            record = {"period": row[0]} if granularity != GRANULARITY_TOTAL else {}
+            record.update(zip(dimension_names, json.loads(row[1])))
+            record.update(zip(column_names, row[2:]))
+            results.append(record)
+        next_offset = offset + len(results)
+        return {
+            "rows": results,
+            "total_groups": groups,
+            "totals": {name: value for name, value in zip(column_names, totals) if value is not None},
+            "offset": offset,
+            "next_offset": next_offset if next_offset < groups else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT v.name, COUNT(d.day), SUM(d.final), SUM(d.row_count), MIN(d.day), MAX(d.day) "
+                "FROM rollup_views v LEFT JOIN rollup_days d ON d.view_id = v.view_id "
+                "GROUP BY v.name ORDER BY v.name"
+            ).fetchall()
+        return {
+            name: {
+                "days": days,
+                "final_days": final or 0,
+                "rows": row_count or 0,
+                "first_day": first,
+                "last_day": last
+            }
+            for name, days, final, row_count, first, last in rows
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# run_report(request) 运行一个上游作业并返回 (作业信息, 行迭代器)
+RunReport = Callable[[ReportRequest], Tuple[Dict[str, Any], Iterable[Dict[str, Any]]]]
+
+
+class RollupMaterializer:
+    """补齐物化报告的按天数据，并在后台保持近期日期新鲜"""
+
+    def __init__(self, store: RollupStore, run_report: RunReport, today: Callable[[], date],
+                 final_after_days: int = DEFAULT_FINAL_AFTER_DAYS,
+                 refetch_interval: int = DEFAULT_REFETCH_INTERVAL,
+                 refresh_interval: int = DEFAULT_REFRESH_INTERVAL):
+        self.store = store
+        self.run_report = run_report
+        self.today = today
+        self.final_after_days = final_after_days
+        self.refetch_interval = refetch_interval
+        self.refresh_interval = refresh_interval
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._timer = None
+        self._timer_lock = threading.Lock()
+        self._last_error: Optional[str] = None
+
+    def define(self, name: str, dimensions: List[str], columns: List[str],
+               filters: List[Dict[str, Any]], trailing_days: int = DEFAULT_TRAILING_DAYS) -> Dict[str, Any]:
+        if not name:
+            raise ValueError("必须提供name")
+        if DATE_DIMENSION in dimensions:
+            raise ValueError("物化报告已按天保存，dimensions中不需要DATE")
+        if not columns:
+            raise ValueError("物化报告至少需要一列")
+        non_additive = [c for c in columns if not is_additive(c)]
+        if non_additive:
+            raise ValueError(f"物化报告只支持可相加的列，不支持: {', '.join(non_additive)}")
+        if not 1 <= trailing_days <= MAX_TRAILING_DAYS:
+            raise ValueError(f"trailing_days应在1到{MAX_TRAILING_DAYS}之间")
+        return self.store.define(name, {
+            "name": name,
+            "view_id": view_id(dimensions, columns, filters),
+            "dimensions": dimensions,
+            "columns": columns,
+            "filters": filters,
+            "trailing_days": trailing_days
+        })
+
+    def view(self, name: str) -> Dict[str, Any]:
+        view = self.store.view(name)
+        if view is None:
+            raise ValueError(f"物化报告不存在: {name}")
+        return view
+
+    def date_range(self, view: Dict[str, Any], start_date: Optional[str],
+                   end_date: Optional[str]) -> Tuple[str, str]:
+        """默认是截至今天的 trailing_days 天；结束日期不晚于今天"""
+        today = self.today()
+        end = min(_parse_day(end_date, "end_date"), today) if end_date else today
+        start = (_parse_day(start_date, "start_date") if start_date
+                 else end - timedelta(days=view["trailing_days"] - 1))
+        if end < start:
+            raise ValueError("end_date不能早于start_date")
+        return start.isoformat(), end.isoformat()
+
+    def pending_days(self, view: Dict[str, Any], start: str, end: str) -> List[str]:
+        """缺失的日期和超过重新拉取间隔的未最终日期"""
+        states = self.store.day_states(view["view_id"], start, end)
+        now = time.time()
+        pending = []
+        for day in _days(date.fromisoformat(start), date.fromisoformat(end)):
+            state = states.get(day)
+            if state is None or (not state[0] and now - state[1] >= self.refetch_interval):
+                pending.append(day)
+        return pending
+
+    def refresh(self, name: str, start_date: Optional[str] = None,
+                end_date: Optional[str] = None) -> Dict[str, Any]:
+        """只拉取缺失或未最终确定的日期，连续的日期合并为一个作业"""
+        view = self.view(name)
+        start, end = self.date_range(view, start_date, end_date)
+        with self._view_lock(view["view_id"]), request_priority(PRIORITY_BULK):
+            pending = self.pending_days(view, start, end)
+            spans = contiguous_spans(pending)
+            final_before = (self.today() - timedelta(days=self.final_after_days)).isoformat()
+            jobs = []
+            for span_start, span_end in spans:
+                job, rows = self.run_report(ReportRequest(
+                    [DATE_DIMENSION] + view["dimensions"], view["columns"],
+                    span_start, span_end, view["filters"]
+                ))
+                by_day = self._split_days(view, rows)
+                days = _days(date.fromisoformat(span_start), date.fromisoformat(span_end))
+                self.store.replace_days(view["view_id"], days, by_day, final_before)
+                jobs.append({"start_date": span_start, "end_date": span_end, "job": job,
+                             "rows": sum(len(r) for r in by_day.values())})
+            if pending:
+                print(f"📥 物化报告 {name}: 补齐{len(pending)}天，{len(spans)}个作业", file=sys.stderr)
+            return {
+                "name": name,
+                "start_date": start,
+                "end_date": end,
+                "fetched_days": len(pending),
+                "jobs": jobs
+            }
+
+    def query(self, name: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+              granularity: str = GRANULARITY_TOTAL, refresh: bool = True,
+              limit: int = DEFAULT_QUERY_LIMIT, offset: int = 0) -> Dict[str, Any]:
+        """在本地聚合按天数据；refresh 为 true 时先补齐范围内缺失的日期"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"不支持的聚合粒度: {granularity}")
+        view = self.view(name)
+        start, end = self.date_range(view, start_date, end_date)
+        refreshed = self.refresh(name, start, end) if refresh else None
+        limit = min(max(0, DEFAULT_QUERY_LIMIT if limit is None else limit), MAX_QUERY_LIMIT)
+        result = self.store.aggregate(view, start, end, granularity, limit, max(0, offset or 0))
+        self.start_background()
+        return {
+            "name": name,
+            "start_date": start,
+            "end_date": end,
+            "granularity": granularity,
+            "fetched_days": refreshed["fetched_days"] if refreshed else 0,
+            "missing_days": 0 if refresh else len(self.pending_days(view, start, end)),
+            **result
+        }
+
+    def start_background(self):
+        if self.refresh_interval <= 0:
+            return
+        with self._timer_lock:
+            if self._timer is None:
+                self._schedule()
+
+    def stop_background(self):
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.store.path,
+            "final_after_days": self.final_after_days,
+            "refresh_interval": self.refresh_interval,
+            "background_refresh": self._timer is not None,
+            "last_error": self._last_error,
+            "views": self.store.stats()
+        }
+
+    def _split_days(self, view: Dict[str, Any], rows: Iterable[Dict[str, Any]]) -> Dict[str, List[Tuple[str, str]]]:
+        """把带 DATE 维度的行按天分组为 (维度JSON, 指标JSON)"""
+        date_name = f"Dimension.{DATE_DIMENSION}"
+        dimension_names = [f"Dimension.{d}" for d in view["dimensions"]]
+        column_names = [f"Column.{c}" for c in view["columns"]]
+        by_day: Dict[str, Dict[str, List[Any]]] = {}
+        for row in rows:
+            day = str(row.get(date_name))
+            dims = json.dumps([row.get(name) for name in dimension_names], ensure_ascii=False)
+            metrics = [row.get(name) for name in column_names]
+            current = by_day.setdefault(day, {}).get(dims)
+            if current is None:
+                by_day[day][dims] = metrics
+            else:
+                for i, value in enumerate(metrics):
+                    if isinstance(value, (int, float)):
+                        current[i] = value if current[i] is None else current[i] + value
+        return {
+            day: [(dims, json.dumps(metrics)) for dims, metrics in groups.items()]
+            for day, groups in by_day.items()
+        }
+
+    def _view_lock(self, vid: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(vid, threading.Lock())
+
+    def _schedule(self):
+        self._timer = threading.Timer(self.refresh_interval, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        for view in self.store.views():
+            try:
+                self.refresh(view["name"])
+                self._last_error = None
+            except Exception as e:
+                self._last_error = f"{view['name']}: {e}"
+                print(f"⚠️ 物化报告后台刷新失败 {view['name']}: {e}", file=sys.stderr)
+        with self._timer_lock:
+            if self._timer is not None:
+                self._schedule()
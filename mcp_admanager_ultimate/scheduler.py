@@ -0,0 +1,315 @@
+"""
+请求调度 - 所有Ad Manager服务调用的令牌桶限流、优先级排队和重试
+
+每次服务调用都要从所属服务的令牌桶和所属网络的令牌桶各取一个令牌。令牌
+不足时请求按优先级排队：交互式的 get 请求排在批量列表和报告作业之前。
+遇到配额错误或临时错误时按带抖动的指数退避自动重试。创建、运行作业等
+非幂等的调用只在错误能证明请求未被执行时（配额、限流）重试，超时或服务端
+错误时请求可能已经生效，重试会产生重复的实体。后台作业被取消后，下一次
+调用在排队前停止。
+"""
+
+import contextlib
+import contextvars
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .jobs import raise_if_cancelled
+from .metrics import get_metrics_registry
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+# 每个网络每秒请求数和突发容量
+DEFAULT_NETWORK_RATE = float(os.getenv("GOOGLE_ADMANAGER_RATE_LIMIT", "8"))
+DEFAULT_NETWORK_BURST = int(os.getenv("GOOGLE_ADMANAGER_RATE_BURST", "8"))
+# 每个服务每秒请求数和突发容量
+DEFAULT_SERVICE_RATE = float(os.getenv("GOOGLE_ADMANAGER_SERVICE_RATE_LIMIT", "4"))
+DEFAULT_SERVICE_BURST = int(os.getenv("GOOGLE_ADMANAGER_SERVICE_RATE_BURST", "4"))
+
+DEFAULT_MAX_RETRIES = int(os.getenv("GOOGLE_ADMANAGER_MAX_RETRIES", "4"))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 16.0
+
+# 可重试的异常类型名（google-api-core / requests / 标准库），按名字匹配避免导入SDK
+RETRYABLE_ERROR_TYPES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "BadGateway", "GatewayTimeout", "Aborted",
+    "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout", "TimeoutError",
+    "ConnectionResetError",
+}
+# 旧版 SOAP 错误原因
+RETRYABLE_ERROR_REASONS = (
+    "QuotaError.EXCEEDED_QUOTA", "QuotaError.REPORT_JOB_LIMIT", "ServerError.SERVER_ERROR",
+    "ServerError.SERVER_BUSY", "CommonError.CONCURRENT_MODIFICATION", "RESOURCE_EXHAUSTED",
+)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 能证明请求在执行前被拒绝的错误，非幂等的调用也可以重试
+REJECTED_ERROR_TYPES = {"ResourceExhausted", "TooManyRequests", "ConnectTimeout"}
+REJECTED_ERROR_REASONS = (
+    "QuotaError.EXCEEDED_QUOTA", "QuotaError.REPORT_JOB_LIMIT", "RESOURCE_EXHAUSTED",
+    "CommonError.CONCURRENT_MODIFICATION",
+)
+REJECTED_STATUS_CODES = {429}
+
+# 只读方法的名称前缀（旧版 getXxx / 新版 get_xxx、list_xxx 等），其余方法视为非幂等
+READ_METHOD_PREFIXES = ("get", "list", "select", "fetch", "search")
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar(
+    "admanager_request_priority", default=PRIORITY_NORMAL
+)
+
+
+@contextlib.contextmanager
+def request_priority(priority: int):
+    """在当前上下文中设置服务调用的优先级"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def priority_for(tool_name: str, action: Optional[str]) -> int:
+    """按工具和操作确定优先级"""
+    if tool_name in ("generate_report", "export_entities"):
+        return PRIORITY_BULK
+    if action in ("get", "get_many", "get_current", "status", "tree", "path"):
+        return PRIORITY_INTERACTIVE
+    if action in ("list", "list_all", "sync", "bulk_create", "refresh"):
+        return PRIORITY_BULK
+    return PRIORITY_NORMAL
+
+
+def is_read_method(method: str) -> bool:
+    return method.lower().startswith(READ_METHOD_PREFIXES)
+
+
+def _matches_error(error: Exception, types: set, reasons: Tuple[str, ...], codes: set) -> bool:
+    for cls in type(error).__mro__:
+        if cls.__name__ in types:
+            return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in codes:
+        return True
+    message = str(error)
+    return any(reason in message for reason in reasons)
+
+
+def is_transient(error: Optional[BaseException]) -> bool:
+    """配额错误或临时错误，包括重试耗尽后抛出的包装异常"""
+    while error is not None:
+        if _matches_error(error, RETRYABLE_ERROR_TYPES, RETRYABLE_ERROR_REASONS, RETRYABLE_STATUS_CODES):
+            return True
+        error = error.__cause__
+    return False
+
+
+def is_retryable(error: Exception, method: Optional[str] = None) -> bool:
+    """只读方法遇到配额错误和临时错误可以重试；其他方法只在请求被拒绝时重试
+
+    method 为 None 时按只读方法处理。
+    """
+    if method is None or is_read_method(method):
+        return _matches_error(error, RETRYABLE_ERROR_TYPES, RETRYABLE_ERROR_REASONS, RETRYABLE_STATUS_CODES)
+    return _matches_error(error, REJECTED_ERROR_TYPES, REJECTED_ERROR_REASONS, REJECTED_STATUS_CODES)
+
+
+class TokenBucket:
+    """令牌桶（由调度器加锁保护）"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """距离有一个可用令牌还需等待的秒数"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "service", "network", "granted")
+
+    def __init__(self, priority: int, seq: int, service: str, network: str):
+        self.priority = priority
+        self.seq = seq
+        self.service = service
+        self.network = network
+        self.granted = False
+
+
+class RequestScheduler:
+    """按服务和网络限流的优先级调度器（线程安全）"""
+
+    def __init__(self, network_rate: float = DEFAULT_NETWORK_RATE,
+                 network_burst: int = DEFAULT_NETWORK_BURST,
+                 service_rate: float = DEFAULT_SERVICE_RATE,
+                 service_burst: int = DEFAULT_SERVICE_BURST,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.network_rate = network_rate
+        self.network_burst = network_burst
+        self.service_rate = service_rate
+        self.service_burst = service_burst
+        self.max_retries = max_retries
+        self._sleep = sleep
+        self._metrics = get_metrics_registry()
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: List[_Waiter] = []
+        self._network_buckets: Dict[str, TokenBucket] = {}
+        self._service_buckets: Dict[str, TokenBucket] = {}
+        self._calls = 0
+        self._retries = 0
+        self._failures = 0
+        self._throttled = 0
+
+    def call(self, service: str, network: str, fn: Callable, *args, **kwargs) -> Any:
+        """限流后执行服务调用，配额错误和临时错误自动重试"""
+        return self.call_method(service, network, getattr(fn, "__name__", "call"), fn, *args, **kwargs)
+
+    def call_method(self, service: str, network: str, method: str, fn: Callable,
+                    *args, **kwargs) -> Any:
+        """同 call，method 为指标中记录的方法名"""
+        attempt = 0
+        while True:
+            raise_if_cancelled()
+            with self._metrics.timer("api_queue_wait", service=service):
+                self.acquire(service, network)
+            try:
+                with self._metrics.timer("api_call", service=service, method=method):
+                    result = fn(*args, **kwargs)
+                with self._cond:
+                    self._calls += 1
+                return result
+            except Exception as e:
+                if not is_retryable(e, method):
+                    raise
+                with self._cond:
+                    self._calls += 1
+                    if attempt >= self.max_retries:
+                        self._failures += 1
+                    else:
+                        self._retries += 1
+                if attempt >= self.max_retries:
+                    raise ValueError(
+                        f"{service} 调用在重试{self.max_retries}次后仍失败（配额或临时错误）: {e}"
+                    ) from e
+                # 全抖动退避，避免并发请求同时重试
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+                print(f"⏳ {service} 调用失败，{delay:.1f}秒后重试 ({attempt + 1}/{self.max_retries}): {e}",
+                      file=sys.stderr)
+                self._sleep(delay)
+                attempt += 1
+
+    def acquire(self, service: str, network: str):
+        """按当前上下文的优先级排队，直到取得服务和网络令牌"""
+        with self._cond:
+            waiter = _Waiter(_current_priority.get(), next(self._seq), service, network)
+            self._waiting.append(waiter)
+            self._waiting.sort(key=lambda w: (w.priority, w.seq))
+            throttled = False
+            while True:
+                wait, granted = self._grant(time.monotonic())
+                if granted:
+                    # 唤醒本次一并放行的其他等待者
+                    self._cond.notify_all()
+                if waiter.granted:
+                    if throttled:
+                        self._throttled += 1
+                    return
+                throttled = True
+                self._cond.wait(timeout=wait)
+
+    def _grant(self, now: float) -> Tuple[Optional[float], int]:
+        """按优先级放行能取得令牌的等待者
+
+        返回 (下一次可能放行前的等待时间, 本次放行的数量)。
+        """
+        blocked_services = set()
+        blocked_networks = set()
+        min_wait = None
+        granted = 0
+        for waiter in list(self._waiting):
+            # 同一服务/网络中排在前面的请求未放行时，后面的请求不能插队
+            if waiter.service in blocked_services or waiter.network in blocked_networks:
+                continue
+            network_bucket = self._bucket(self._network_buckets, waiter.network,
+                                          self.network_rate, self.network_burst)
+            service_bucket = self._bucket(self._service_buckets, waiter.service,
+                                          self.service_rate, self.service_burst)
+            network_wait = network_bucket.wait_time(now)
+            service_wait = service_bucket.wait_time(now)
+            if network_wait == 0 and service_wait == 0:
+                network_bucket.take()
+                service_bucket.take()
+                waiter.granted = True
+                self._waiting.remove(waiter)
+                granted += 1
+                continue
+            if network_wait > 0:
+                blocked_networks.add(waiter.network)
+            if service_wait > 0:
+                blocked_services.add(waiter.service)
+            wait = max(network_wait, service_wait)
+            min_wait = wait if min_wait is None else min(min_wait, wait)
+        return min_wait, granted
+
+    @staticmethod
+    def _bucket(buckets: Dict[str, TokenBucket], key: str, rate: float, burst: int) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "network_rate": self.network_rate,
+                "service_rate": self.service_rate,
+                "max_retries": self.max_retries,
+                "waiting": len(self._waiting),
+                "calls": self._calls,
+                "throttled": self._throttled,
+                "retries": self._retries,
+                "failures": self._failures
+            }
+
+
+class ScheduledService:
+    """服务客户端代理：公开方法的调用都经过调度器"""
+
+    def __init__(self, service, name: str, network: str, scheduler: RequestScheduler):
+        self._service = service
+        self._name = name
+        self._network = network
+        self._scheduler = scheduler
+
+    def __getattr__(self, attr):
+        value = getattr(self._service, attr)
+        if attr.startswith("_") or not callable(value):
+            return value
+
+        def scheduled(*args, **kwargs):
+            return self._scheduler.call_method(self._name, self._network, attr, value, *args, **kwargs)
+
+        return scheduled
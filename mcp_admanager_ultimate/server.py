@@ -4,31 +4,156 @@ MCP Ad Manager 增强终极优化版服务器 - 包含所有Ad Manager功能
 支持网络管理、库存管理、订单管理、行项目管理、创意管理等完整功能
 """
 
+import functools
 import os
 import sys
-import json
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
-# Google Ad Manager imports
-try:
-    from google.ads.admanager.client import AdManagerClient
-    from google.ads.admanager.errors import AdManagerReportError
-    from google.ads.admanager import StatementBuilder
-    ADMANAGER_AVAILABLE = True
-except ImportError:
-    # 如果google-ads-admanager不可用，尝试使用google-ads
-    ADMANAGER_AVAILABLE = False
+from .credentials import get_credential_manager
+from .batch import (
+    CREATE_METHODS,
+    IDS_SCHEMA_PROPERTIES,
+    ITEMS_SCHEMA_PROPERTIES,
+    MAX_IDS_PER_FILTER,
+    MAX_IDS_PER_STATEMENT,
+    bulk_create,
+    fetch_in_chunks,
+    match_ids,
+    normalize_ids,
+    validate_create_specs,
+)
+from .clients import ServiceClientRegistry
+from .columnar import (
+    COLUMNAR_FORMATS,
+    DEFAULT_QUERY_LIMIT,
+    MAX_QUERY_LIMIT,
+    ColumnarWriter,
+    columnar_path,
+    query_columnar,
+)
+from .coalescing import SingleFlight, coalesce_key
+from .dispatcher import serve
+from .entity_index import (
+    DEFAULT_SOURCE,
+    ENTITY_KINDS,
+    SOURCE_INDEX,
+    SOURCE_SCHEMA_PROPERTIES,
+    EntityIndex,
+    EntitySynchronizer,
+)
+from .export import EXPORT_FORMATS, FORMAT_NDJSON, EntityExport, default_export_path
+from .hierarchy import DEFAULT_TREE_DEPTH, HIERARCHY_SCHEMA_PROPERTIES, AdUnitTree
+from .jobs import (
+    BACKGROUND_SCHEMA_PROPERTIES,
+    DEFAULT_LIST_LIMIT as DEFAULT_JOB_LIST_LIMIT,
+    JOB_STATES,
+    MAX_LIST_LIMIT as MAX_JOB_LIST_LIMIT,
+    MAX_WAIT_SECONDS,
+    JobManager,
+    JobStore,
+    cancel_requested,
+    result_error,
+    was_interrupted,
+)
+from .metrics import DEFAULT_METRICS_FILE, get_metrics_registry
+from .network_cache import KEY_ALL, KEY_CURRENT, NetworkMetadataCache, network_today
+from .output import OutputFormatter
+from .planner import (
+    MAX_COLUMNS,
+    MAX_DIMENSIONS,
+    REPORT_QUERY_SCHEMA_PROPERTIES,
+    ReportPlanner,
+    ReportRequest,
+    apply_legacy_filters,
+    normalize_fields,
+    normalize_filters,
+    sdk_filters,
+)
+from .entity_filters import (
+    FILTER_SCHEMA_PROPERTIES,
+    OP_EQUALS,
+    apply_legacy_filter,
+    index_where,
+    normalize_filter,
+    normalize_order_by,
+    referenced_fields,
+    sdk_list_params,
+)
+from .pagination import (
+    DEFAULT_MAX_ITEMS,
+    PAGINATION_SCHEMA_PROPERTIES,
+    PqlPaginator,
+    SdkPaginator,
+    StatementPaginator,
+    decode_offset_token,
+    encode_offset_token,
+)
+from .projection import (
+    FIELDS_SCHEMA_PROPERTIES,
+    PQL_SERVICE,
+    field_mask,
+    normalize_projection,
+    pql_columns,
+    pql_converter,
+    pql_value,
+    project,
+)
+from .report_cache import ReportCache, report_cache_key
+from .rollups import (
+    DEFAULT_QUERY_LIMIT as DEFAULT_ROLLUP_QUERY_LIMIT,
+    DEFAULT_TRAILING_DAYS,
+    GRANULARITIES,
+    GRANULARITY_TOTAL,
+    MAX_TRAILING_DAYS,
+    RollupMaterializer,
+    RollupStore,
+)
+from .scheduler import PRIORITY_BULK, RequestScheduler, priority_for, request_priority
+from .sharding import (
+    DEFAULT_SHARD_CACHE_MAX_BYTES,
+    DEFAULT_SHARD_CONCURRENCY,
+    SHARD_SCHEMA_PROPERTIES,
+    ReportRollup,
+    check_additive,
+    merge_shard_rows,
+    run_shards,
+    split_date_range,
+)
+from .reports import (
+    DEFAULT_PREVIEW_ROWS,
+    DEFAULT_REPORT_TIMEOUT,
+    EXPORT_FORMAT,
+    iter_report_rows,
+    stream_download,
+    summarize_rows,
+    wait_for_report,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def load_admanager_sdk():
+    """首次需要时导入Ad Manager SDK并缓存检测结果
+
+    返回 (后端名称, AdManagerClient类)，都不可用时返回 (None, None)。
+    SDK导入较慢，延迟到第一次工具调用，不影响 initialize 握手。
+    """
+    try:
+        # 尝试使用新的 google-ads-admanager
+        from google.ads.admanager.client import AdManagerClient
+        return "google-ads-admanager", AdManagerClient
+    except ImportError:
+        pass
     try:
+        # 如果google-ads-admanager不可用，尝试使用googleads
         from googleads import ad_manager
-        ADMANAGER_AVAILABLE = True
+        return "googleads", ad_manager.AdManagerClient
     except ImportError:
         print("警告: 未安装 google-ads-admanager 或 googleads 库", file=sys.stderr)
-        ADMANAGER_AVAILABLE = False
+        return None, None
 
-from google.auth import default
-from google.auth.transport.requests import Request
-from google.oauth2 import service_account
 
 class MCPAdManagerEnhancedUltimateServer:
     """Google Ad Manager 增强终极优化版MCP服务器"""
@@ -36,55 +161,348 @@ class MCPAdManagerEnhancedUltimateServer:
     def __init__(self):
         self.network_code = os.getenv("GOOGLE_ADMANAGER_NETWORK_CODE")
         self.client = None
+        self.credential_manager = get_credential_manager()
+        self.metrics = get_metrics_registry()
+        self.scheduler = RequestScheduler()
+        self.clients = ServiceClientRegistry(
+            self.credential_manager, self._load_admanager_client,
+            scheduler=self.scheduler, network_code=self.network_code
+        )
+        self.report_cache = ReportCache()
+        self.report_planner = ReportPlanner()
+        self.report_rollups = RollupMaterializer(
+            RollupStore(), lambda request: self._report_rows(request, None), self._network_today
+        )
+        self.shard_cache = ReportCache(os.path.join(self.report_cache.directory, "shards"),
+                                       max_bytes=DEFAULT_SHARD_CACHE_MAX_BYTES)
+        self.network_cache = NetworkMetadataCache()
+        self._time_zone_lock = threading.Lock()
+        self._time_zone_lookups = set()
+        self.output = OutputFormatter()
+        self.single_flight = SingleFlight()
+        self.entity_index = EntityIndex()
+        self.entity_sync = EntitySynchronizer(self.entity_index, self._fetch_entity_pages)
+        self.ad_unit_tree = AdUnitTree()
+        self.entity_sync.add_listener(self._on_entities_synced)
+        self.jobs = JobManager(JobStore(), self._run_job)
+        self._metric_labels = None
         
         print("🎯 MCP Ad Manager 增强终极优化版 v1.0 已初始化", file=sys.stderr)
         print(f"   📊 Network Code: {self.network_code if self.network_code else '未设置'}", file=sys.stderr)
         print("   🚀 增强版 - 完整Ad Manager功能支持!", file=sys.stderr)
-        
-        if not ADMANAGER_AVAILABLE:
-            print("   ⚠️  警告: Ad Manager SDK 未安装，某些功能可能不可用", file=sys.stderr)
 
     def _get_admanager_client(self):
-        """获取Ad Manager客户端对象"""
-        if not ADMANAGER_AVAILABLE:
+        """获取Ad Manager客户端对象（由客户端注册表缓存）"""
+        self.client = self.clients.get_legacy_client()
+        return self.client
+
+    def _load_admanager_client(self):
+        """加载Ad Manager客户端对象"""
+        backend, client_class = load_admanager_sdk()
+        if client_class is None:
             raise ValueError("Ad Manager SDK 未安装。请运行: pip install google-ads-admanager 或 pip install googleads")
         
-        if self.client is None:
-            try:
-                # 尝试使用新的 google-ads-admanager
-                if 'AdManagerClient' in globals():
-                    self.client = AdManagerClient.LoadFromStorage()
-                # 否则使用旧的 googleads
-                elif 'ad_manager' in globals():
-                    self.client = ad_manager.AdManagerClient.LoadFromStorage()
-                else:
-                    raise ValueError("无法导入 Ad Manager 客户端")
-                
-                print("✅ Ad Manager 客户端初始化成功", file=sys.stderr)
-            except Exception as e:
-                raise ValueError(f"无法初始化Ad Manager客户端: {str(e)}")
-        
-        return self.client
+        try:
+            client = client_class.LoadFromStorage()
+            
+            print(f"✅ Ad Manager 客户端初始化成功 ({backend})", file=sys.stderr)
+            return client
+        except Exception as e:
+            raise ValueError(f"无法初始化Ad Manager客户端: {str(e)}")
 
     def _get_credentials(self):
-        """获取Google认证凭据，优先使用GOOGLE_APPLICATION_CREDS环境变量指定的文件"""
+        """获取Google认证凭据（进程级缓存，令牌由后台主动刷新）"""
+        return self.credential_manager.get_credentials()
+
+    def _paging_kwargs(self, page_size: Optional[int], max_items: Optional[int],
+                       page_token: Optional[str]) -> Dict[str, Any]:
+        """list操作的分页参数，未指定max_items时使用默认上限"""
+        return {
+            "page_size": page_size,
+            "max_items": max_items if max_items is not None else DEFAULT_MAX_ITEMS,
+            "page_token": page_token
+        }
+
+    def _collect_pages(self, paginator, convert) -> List[Dict[str, Any]]:
+        """逐页拉取并转换条目，每页的原始响应处理完即释放"""
+        results = []
+        for page in paginator:
+            results.extend(convert(item) for item in page.items)
+        return results
+
+    def _pagination_info(self, paginator) -> Dict[str, Any]:
+        """list操作返回的分页信息"""
+        return {
+            "page_size": paginator.page_size,
+            "pages_fetched": paginator.pages_fetched,
+            "has_more": paginator.next_page_token is not None,
+            "next_page_token": paginator.next_page_token
+        }
+
+    def _projected_convert(self, kind: str, fields: Optional[List[str]], legacy: bool = False):
+        """只读取请求字段的转换函数，未请求投影时返回 None"""
+        if not fields:
+            return None
+        spec = ENTITY_KINDS[kind]
+        return functools.partial(spec.from_legacy if legacy else spec.from_sdk, fields=fields)
+
+    def _legacy_paginator(self, kind: str, equals: Dict[str, Any], fields: Optional[List[str]],
+                          page_size: Optional[int], max_items: Optional[int],
+                          page_token: Optional[str], conditions: Optional[List[Tuple[str, str, Any]]] = None,
+                          order: Optional[Tuple[str, bool]] = None):
+        """旧版列表的分页器，返回 (分页器, 投影转换函数)
+
+        equals 为字段到值的相等过滤条件（值为空时忽略），conditions 和 order 为
+        entity_filters 规范化后的过滤条件和排序，都编译为带绑定变量的 Where。请求的
+        字段和过滤、排序用到的字段都在 PQL 表中时用 PQL SELECT 只取这些列；未请求
+        投影时转换函数为 None。
+        """
+        spec = ENTITY_KINDS[kind]
+        client = self._get_admanager_client()
+        statement_builder = client.StatementBuilder()
+        paging = self._paging_kwargs(page_size, max_items, page_token)
+        conditions = [(field, OP_EQUALS, str(value)) for field, value in equals.items() if value] + list(conditions or [])
+        pql = pql_columns(kind, fields + referenced_fields(conditions, order)) if fields else None
+        columns = pql[1] if pql else {}
+        apply_legacy_filter(statement_builder, conditions, order, lambda field: columns.get(field, field))
+        if pql:
+            table, columns = pql
+            statement_builder.Select(", ".join(columns[f] for f in fields)).From(table)
+            select = self.clients.get_legacy_service(PQL_SERVICE).select
+            return PqlPaginator(select, statement_builder, pql_value, **paging), pql_converter(kind, fields)
+        service = self.clients.get_legacy_service(spec.legacy_service)
+        paginator = StatementPaginator(getattr(service, spec.legacy_method), statement_builder, **paging)
+        return paginator, self._projected_convert(kind, fields, legacy=True)
+
+    def _fetch_entity_pages(self, kind: str, since: Optional[datetime]):
+        """逐页拉取实体用于同步本地索引，since 不为空时只拉取之后修改过的实体"""
+        paginator, convert = self._entity_paginator(kind, since)
+        for page in paginator:
+            yield [convert(item) for item in page.items]
+
+    def _entity_paginator(self, kind: str, since: Optional[datetime] = None,
+                          page_size: Optional[int] = None, page_token: Optional[str] = None):
+        """按稳定顺序遍历一种实体的分页器，返回 (分页器, 转换函数)"""
+        spec = ENTITY_KINDS[kind]
+        paging = {"page_size": page_size, "page_token": page_token}
         try:
-            # 检查是否设置了GOOGLE_APPLICATION_CREDS环境变量
-            creds_path = os.getenv('GOOGLE_APPLICATION_CREDS')
-            if creds_path and os.path.exists(creds_path):
-                print(f"✅ 使用指定的认证文件: {creds_path}", file=sys.stderr)
-                credentials = service_account.Credentials.from_service_account_file(
-                    creds_path,
-                    scopes=["https://www.googleapis.com/auth/dfp"]
+            service = self.clients.get_client(spec.sdk_client)
+            request = {"order_by": "update_time"}
+            if since is not None:
+                request["filter"] = f'update_time > "{since.strftime("%Y-%m-%dT%H:%M:%SZ")}"'
+            paginator = SdkPaginator(getattr(service, spec.sdk_method), request, spec.sdk_field, **paging)
+            convert = spec.from_sdk
+        except ImportError:
+            client = self._get_admanager_client()
+            service = self.clients.get_legacy_service(spec.legacy_service)
+            statement_builder = client.StatementBuilder()
+            if since is not None:
+                statement_builder.Where('lastModifiedDateTime > :since').WithBindVariable(
+                    'since', since.strftime('%Y-%m-%dT%H:%M:%S')
                 )
-                return credentials, None
+            statement_builder.OrderBy('id', ascending=True)
+            paginator = StatementPaginator(getattr(service, spec.legacy_method), statement_builder, **paging)
+            convert = spec.from_legacy
+        return paginator, convert
+
+    def _get_many(self, kind: str, ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """用少量合并的列表调用一次获取多个实体，fields 不为空时只请求这些字段"""
+        spec = ENTITY_KINDS[kind]
+        ids = normalize_ids(ids)
+        
+        try:
+            service = self.clients.get_client(spec.sdk_client)
+            list_method = getattr(service, spec.sdk_method)
+            chunk_size = MAX_IDS_PER_FILTER
+            metadata = field_mask(kind, fields) if fields else None
+            
+            def fetch_chunk(chunk):
+                request = {"filter": " OR ".join(f"{spec.sdk_id_field} = {i}" for i in chunk)}
+                paginator = SdkPaginator(list_method, request, spec.sdk_field, metadata=metadata)
+                return [spec.from_sdk(item, fields) for item in paginator.items()]
+        except ImportError:
+            client = self._get_admanager_client()
+            chunk_size = MAX_IDS_PER_STATEMENT
+            pql = pql_columns(kind, fields)
+            if pql:
+                select = self.clients.get_legacy_service(PQL_SERVICE).select
+                convert = pql_converter(kind, fields)
             else:
-                # 如果没有设置环境变量或文件不存在，使用默认的Application Default Credentials
-                print("⚠️ 未设置GOOGLE_APPLICATION_CREDS环境变量，使用默认认证", file=sys.stderr)
-                return default(scopes=["https://www.googleapis.com/auth/dfp"])
-        except Exception as e:
-            print(f"❌ 认证失败: {str(e)}", file=sys.stderr)
-            raise ValueError(f"无法获取认证凭据: {str(e)}")
+                fetch_method = getattr(self.clients.get_legacy_service(spec.legacy_service), spec.legacy_method)
+            
+            def fetch_chunk(chunk):
+                # ID已校验为整数，可以直接写入语句
+                statement_builder = client.StatementBuilder()
+                if pql:
+                    table, columns = pql
+                    statement_builder.Select(", ".join(columns[f] for f in fields)).From(table)
+                    statement_builder.Where(f"Id IN ({', '.join(chunk)})")
+                    # PQL 结果没有总数，用 max_items 避免多取一页空结果
+                    paginator = PqlPaginator(select, statement_builder, pql_value,
+                                             page_size=len(chunk), max_items=len(chunk))
+                    return [convert(row) for row in paginator.items()]
+                statement_builder.Where(f"id IN ({', '.join(chunk)})")
+                paginator = StatementPaginator(fetch_method, statement_builder, page_size=len(chunk))
+                return [spec.from_legacy(item, fields) for item in paginator.items()]
+        
+        found, missing = match_ids(ids, fetch_in_chunks(ids, chunk_size, fetch_chunk))
+        return self.output.tool_result({
+            "success": True,
+            "action": "get_many",
+            spec.sdk_field: found,
+            "total": len(found),
+            "missing_ids": missing
+        })
+
+    def _bulk_create(self, kind: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """批量创建实体：先本地校验全部规格，再分批并行提交
+
+        新版SDK不提供创建方法，始终使用旧版 googleads。
+        """
+        entities, errors = validate_create_specs(kind, items)
+        if errors:
+            return self.output.tool_result({
+                "success": False,
+                "action": "bulk_create",
+                "error": f"{len(errors)} 个规格未通过校验，没有提交任何实体",
+                "validation_errors": errors
+            })
+        
+        self._get_admanager_client()
+        service_name, method_name = CREATE_METHODS[kind]
+        create_method = getattr(self.clients.get_legacy_service(service_name), method_name)
+        if kind == "ad_unit":
+            description = f'Created via MCP at {datetime.now()}'
+            for entity in entities:
+                entity.setdefault('description', description)
+        
+        results = bulk_create(create_method, entities)
+        created = sum(1 for r in results if r["success"])
+        print(f"🧱 批量创建 {kind}: 成功 {created}/{len(results)}", file=sys.stderr)
+        return self.output.tool_result({
+            "success": created == len(results),
+            "action": "bulk_create",
+            "created": created,
+            "failed": len(results) - created,
+            "results": results,
+            "kind": kind
+        })
+
+    def _on_entities_synced(self, kind: str, records: List[Dict[str, Any]]):
+        """实体索引同步后增量更新广告单元树"""
+        if kind == "ad_unit" and self.ad_unit_tree.built:
+            self.ad_unit_tree.apply(records)
+
+    def _iter_indexed(self, kind: str, batch_size: int = 5000):
+        """分批读取本地索引中的全部实体"""
+        offset = 0
+        while True:
+            records = self.entity_index.list(kind, limit=batch_size, offset=offset)
+            yield from records
+            if len(records) < batch_size:
+                return
+            offset += batch_size
+
+    def _ad_unit_hierarchy(self, action: str, ad_unit_id: Optional[str],
+                           depth: Optional[int]) -> Dict[str, Any]:
+        """在本地广告单元树上回答子树和路径查询"""
+        self.entity_sync.ensure_fresh("ad_unit")
+        tree = self.ad_unit_tree
+        if not tree.built:
+            tree.build(self._iter_indexed("ad_unit"))
+            print(f"🌳 广告单元树已构建: {len(tree)} 个节点", file=sys.stderr)
+        age = self.entity_sync.age("ad_unit")
+        
+        if action == "path":
+            if not ad_unit_id:
+                raise ValueError("path 操作需要提供 ad_unit_id")
+            path = tree.path(ad_unit_id)
+            return self.output.tool_result({
+                "success": True,
+                "action": "path",
+                "index_age_seconds": round(age, 1),
+                "path": path,
+                "depth": len(path) - 1
+            })
+        
+        subtree = tree.subtree(ad_unit_id, DEFAULT_TREE_DEPTH if depth is None else depth)
+        return self.output.tool_result({
+            "success": True,
+            "action": "tree",
+            "index_age_seconds": round(age, 1),
+            "tree": subtree["nodes"],
+            "truncated": subtree["truncated"],
+            "total_ad_units": len(tree)
+        })
+
+    def _from_entity_index(self, kind: str, action: str, entity_id: Optional[str],
+                           parent_id: Optional[str], page_size: Optional[int],
+                           max_items: Optional[int], page_token: Optional[str],
+                           ids: Optional[List[str]] = None,
+                           fields: Optional[List[str]] = None,
+                           conditions: Optional[List[Tuple[str, str, Any]]] = None,
+                           order: Optional[Tuple[str, bool]] = None) -> Dict[str, Any]:
+        """从本地实体索引回答get/get_many/list操作，fields 不为空时只返回这些字段
+
+        list 的过滤条件和排序编译为索引上的 SQL 条件。
+        """
+        spec = ENTITY_KINDS[kind]
+        self.entity_sync.ensure_fresh(kind)
+        age = self.entity_sync.age(kind)
+        
+        if action == "get_many":
+            ids = normalize_ids(ids)
+            entities = [project(e, fields) for e in (self.entity_index.get(kind, i) for i in ids) if e is not None]
+            found, missing = match_ids(ids, entities)
+            return self.output.tool_result({
+                "success": True,
+                "action": "get_many",
+                "source": SOURCE_INDEX,
+                "index_age_seconds": round(age, 1),
+                spec.sdk_field: found,
+                "total": len(found),
+                "missing_ids": missing
+            })
+        
+        if action == "get":
+            if not entity_id:
+                return self.output.tool_result({
+                    "success": False,
+                    "error": "缺少必需参数或操作不支持"
+                })
+            entity = self.entity_index.get(kind, entity_id)
+            if entity is None:
+                return self.output.tool_result({
+                    "success": False,
+                    "error": f"本地索引中没有 {kind} {entity_id}"
+                })
+            return self.output.tool_result({
+                "success": True,
+                "action": "get",
+                "source": SOURCE_INDEX,
+                "index_age_seconds": round(age, 1),
+                kind: project(entity, fields)
+            })
+        
+        # 与实时列表相同的分页语义：返回不超过 max_items 条，剩余部分通过游标继续
+        limit = int(max_items) if max_items is not None else DEFAULT_MAX_ITEMS
+        if limit <= 0:
+            raise ValueError("max_items 必须为正整数")
+        offset = decode_offset_token(page_token)
+        entities = self.entity_index.list(kind, parent_id, limit=limit + 1, offset=offset,
+                                          where=index_where(conditions or []), order=order)
+        has_more = len(entities) > limit
+        entities = [project(e, fields) for e in entities[:limit]]
+        return self.output.tool_result({
+            "success": True,
+            "action": "list",
+            "source": SOURCE_INDEX,
+            "index_age_seconds": round(age, 1),
+            spec.sdk_field: entities,
+            "total": len(entities),
+            "has_more": has_more,
+            "next_page_token": encode_offset_token(offset + len(entities)) if has_more else None
+        })
 
     def handle_initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """处理MCP初始化请求"""
@@ -121,8 +539,8 @@ class MCPAdManagerEnhancedUltimateServer:
                     "properties": {
                         "action": {
                             "type": "string",
-                            "enum": ["get_current", "list_all"],
-                            "description": "操作类型：get_current(获取当前网络信息), list_all(列出所有网络)",
+                            "enum": ["get_current", "list_all", "invalidate"],
+                            "description": "操作类型：get_current(获取当前网络信息), list_all(列出所有网络), invalidate(清除网络信息缓存)。网络信息按账号缓存，TTL内不再调用API",
                             "default": "get_current"
                         }
                     },
@@ -139,8 +557,8 @@ class MCPAdManagerEnhancedUltimateServer:
                     "properties": {
                         "action": {
                             "type": "string",
-                            "enum": ["list", "get", "create"],
-                            "description": "操作类型：list(列出所有广告单元，返回id、name、description、targetWindow、status), get(获取指定广告单元详情，需要提供ad_unit_id), create(创建新广告单元，需要提供ad_unit_name，可选提供parent_id指定父级单元)",
+                            "enum": ["list", "get", "get_many", "create", "bulk_create", "tree", "path"],
+                            "description": "操作类型：list(列出所有广告单元，返回id、name、description、targetWindow、status), get(获取指定广告单元详情，需要提供ad_unit_id), get_many(一次获取多个广告单元，需要提供ids), create(创建新广告单元，需要提供ad_unit_name，可选提供parent_id指定父级单元), bulk_create(批量创建广告单元，需要提供items，每项至少包含name，可选parentId), tree(返回层级树，可选ad_unit_id指定子树根节点，每个节点带descendant_count), path(返回ad_unit_id到根节点的路径)。tree和path基于本地实体索引在内存中构建的层级树",
                             "default": "list"
                         },
                         "parent_id": {
@@ -149,12 +567,20 @@ class MCPAdManagerEnhancedUltimateServer:
                         },
                         "ad_unit_id": {
                             "type": "string",
-                            "description": "广告单元ID（必需当action='get'时，从list操作返回的id字段获取）"
+                            "description": "广告单元ID（必需当action='get'或'path'时，tree操作时为子树根节点，从list操作返回的id字段获取）"
                         },
                         "ad_unit_name": {
                             "type": "string",
                             "description": "广告单元名称（必需当action='create'时）"
-                        }
+                        },
+                        **IDS_SCHEMA_PROPERTIES,
+                        **ITEMS_SCHEMA_PROPERTIES,
+                        **HIERARCHY_SCHEMA_PROPERTIES,
+                        **PAGINATION_SCHEMA_PROPERTIES,
+                        **SOURCE_SCHEMA_PROPERTIES,
+                        **FIELDS_SCHEMA_PROPERTIES,
+                        **FILTER_SCHEMA_PROPERTIES,
+                        **BACKGROUND_SCHEMA_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -169,8 +595,8 @@ class MCPAdManagerEnhancedUltimateServer:
                     "properties": {
                         "action": {
                             "type": "string",
-                            "enum": ["list", "get", "create"],
-                            "description": "操作类型：list(列出订单), get(获取详情), create(创建订单)",
+                            "enum": ["list", "get", "get_many", "create", "bulk_create"],
+                            "description": "操作类型：list(列出订单), get(获取详情), get_many(批量获取详情，需要提供ids), create(创建订单), bulk_create(批量创建订单，需要提供items，每项包含name、advertiserId、traffickerId)",
                             "default": "list"
                         },
                         "order_id": {
@@ -183,8 +609,15 @@ class MCPAdManagerEnhancedUltimateServer:
                         },
                         "advertiser_id": {
                             "type": "string",
-                            "description": "广告主ID（对于create操作必需）"
-                        }
+                            "description": "广告主ID（对于create操作必需，list操作时按广告主过滤）"
+                        },
+                        **IDS_SCHEMA_PROPERTIES,
+                        **ITEMS_SCHEMA_PROPERTIES,
+                        **PAGINATION_SCHEMA_PROPERTIES,
+                        **SOURCE_SCHEMA_PROPERTIES,
+                        **FIELDS_SCHEMA_PROPERTIES,
+                        **FILTER_SCHEMA_PROPERTIES,
+                        **BACKGROUND_SCHEMA_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -199,8 +632,8 @@ class MCPAdManagerEnhancedUltimateServer:
                     "properties": {
                         "action": {
                             "type": "string",
-                            "enum": ["list", "get", "create"],
-                            "description": "操作类型：list(列出行项目), get(获取详情), create(创建行项目)",
+                            "enum": ["list", "get", "get_many", "create", "bulk_create"],
+                            "description": "操作类型：list(列出行项目), get(获取详情), get_many(批量获取详情，需要提供ids), create(创建行项目), bulk_create(批量创建行项目，需要提供items，每项包含name、orderId、lineItemType、costType、startDateTime、endDateTime及API要求的其他字段)",
                             "default": "list"
                         },
                         "order_id": {
@@ -214,7 +647,14 @@ class MCPAdManagerEnhancedUltimateServer:
                         "line_item_name": {
                             "type": "string",
                             "description": "行项目名称（对于create操作必需）"
-                        }
+                        },
+                        **IDS_SCHEMA_PROPERTIES,
+                        **ITEMS_SCHEMA_PROPERTIES,
+                        **PAGINATION_SCHEMA_PROPERTIES,
+                        **SOURCE_SCHEMA_PROPERTIES,
+                        **FIELDS_SCHEMA_PROPERTIES,
+                        **FILTER_SCHEMA_PROPERTIES,
+                        **BACKGROUND_SCHEMA_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -229,14 +669,20 @@ class MCPAdManagerEnhancedUltimateServer:
                     "properties": {
                         "action": {
                             "type": "string",
-                            "enum": ["list", "get"],
-                            "description": "操作类型：list(列出创意), get(获取详情)",
+                            "enum": ["list", "get", "get_many"],
+                            "description": "操作类型：list(列出创意), get(获取详情), get_many(批量获取详情，需要提供ids)",
                             "default": "list"
                         },
                         "creative_id": {
                             "type": "string",
                             "description": "创意ID（对于get操作必需）"
-                        }
+                        },
+                        **IDS_SCHEMA_PROPERTIES,
+                        **PAGINATION_SCHEMA_PROPERTIES,
+                        **SOURCE_SCHEMA_PROPERTIES,
+                        **FIELDS_SCHEMA_PROPERTIES,
+                        **FILTER_SCHEMA_PROPERTIES,
+                        **BACKGROUND_SCHEMA_PROPERTIES
                     },
                     "required": ["action"]
                 }
@@ -245,14 +691,14 @@ class MCPAdManagerEnhancedUltimateServer:
             # 报告生成工具
             {
                 "name": "generate_report",
-                "description": "生成Ad Manager报告 - 支持各种报告类型，如库存报告、订单报告等。使用步骤：1)选择合适的report_type；2)指定start_date和end_date定义日期范围；3)报告将包含展示次数、点击次数、点击率、收入等核心指标。注意：报告是异步生成的，返回job信息后需要通过报告服务查询结果",
+                "description": "生成Ad Manager报告 - 支持各种报告类型，如库存报告、订单报告等。使用步骤：1)选择合适的report_type；2)指定start_date和end_date定义日期范围；3)报告将包含展示次数、点击次数、点击率、收入等核心指标。默认会等待报告完成，下载结果并返回行数、指标合计和预览行；设置wait_for_result=false时只返回job信息",
                 "inputSchema": {
                     "type": "object",
                     "properties": {
                         "report_type": {
                             "type": "string",
                             "enum": ["inventory", "order", "line_item", "creative", "ad_server"],
-                            "description": "报告类型：inventory(库存性能报告，维度为AD_UNIT_NAME), order(订单性能报告，维度为ORDER_NAME), line_item(行项目性能报告，维度为LINE_ITEM_NAME), creative(创意性能报告，维度为CREATIVE_NAME), ad_server(广告服务器报告，提供完整的服务器指标)",
+                            "description": "报告类型：inventory(库存性能报告，维度为AD_UNIT_NAME), order(订单性能报告，维度为ORDER_NAME), line_item(行项目性能报告，维度为LINE_ITEM_NAME), creative(创意性能报告，维度为CREATIVE_NAME), ad_server(广告服务器报告，按DATE提供展示、点击、点击率、收入和eCPM)。传入dimensions/columns时代替这些默认值",
                             "default": "inventory"
                         },
                         "start_date": {
@@ -262,12 +708,325 @@ class MCPAdManagerEnhancedUltimateServer:
                         "end_date": {
                             "type": "string",
                             "description": "结束日期（格式：YYYY-MM-DD），必需。与start_date一起定义报告的时间范围。如果不提供start_date和end_date，默认使用最近7天的数据"
-                        }
+                        },
+                        "wait_for_result": {
+                            "type": "boolean",
+                            "description": "是否等待报告完成并返回结果（默认true）。为false时只创建作业并返回job_id",
+                            "default": True
+                        },
+                        "preview_rows": {
+                            "type": "integer",
+                            "description": f"返回的预览行数（默认{DEFAULT_PREVIEW_ROWS}），完整结果只返回行数和指标合计",
+                            "minimum": 0,
+                            "default": DEFAULT_PREVIEW_ROWS
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": f"等待报告完成的最长秒数（默认{DEFAULT_REPORT_TIMEOUT}）",
+                            "minimum": 1
+                        },
+                        "use_cache": {
+                            "type": "boolean",
+                            "description": "是否使用缓存的报告结果（默认true）。为false时重新运行报告并刷新缓存。已结束的历史日期范围缓存7天，包含今天的范围缓存15分钟",
+                            "default": True
+                        },
+                        "columnar_format": {
+                            "type": "string",
+                            "enum": list(COLUMNAR_FORMATS),
+                            "description": "同时把完整结果写入列式文件（可选，需要pyarrow）：arrow(Arrow IPC) 或 parquet。文件保存在报告缓存目录，路径在结果的columnar.path中，可用query_report_file查询"
+                        },
+                        **SHARD_SCHEMA_PROPERTIES,
+                        **REPORT_QUERY_SCHEMA_PROPERTIES,
+                        **BACKGROUND_SCHEMA_PROPERTIES
                     },
                     "required": ["report_type"]
                 }
             },
             
+            # 列式报告文件查询工具
+            {
+                "name": "query_report_file",
+                "description": "查询generate_report写出的列式报告文件 - 内存映射读取，只解码请求的行范围和列，按offset分页",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": "列式文件路径（generate_report结果中的columnar.path）"
+                        },
+                        "columns": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "返回的列（可选，默认全部），例如 [\"Dimension.AD_UNIT_NAME\", \"Column.AD_SERVER_CLICKS\"]"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "起始行（默认0），传入上一次返回的next_offset以继续读取",
+                            "minimum": 0,
+                            "default": 0
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": f"返回的最多行数（默认{DEFAULT_QUERY_LIMIT}，最大{MAX_QUERY_LIMIT}）",
+                            "minimum": 0,
+                            "default": DEFAULT_QUERY_LIMIT
+                        }
+                    },
+                    "required": ["path"]
+                }
+            },
+            
+            # 报告物化工具
+            {
+                "name": "manage_report_rollups",
+                "description": "物化报告 - 按天把报告行保存到本地SQLite，刷新时只拉取缺失或尚未最终确定的日期；周、月和任意日期范围的查询在本地聚合，不再创建上游作业。只支持可相加的列",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "action": {
+                            "type": "string",
+                            "enum": ["define", "list", "status", "refresh", "query", "delete"],
+                            "description": "操作类型：define(定义或更新物化报告), list(列出所有物化报告), status(各报告已保存的天数和后台刷新状态), refresh(补齐日期范围内缺失和未最终确定的日期), query(本地聚合查询，默认先补齐缺失日期), delete(删除物化报告及其数据)",
+                            "default": "list"
+                        },
+                        "name": {
+                            "type": "string",
+                            "description": "物化报告名称（define、refresh、query、delete操作必需）"
+                        },
+                        **REPORT_QUERY_SCHEMA_PROPERTIES,
+                        "trailing_days": {
+                            "type": "integer",
+                            "description": f"默认日期范围和后台刷新覆盖截至今天的天数（define操作，默认{DEFAULT_TRAILING_DAYS}，最大{MAX_TRAILING_DAYS}）",
+                            "minimum": 1,
+                            "maximum": MAX_TRAILING_DAYS
+                        },
+                        "start_date": {
+                            "type": "string",
+                            "description": "开始日期（格式：YYYY-MM-DD，refresh和query操作可选，默认按trailing_days计算）"
+                        },
+                        "end_date": {
+                            "type": "string",
+                            "description": "结束日期（格式：YYYY-MM-DD，refresh和query操作可选，默认今天）"
+                        },
+                        "granularity": {
+                            "type": "string",
+                            "enum": list(GRANULARITIES),
+                            "description": "query操作的聚合粒度：total(整个范围), day, week(周一开始), month",
+                            "default": GRANULARITY_TOTAL
+                        },
+                        "refresh": {
+                            "type": "boolean",
+                            "description": "query操作前是否先补齐缺失日期（默认true）。为false时只读本地数据并返回missing_days",
+                            "default": True
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": f"query操作返回的最多行数（默认{DEFAULT_ROLLUP_QUERY_LIMIT}）",
+                            "minimum": 0
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "query操作的起始行，传入上一次返回的next_offset以继续读取",
+                            "minimum": 0
+                        },
+                        **BACKGROUND_SCHEMA_PROPERTIES
+                    },
+                    "required": ["action"]
+                }
+            },
+            
+            # 本地实体索引工具
+            {
+                "name": "manage_entity_index",
+                "description": "管理本地实体索引 - 广告单元、订单、行项目和创意镜像到本地SQLite，get/list操作传入source='index'时直接从本地读取",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "action": {
+                            "type": "string",
+                            "enum": ["status", "sync", "clear"],
+                            "description": "操作类型：status(查看各类实体数量和同步时间), sync(立即同步，默认增量), clear(清空本地索引)",
+                            "default": "status"
+                        },
+                        "kind": {
+                            "type": "string",
+                            "enum": list(ENTITY_KINDS),
+                            "description": "实体类型（可选，sync时只同步该类型，不提供时同步全部）"
+                        },
+                        "full": {
+                            "type": "boolean",
+                            "description": "是否全量同步（可选，默认false，只拉取上次同步后修改过的实体）",
+                            "default": False
+                        },
+                        **BACKGROUND_SCHEMA_PROPERTIES
+                    },
+                    "required": ["action"]
+                }
+            },
+            
+            # 客户端连接池工具
+            {
+                "name": "manage_client_pool",
+                "description": "查看或重置服务客户端连接池 - 服务客户端在首次使用时创建并在所有调用间复用",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "action": {
+                            "type": "string",
+                            "enum": ["status", "reset"],
+                            "description": "操作类型：status(查看已创建的客户端和连接池状态), reset(关闭连接池并丢弃所有客户端，下次调用时重新创建)",
+                            "default": "status"
+                        }
+                    },
+                    "required": ["action"]
+                }
+            },
+            
+            # 实体导出工具
+            {
+                "name": "export_entities",
+                "description": "把一种实体的完整列表逐页流式导出到本地NDJSON或CSV文件（可选gzip），内存占用与实体数量无关，响应只返回文件路径和行数。中断或达到max_rows后可用resume=true从检查点继续",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "kind": {
+                            "type": "string",
+                            "enum": list(ENTITY_KINDS),
+                            "description": "实体类型"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(EXPORT_FORMATS),
+                            "description": "文件格式（可选，默认ndjson）",
+                            "default": FORMAT_NDJSON
+                        },
+                        "gzip": {
+                            "type": "boolean",
+                            "description": "是否gzip压缩（可选，默认false）",
+                            "default": False
+                        },
+                        "path": {
+                            "type": "string",
+                            "description": "输出文件路径（可选，默认写入GOOGLE_ADMANAGER_EXPORT_DIR；resume时必需）"
+                        },
+                        "resume": {
+                            "type": "boolean",
+                            "description": "从path旁的检查点继续上一次未完成的导出（可选，默认false）",
+                            "default": False
+                        },
+                        "max_rows": {
+                            "type": "integer",
+                            "description": "本次调用最多写入的行数（可选，默认不限制），在页边界停止，之后可resume继续",
+                            "minimum": 1
+                        },
+                        "page_size": PAGINATION_SCHEMA_PROPERTIES["page_size"],
+                        **BACKGROUND_SCHEMA_PROPERTIES
+                    },
+                    "required": ["kind"]
+                }
+            },
+            
+            # 后台作业工具
+            {
+                "name": "get_job_status",
+                "description": "查询后台作业状态 - 传入job_id查询单个作业（可等待其结束），不传时列出最近的作业。以background=true调用的报告、列表、同步、刷新和批量创建会返回job_id",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "作业ID（可选，不提供时列出最近的作业）"
+                        },
+                        "state": {
+                            "type": "string",
+                            "enum": list(JOB_STATES),
+                            "description": "列出作业时只返回该状态的作业（可选）"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": f"列出作业的最多数量（默认{DEFAULT_JOB_LIST_LIMIT}，最大{MAX_JOB_LIST_LIMIT}）",
+                            "minimum": 1,
+                            "maximum": MAX_JOB_LIST_LIMIT
+                        },
+                        "wait": {
+                            "type": "number",
+                            "description": f"作业未结束时最多等待的秒数（可选，默认0，最大{MAX_WAIT_SECONDS}）",
+                            "minimum": 0,
+                            "maximum": MAX_WAIT_SECONDS
+                        }
+                    },
+                    "required": []
+                }
+            },
+            {
+                "name": "get_job_result",
+                "description": "获取后台作业的结果 - 作业结束后返回原工具的完整响应；未结束时只返回状态",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "作业ID"
+                        },
+                        "wait": {
+                            "type": "number",
+                            "description": f"作业未结束时最多等待的秒数（可选，默认0，最大{MAX_WAIT_SECONDS}）",
+                            "minimum": 0,
+                            "maximum": MAX_WAIT_SECONDS
+                        }
+                    },
+                    "required": ["job_id"]
+                }
+            },
+            {
+                "name": "cancel_job",
+                "description": "取消后台作业 - 排队中的作业立即取消，运行中的作业在下一次API调用前停止",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "作业ID"
+                        }
+                    },
+                    "required": ["job_id"]
+                }
+            },
+            
+            # 运行指标工具
+            {
+                "name": "get_metrics",
+                "description": "查看服务器运行指标 - 每个工具调用、凭据获取、客户端创建、上游API调用（含限流排队）和JSON序列化的次数与延迟分位数，用于定位负载下的耗时",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "action": {
+                            "type": "string",
+                            "enum": ["get", "dump", "reset"],
+                            "description": "操作类型：get(返回指标), dump(以Prometheus文本格式写入文件，需要提供path或设置GOOGLE_ADMANAGER_METRICS_FILE), reset(清空所有指标)",
+                            "default": "get"
+                        },
+                        "metric": {
+                            "type": "string",
+                            "enum": ["tool_call", "credential_acquire", "client_construct",
+                                     "api_queue_wait", "api_call", "json_serialize"],
+                            "description": "只返回指定指标（可选，仅用于get操作）"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["json", "prometheus"],
+                            "description": "get操作的输出格式（可选，默认json）",
+                            "default": "json"
+                        },
+                        "path": {
+                            "type": "string",
+                            "description": "dump操作写入的文件路径（可选）"
+                        }
+                    },
+                    "required": ["action"]
+                }
+            },
+            
             # 帮助工具
             {
                 "name": "get_help",
@@ -283,7 +1042,73 @@ class MCPAdManagerEnhancedUltimateServer:
         return {"tools": tools}
 
     def handle_tools_call(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """处理工具调用请求"""
+        """处理工具调用请求，按工具和操作设置服务调用的调度优先级
+
+        同时进行的相同只读调用合并为一次执行，共享同一个结果。带 background=true
+        的批量调用提交为后台作业，立即返回作业状态。分发器在 job_context 中调用，
+        请求被取消时在下一次服务调用前停止。
+        """
+        started = time.perf_counter()
+        result = None
+        try:
+            # 第一次工具调用时恢复上次未完成的后台作业，不影响 initialize 握手
+            self.jobs.start()
+            if arguments.get("background"):
+                result = self._submit_job(name, arguments)
+                return result
+            key = coalesce_key(name, arguments)
+            with request_priority(priority_for(name, arguments.get("action"))):
+                while True:
+                    result, interrupted = self.single_flight.do(
+                        key, lambda: (self._call_tool(name, arguments), was_interrupted())
+                    )
+                    # 领头的请求被客户端取消时，合并进来的请求重新执行而不是一起失败
+                    if not interrupted or cancel_requested():
+                        return result
+        finally:
+            tool, action = self._metric_label(name, arguments.get("action"))
+            self.metrics.observe(
+                "tool_call", time.perf_counter() - started,
+                error=result_error(result) is not None,
+                tool=tool, action=action
+            )
+
+    def _metric_label(self, name: str, action: Any) -> Tuple[str, str]:
+        """指标的工具和操作标签，只使用工具定义中的名称，避免客户端参数产生无限多的指标序列"""
+        if self._metric_labels is None:
+            labels = {}
+            for tool in self.handle_tools_list()["tools"]:
+                action_schema = tool["inputSchema"].get("properties", {}).get("action", {})
+                labels[tool["name"]] = set(action_schema.get("enum") or [])
+            self._metric_labels = labels
+        actions = self._metric_labels.get(name)
+        if actions is None:
+            return "unknown", "-"
+        if not action:
+            return name, "-"
+        return name, action if isinstance(action, str) and action in actions else "other"
+
+    def _submit_job(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """把批量调用提交为后台作业"""
+        if priority_for(name, arguments.get("action")) != PRIORITY_BULK:
+            return self.output.tool_result({
+                "success": False,
+                "error": f"{name} {arguments.get('action') or ''} 不支持后台运行，只有报告、列表、同步、刷新、导出和批量创建可以后台运行"
+            })
+        arguments = {k: v for k, v in arguments.items() if k != "background"}
+        job = self.jobs.submit(name, arguments)
+        return self.output.tool_result({"success": True, "background": True, "job": job})
+
+    def _run_job(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """在作业工作线程中执行工具调用
+
+        不与前台调用合并：合并后取消作业会让加入的前台调用一起失败，前台调用
+        领头时作业又无法被取消。作业的耗时由作业状态记录，不再计入 tool_call 指标。
+        """
+        with request_priority(priority_for(name, arguments.get("action"))):
+            return self._call_tool(name, arguments)
+
+    def _call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         try:
             if name == "get_help":
                 return self.get_help()
@@ -294,32 +1119,136 @@ class MCPAdManagerEnhancedUltimateServer:
                     arguments.get("action", "list"),
                     arguments.get("parent_id"),
                     arguments.get("ad_unit_id"),
-                    arguments.get("ad_unit_name")
+                    arguments.get("ad_unit_name"),
+                    arguments.get("page_size"),
+                    arguments.get("max_items"),
+                    arguments.get("page_token"),
+                    arguments.get("source"),
+                    arguments.get("ids"),
+                    arguments.get("items"),
+                    arguments.get("depth"),
+                    arguments.get("fields"),
+                    arguments.get("filter"),
+                    arguments.get("order_by")
                 )
             elif name == "manage_orders":
                 return self.manage_orders(
                     arguments.get("action", "list"),
                     arguments.get("order_id"),
                     arguments.get("order_name"),
-                    arguments.get("advertiser_id")
+                    arguments.get("advertiser_id"),
+                    arguments.get("page_size"),
+                    arguments.get("max_items"),
+                    arguments.get("page_token"),
+                    arguments.get("source"),
+                    arguments.get("ids"),
+                    arguments.get("items"),
+                    arguments.get("fields"),
+                    arguments.get("filter"),
+                    arguments.get("order_by")
                 )
             elif name == "manage_line_items":
                 return self.manage_line_items(
                     arguments.get("action", "list"),
                     arguments.get("order_id"),
                     arguments.get("line_item_id"),
-                    arguments.get("line_item_name")
+                    arguments.get("line_item_name"),
+                    arguments.get("page_size"),
+                    arguments.get("max_items"),
+                    arguments.get("page_token"),
+                    arguments.get("source"),
+                    arguments.get("ids"),
+                    arguments.get("items"),
+                    arguments.get("fields"),
+                    arguments.get("filter"),
+                    arguments.get("order_by")
                 )
             elif name == "manage_creatives":
                 return self.manage_creatives(
                     arguments.get("action", "list"),
-                    arguments.get("creative_id")
+                    arguments.get("creative_id"),
+                    arguments.get("page_size"),
+                    arguments.get("max_items"),
+                    arguments.get("page_token"),
+                    arguments.get("source"),
+                    arguments.get("ids"),
+                    arguments.get("fields"),
+                    arguments.get("filter"),
+                    arguments.get("order_by")
+                )
+            elif name == "manage_entity_index":
+                return self.manage_entity_index(
+                    arguments.get("action", "status"),
+                    arguments.get("kind"),
+                    arguments.get("full", False)
+                )
+            elif name == "manage_client_pool":
+                return self.manage_client_pool(arguments.get("action", "status"))
+            elif name == "export_entities":
+                return self.export_entities(
+                    arguments.get("kind"),
+                    arguments.get("format", FORMAT_NDJSON),
+                    arguments.get("gzip", False),
+                    arguments.get("path"),
+                    arguments.get("resume", False),
+                    arguments.get("max_rows"),
+                    arguments.get("page_size")
+                )
+            elif name == "get_metrics":
+                return self.get_metrics(
+                    arguments.get("action", "get"),
+                    arguments.get("metric"),
+                    arguments.get("format", "json"),
+                    arguments.get("path")
                 )
             elif name == "generate_report":
                 return self.generate_report(
                     arguments.get("report_type", "inventory"),
                     arguments.get("start_date"),
-                    arguments.get("end_date")
+                    arguments.get("end_date"),
+                    arguments.get("wait_for_result", True),
+                    arguments.get("preview_rows", DEFAULT_PREVIEW_ROWS),
+                    arguments.get("timeout"),
+                    arguments.get("use_cache", True),
+                    arguments.get("columnar_format"),
+                    arguments.get("shard_by"),
+                    arguments.get("shard_concurrency"),
+                    arguments.get("dimensions"),
+                    arguments.get("columns"),
+                    arguments.get("dimension_filters")
+                )
+            elif name == "manage_report_rollups":
+                return self.manage_report_rollups(
+                    arguments.get("action", "list"),
+                    arguments.get("name"),
+                    arguments.get("dimensions"),
+                    arguments.get("columns"),
+                    arguments.get("dimension_filters"),
+                    arguments.get("trailing_days", DEFAULT_TRAILING_DAYS),
+                    arguments.get("start_date"),
+                    arguments.get("end_date"),
+                    arguments.get("granularity", GRANULARITY_TOTAL),
+                    arguments.get("refresh", True),
+                    arguments.get("limit", DEFAULT_ROLLUP_QUERY_LIMIT),
+                    arguments.get("offset", 0)
+                )
+            elif name == "get_job_status":
+                return self.get_job_status(
+                    arguments.get("job_id"),
+                    arguments.get("state"),
+                    arguments.get("limit", DEFAULT_JOB_LIST_LIMIT),
+                    arguments.get("wait", 0)
+                )
+            elif name == "get_job_result":
+                return self.get_job_result(arguments.get("job_id"), arguments.get("wait", 0))
+            elif name == "cancel_job":
+                return self.cancel_job(arguments.get("job_id"))
+            elif name == "query_report_file":
+                return self.query_report_file(
+                    arguments.get("path"),
+                    arguments.get("columns"),
+                    arguments.get("offset", 0),
+                    arguments.get("limit", DEFAULT_QUERY_LIMIT)
                 )
             else:
                 return {"error": f"Unknown tool: {name}"}
@@ -328,79 +1257,141 @@ class MCPAdManagerEnhancedUltimateServer:
 
     def get_help(self) -> Dict[str, Any]:
         """获取帮助信息"""
-        return {
-            "content": [
-                {
-                    "type": "text",
-                    "text": json.dumps({
-                        "success": True,
-                        "message": "Ad Manager增强终极优化版MCP服务器帮助",
-                        "data": {
-                            "server": "🎯 MCP Ad Manager 增强终极优化版",
-                            "version": "1.0.0",
-                            "total_functions": 7,
-                            "tools": [
-                                {"name": "manage_networks", "description": "网络管理 - 获取网络信息、列出所有网络"},
-                                {"name": "manage_inventory", "description": "库存管理 - 广告单元列表、详情、创建"},
-                                {"name": "manage_orders", "description": "订单管理 - 订单列表、详情、创建"},
-                                {"name": "manage_line_items", "description": "行项目管理 - 行项目列表、详情、创建"},
-                                {"name": "manage_creatives", "description": "创意管理 - 创意列表、详情"},
-                                {"name": "generate_report", "description": "报告生成 - 各种报告类型"},
-                                {"name": "get_help", "description": "帮助信息"}
-                            ],
-                            "environment_variables": {
-                                "GOOGLE_ADMANAGER_NETWORK_CODE": "Ad Manager网络代码（可选）"
-                            },
-                            "authentication": {
-                                "method": "使用GOOGLE_APPLICATION_CREDS环境变量指定认证文件",
-                                "environment_variable": "GOOGLE_APPLICATION_CREDS",
-                                "example": "export GOOGLE_APPLICATION_CREDS=/root/.gcloud/aaa.json",
-                                "fallback": "如果未设置环境变量，将使用默认的application_default_credentials.json"
-                            }
-                        },
-                        "timestamp": datetime.now().isoformat()
-                    }, ensure_ascii=False, indent=2)
+        return self.output.tool_result({
+            "success": True,
+            "message": "Ad Manager增强终极优化版MCP服务器帮助",
+            "data": {
+                "server": "🎯 MCP Ad Manager 增强终极优化版",
+                "version": "1.0.0",
+                "total_functions": 16,
+                "tools": [
+                    {"name": "manage_networks", "description": "网络管理 - 获取网络信息、列出所有网络、清除缓存"},
+                    {"name": "manage_inventory", "description": "库存管理 - 广告单元列表、详情、批量详情、创建、批量创建、层级树和路径"},
+                    {"name": "manage_orders", "description": "订单管理 - 订单列表、详情、批量详情、创建、批量创建"},
+                    {"name": "manage_line_items", "description": "行项目管理 - 行项目列表、详情、批量详情、创建、批量创建"},
+                    {"name": "manage_creatives", "description": "创意管理 - 创意列表、详情、批量详情"},
+                    {"name": "generate_report", "description": "报告生成 - 自定义维度、列和过滤条件，合并兼容请求，支持按日期分片并行运行，可同时写入Arrow/Parquet列式文件"},
+                    {"name": "query_report_file", "description": "列式报告查询 - 内存映射读取报告文件的指定行和列"},
+                    {"name": "manage_report_rollups", "description": "物化报告 - 按天保存报告行，只补齐缺失日期，本地按周/月/任意范围聚合"},
+                    {"name": "manage_entity_index", "description": "实体索引 - 本地镜像的状态、同步、清空"},
+                    {"name": "manage_client_pool", "description": "连接池管理 - 查看、重置服务客户端"},
+                    {"name": "export_entities", "description": "实体导出 - 流式写入NDJSON/CSV文件，支持gzip和断点续传"},
+                    {"name": "get_metrics", "description": "运行指标 - 各环节的调用次数和延迟分位数"},
+                    {"name": "get_job_status", "description": "后台作业 - 查询作业状态或列出最近的作业"},
+                    {"name": "get_job_result", "description": "后台作业 - 获取已结束作业的完整结果"},
+                    {"name": "cancel_job", "description": "后台作业 - 取消排队中或运行中的作业"},
+                    {"name": "get_help", "description": "帮助信息"}
+                ],
+                "environment_variables": {
+                    "GOOGLE_ADMANAGER_NETWORK_CODE": "Ad Manager网络代码（可选）",
+                    "GOOGLE_ADMANAGER_MAX_CONCURRENCY": "同时执行的工具调用数量上限（可选，默认4）",
+                    "GOOGLE_ADMANAGER_REPORT_TIMEOUT": "等待报告完成的默认秒数（可选，默认300）",
+                    "GOOGLE_ADMANAGER_CACHE_DIR": "本地缓存目录（可选，默认~/.cache/mcp-admanager）",
+                    "GOOGLE_ADMANAGER_OUTPUT_MODE": "响应JSON格式：pretty(缩进，默认) 或 compact(紧凑)",
+                    "GOOGLE_ADMANAGER_STRUCTURED_CONTENT": "为true时在结果中附带structuredContent（可选）",
+                    "GOOGLE_ADMANAGER_JSON_BACKEND": "JSON序列化后端：auto(默认，已安装orjson时使用)、json 或 orjson",
+                    "GOOGLE_ADMANAGER_ENTITY_SOURCE": "get/list操作的默认数据来源：live(默认) 或 index",
+                    "GOOGLE_ADMANAGER_INDEX_MAX_STALENESS": "本地实体索引允许的最大陈旧秒数（可选，默认300）",
+                    "GOOGLE_ADMANAGER_RATE_LIMIT": "每个网络每秒最多的API调用数（可选，默认8）",
+                    "GOOGLE_ADMANAGER_SERVICE_RATE_LIMIT": "每个服务每秒最多的API调用数（可选，默认4）",
+                    "GOOGLE_ADMANAGER_MAX_RETRIES": "配额或临时错误的最大重试次数（可选，默认4）",
+                    "GOOGLE_ADMANAGER_NETWORK_CACHE_TTL": "网络信息缓存秒数（可选，默认86400）",
+                    "GOOGLE_ADMANAGER_COALESCE": "为false时关闭相同只读调用的合并（可选，默认true）",
+                    "GOOGLE_ADMANAGER_BATCH_CONCURRENCY": "get_many和bulk_create同时进行的分批请求数量（可选，默认4）",
+                    "GOOGLE_ADMANAGER_REPORT_PLAN_WINDOW": "已有相同范围的报告在运行时，合并兼容报告请求的等待窗口秒数（可选，默认0.1，为0时不合并）",
+                    "GOOGLE_ADMANAGER_REPORT_SHARD_CONCURRENCY": "分片报告同时运行的作业数量（可选，默认3）",
+                    "GOOGLE_ADMANAGER_REPORT_SHARD_CACHE_MAX_BYTES": "分片结果缓存的总大小上限（可选，默认256MB）",
+                    "GOOGLE_ADMANAGER_ROLLUP_PATH": "物化报告SQLite文件路径（可选，默认缓存目录下的report_rollups.sqlite3）",
+                    "GOOGLE_ADMANAGER_ROLLUP_FINAL_AFTER_DAYS": "早于今天多少天的数据视为最终数据：物化报告不再刷新，报告缓存按历史范围保存（可选，默认3）",
+                    "GOOGLE_ADMANAGER_ROLLUP_REFETCH_INTERVAL": "未最终确定的日期重新拉取的最短间隔秒数（可选，默认900）",
+                    "GOOGLE_ADMANAGER_ROLLUP_REFRESH_INTERVAL": "后台刷新物化报告的间隔秒数（可选，默认3600，为0时不在后台刷新）",
+                    "GOOGLE_ADMANAGER_JOB_PATH": "后台作业SQLite文件路径（可选，默认缓存目录下的jobs.sqlite3）",
+                    "GOOGLE_ADMANAGER_JOB_WORKERS": "同时运行的后台作业数量（可选，默认2）",
+                    "GOOGLE_ADMANAGER_JOB_RETENTION": "已结束作业及其结果保留的秒数（可选，默认604800）",
+                    "GOOGLE_ADMANAGER_EXPORT_DIR": "export_entities的默认输出目录（可选，默认缓存目录下的exports）",
+                    "GOOGLE_ADMANAGER_METRICS_FILE": "设置后定期以Prometheus文本格式写入运行指标（可选）",
+                    "GOOGLE_ADMANAGER_METRICS_INTERVAL": "写入指标文件的间隔秒数（可选，默认15）"
+                },
+                "authentication": {
+                    "method": "使用GOOGLE_APPLICATION_CREDS环境变量指定认证文件",
+                    "environment_variable": "GOOGLE_APPLICATION_CREDS",
+                    "example": "export GOOGLE_APPLICATION_CREDS=/root/.gcloud/aaa.json",
+                    "fallback": "如果未设置环境变量，将使用默认的application_default_credentials.json"
                 }
-            ]
-        }
+            },
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def _cache_identity(self) -> str:
+        """按配置的凭据来源和网络区分缓存的标识，不加载凭据、不换取令牌"""
+        return f"{self.credential_manager.configured_source}:{self.network_code or 'default'}"
+
+    def _network_today(self):
+        """网络时区中的今天；时区未缓存时通过 manage_networks 查询一次（结果进入网络元数据缓存）"""
+        identity = self._cache_identity()
+        time_zone = self.network_cache.time_zone(identity)
+        if time_zone is None:
+            with self._time_zone_lock:
+                time_zone = self.network_cache.time_zone(identity)
+                if time_zone is None and identity not in self._time_zone_lookups:
+                    # 查询失败时不再重试，使用本地日期
+                    self._time_zone_lookups.add(identity)
+                    self.manage_networks("get_current")
+                    time_zone = self.network_cache.time_zone(identity)
+        return network_today(time_zone)
+
+    def _network_result(self, action: str, value: Any, identity: str = None,
+                        cache_key: str = None) -> Dict[str, Any]:
+        """manage_networks 的结果，来自缓存时附带缓存时间"""
+        if action == "get_current":
+            result = {"success": True, "action": action, "network": value}
+        else:
+            result = {"success": True, "action": action, "networks": value, "total": len(value)}
+        if identity is not None:
+            cached_at = self.network_cache.cached_at(identity, cache_key)
+            result["cached"] = True
+            result["cached_at"] = datetime.fromtimestamp(cached_at).isoformat() if cached_at else None
+        return result
 
     def manage_networks(self, action: str) -> Dict[str, Any]:
         """管理Ad Manager网络"""
-        print(f"🔍 manage_networks 被调用，action: {action}")
+        print(f"🔍 manage_networks 被调用，action: {action}", file=sys.stderr)
         try:
-            # 使用新的认证方法
-            credentials, project = self._get_credentials()
-            print(f"✅ 获取到凭证，项目: {project}")
+            identity = self._cache_identity()
+            if action == "invalidate":
+                dropped = self.network_cache.invalidate(identity)
+                with self._time_zone_lock:
+                    self._time_zone_lookups.discard(identity)
+                return self.output.tool_result({
+                    "success": True,
+                    "action": "invalidate",
+                    "dropped": dropped
+                })
+            
+            # 网络元数据几乎不变，TTL内直接返回缓存
+            cache_key = KEY_CURRENT if action == "get_current" else KEY_ALL
+            cached = self.network_cache.get(identity, cache_key) if action in ("get_current", "list_all") else None
+            if cached is not None:
+                return self.output.tool_result(self._network_result(action, cached, identity, cache_key))
             
             # 尝试使用新的 google-ads-admanager
             try:
-                print("🔍 尝试使用新版本 google-ads-admanager 库")
-                from google.ads.admanager import NetworkServiceClient
-                network_service = NetworkServiceClient(credentials=credentials)
-                print("✅ NetworkServiceClient 初始化成功")
+                print("🔍 尝试使用新版本 google-ads-admanager 库", file=sys.stderr)
+                network_service = self.clients.get_client("NetworkServiceClient")
                 
                 if action == "get_current":
                     # 获取当前网络信息
                     request = {"networkCode": "current"}
                     current_network = network_service.get_network(request=request)
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "get_current",
-                                    "network": {
-                                        "networkCode": current_network.network_code,
-                                        "displayName": current_network.display_name,
-                                        "networkCodeForTest": current_network.network_code_for_test,
-                                        "timeZone": current_network.time_zone
-                                    }
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
+                    network = {
+                        "networkCode": current_network.network_code,
+                        "displayName": current_network.display_name,
+                        "networkCodeForTest": current_network.network_code_for_test,
+                        "timeZone": current_network.time_zone
                     }
+                    self.network_cache.put(identity, KEY_CURRENT, network)
+                    
+                    return self.output.tool_result(self._network_result(action, network))
                 
                 elif action == "list_all":
                     # 列出所有网络
@@ -417,57 +1408,35 @@ class MCPAdManagerEnhancedUltimateServer:
                                 "timeZone": network.time_zone
                             })
                     
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list_all",
-                                    "networks": network_list,
-                                    "total": len(network_list)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    self.network_cache.put(identity, KEY_ALL, network_list)
+                    
+                    return self.output.tool_result(self._network_result(action, network_list))
                     
             except ImportError as e:
                 # 如果新版本库不可用，使用旧的 googleads
-                print(f"⚠️ 新版本库导入失败: {e}")
-                print("🔄 尝试使用旧版本 googleads 库")
-                import os
+                print(f"⚠️ 新版本库导入失败: {e}", file=sys.stderr)
+                print("🔄 尝试使用旧版本 googleads 库", file=sys.stderr)
                 network_code = os.getenv('GOOGLE_ADMANAGER_NETWORK_CODE')
                 if not network_code:
                     raise ValueError("需要设置 GOOGLE_ADMANAGER_NETWORK_CODE 环境变量")
                 
-                client = ad_manager.AdManagerClient.LoadFromStorage()
-                
                 if action == "get_current":
                     # 获取当前网络信息
-                    network_service = client.GetService('NetworkService', version='v202405')
+                    network_service = self.clients.get_legacy_service('NetworkService')
                     current_network = network_service.getCurrentNetwork()
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "get_current",
-                                    "network": {
-                                        "networkCode": current_network.get('networkCode'),
-                                        "displayName": current_network.get('displayName'),
-                                        "networkCodeForTest": current_network.get('networkCodeForTest'),
-                                        "timeZone": current_network.get('timeZone')
-                                    }
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
+                    network = {
+                        "networkCode": current_network.get('networkCode'),
+                        "displayName": current_network.get('displayName'),
+                        "networkCodeForTest": current_network.get('networkCodeForTest'),
+                        "timeZone": current_network.get('timeZone')
                     }
+                    self.network_cache.put(identity, KEY_CURRENT, network)
+                    
+                    return self.output.tool_result(self._network_result(action, network))
                 
                 elif action == "list_all":
                     # 列出所有网络
-                    network_service = client.GetService('NetworkService', version='v202405')
+                    network_service = self.clients.get_legacy_service('NetworkService')
                     all_networks = network_service.getAllNetworks()
                     
                     network_list = []
@@ -479,769 +1448,1008 @@ class MCPAdManagerEnhancedUltimateServer:
                             "timeZone": network.get('timeZone')
                         })
                     
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list_all",
-                                    "networks": network_list,
-                                    "total": len(network_list)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    self.network_cache.put(identity, KEY_ALL, network_list)
+                    
+                    return self.output.tool_result(self._network_result(action, network_list))
             
             else:
-                return {
-                    "content": [
-                        {
-                            "type": анализировать,
-                            "text": json.dumps({
-                                "success": False,
-                                "error": f"不支持的操作: {action}"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                return self.output.tool_result({
+                    "success": False,
+                    "error": f"不支持的操作: {action}"
+                })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self.output.tool_result({"success": False, "error": str(e)})
 
     def manage_inventory(self, action: str, parent_id: str = None, 
-                        ad_unit_id: str = None, ad_unit_name: str = None) -> Dict[str, Any]:
+                        ad_unit_id: str = None, ad_unit_name: str = None,
+                        page_size: int = None, max_items: int = None,
+                        page_token: str = None, source: str = None,
+                        ids: List[str] = None,
+                        items: List[Dict[str, Any]] = None,
+                        depth: int = None, fields: List[str] = None,
+                        entity_filter: Dict[str, Any] = None, order_by: str = None) -> Dict[str, Any]:
         """管理Ad Manager库存"""
         try:
-            # 使用新的认证方法
-            credentials, project = self._get_credentials()
+            fields = normalize_projection("ad_unit", fields)
+            conditions = normalize_filter("ad_unit", entity_filter)
+            order = normalize_order_by("ad_unit", order_by)
+            # 从本地实体索引读取
+            if (source or DEFAULT_SOURCE) == SOURCE_INDEX and action in ("get", "get_many", "list"):
+                return self._from_entity_index(
+                    "ad_unit", action, ad_unit_id, parent_id, page_size, max_items, page_token, ids, fields,
+                    conditions, order
+                )
+            
+            if action == "get_many":
+                return self._get_many("ad_unit", ids, fields)
+            
+            if action == "bulk_create":
+                return self._bulk_create("ad_unit", items)
+            
+            if action in ("tree", "path"):
+                return self._ad_unit_hierarchy(action, ad_unit_id, depth)
             
             # 尝试使用新的 google-ads-admanager
             try:
-                from google.ads.admanager import AdUnitServiceClient
-                inventory_service = AdUnitServiceClient(credentials=credentials)
+                inventory_service = self.clients.get_client("AdUnitServiceClient")
                 
                 if action == "list":
                     # 列出广告单元
                     request = {}
                     if parent_id:
                         request['parent_id'] = parent_id
+                    request.update(sdk_list_params(conditions, order))
                     
-                    response = inventory_service.list_ad_units(request=request)
-                    
-                    ad_units = []
-                    if hasattr(response, 'ad_units') and response.ad_units:
-                        for ad_unit in response.ad_units:
-                            ad_units.append({
-                                "id": ad_unit.id,
-                                "name": ad_unit.name,
-                                "description": ad_unit.description,
-                                "targetWindow": ad_unit.target_window,
-                                "status": ad_unit.status
-                            })
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "ad_units": ad_units,
-                                    "total": len(ad_units)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    paginator = SdkPaginator(
+                        inventory_service.list_ad_units, request, 'ad_units',
+                        metadata=field_mask("ad_unit", fields) if fields else None,
+                        **self._paging_kwargs(page_size, max_items, page_token)
+                    )
+                    projected = self._projected_convert("ad_unit", fields)
+                    ad_units = self._collect_pages(paginator, projected or (lambda ad_unit: {
+                        "id": ad_unit.id,
+                        "name": ad_unit.name,
+                        "description": ad_unit.description,
+                        "targetWindow": ad_unit.target_window,
+                        "status": ad_unit.status
+                    }))
+
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "list",
+                        "ad_units": ad_units,
+                        "total": len(ad_units),
+                        **self._pagination_info(paginator)
+                    })
                     
             except ImportError:
                 # 如果新版本库不可用，使用旧的 googleads
                 client = self._get_admanager_client()
-                inventory_service = client.GetService('InventoryService', version='v202405')
+                inventory_service = self.clients.get_legacy_service('InventoryService')
                 
                 if action == "list":
                     # 列出广告单元
-                    statement_builder = client.StatementBuilder()
-                    
-                    if parent_id:
-                        statement_builder.Where('parentId = :parent_id').WithBindVariable('parent_id', parent_id)
-                    
-                    response = inventory_service.getAdUnitsByStatement(statement_builder.ToStatement())
-                    
-                    ad_units = []
-                    if 'results' in response and response['results']:
-                        for ad_unit in response['results']:
-                            ad_units.append({
-                                "id": ad_unit.get('id'),
-                                "name": ad_unit.get('name'),
-                                "description": ad_unit.get('description'),
-                                "targetWindow": ad_unit.get('targetWindow'),
-                                "status": ad_unit.get('status')
-                            })
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "ad_units": ad_units,
-                                    "total": len(ad_units)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    paginator, projected = self._legacy_paginator(
+                        "ad_unit", {"parentId": parent_id}, fields, page_size, max_items, page_token,
+                        conditions, order
+                    )
+                    ad_units = self._collect_pages(paginator, projected or (lambda ad_unit: {
+                        "id": ad_unit.get('id'),
+                        "name": ad_unit.get('name'),
+                        "description": ad_unit.get('description'),
+                        "targetWindow": ad_unit.get('targetWindow'),
+                        "status": ad_unit.get('status')
+                    }))
+
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "list",
+                        "ad_units": ad_units,
+                        "total": len(ad_units),
+                        **self._pagination_info(paginator)
+                    })
                 
                 elif action == "get" and ad_unit_id:
                     # 获取广告单元详情
                     ad_unit = inventory_service.getAdUnit(ad_unit_id)
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "ad_unit": {
-                                    "id": ad_unit.get('id'),
-                                    "name": ad_unit.get('name'),
-                                    "description": ad_unit.get('description'),
-                                    "targetWindow": ad_unit.get('targetWindow'),
-                                    "status": ad_unit.get('status'),
-                                    "parentId": ad_unit.get('parentId')
-                                }
-                            }, ensure_ascii=False, indent=2)
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "get",
+                        "ad_unit": ENTITY_KINDS["ad_unit"].from_legacy(ad_unit, fields) if fields else {
+                            "id": ad_unit.get('id'),
+                            "name": ad_unit.get('name'),
+                            "description": ad_unit.get('description'),
+                            "targetWindow": ad_unit.get('targetWindow'),
+                            "status": ad_unit.get('status'),
+                            "parentId": ad_unit.get('parentId')
                         }
-                    ]
-                }
+                    })
                 
-            elif action == "create" and ad_unit_name:
-                # 创建广告单元
-                ad_unit = {
-                    'name': ad_unit_name,
-                    'description': f'Created via MCP at {datetime.now()}',
-                    'targetWindow': 'BLANK',
-                    'sizes': []
-                }
+                elif action == "create" and ad_unit_name:
+                    # 创建广告单元
+                    ad_unit = {
+                        'name': ad_unit_name,
+                        'description': f'Created via MCP at {datetime.now()}',
+                        'targetWindow': 'BLANK',
+                        'sizes': []
+                    }
                 
-                if parent_id:
-                    ad_unit['parentId'] = int(parent_id)
+                    if parent_id:
+                        ad_unit['parentId'] = int(parent_id)
                 
-                created_ad_unit = inventory_service.createAdUnits([ad_unit])
+                    created_ad_unit = inventory_service.createAdUnits([ad_unit])
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "create",
-                                "ad_unit": {
-                                    "id": created_ad_unit[0].get('id') if created_ad_unit else None,
-                                    "name": created_ad_unit[0].get('name') if created_ad_unit else ad_unit_name
-                                }
-                            }, ensure_ascii=False, indent=2)
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "create",
+                        "ad_unit": {
+                            "id": created_ad_unit[0].get('id') if created_ad_unit else None,
+                            "name": created_ad_unit[0].get('name') if created_ad_unit else ad_unit_name
                         }
-                    ]
-                }
+                    })
             
-            else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                else:
+                    return self.output.tool_result({
+                        "success": False,
+                        "error": "缺少必需参数或操作不支持"
+                    })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self.output.tool_result({"success": False, "error": str(e)})
 
     def manage_orders(self, action: str, order_id: str = None,
-                     order_name: str = None, advertiser_id: str = None) -> Dict[str, Any]:
+                     order_name: str = None, advertiser_id: str = None,
+                     page_size: int = None, max_items: int = None,
+                     page_token: str = None, source: str = None,
+                     ids: List[str] = None,
+                     items: List[Dict[str, Any]] = None,
+                     fields: List[str] = None, entity_filter: Dict[str, Any] = None,
+                     order_by: str = None) -> Dict[str, Any]:
         """管理Ad Manager订单"""
         try:
-            # 使用新的认证方法
-            credentials, project = self._get_credentials()
+            fields = normalize_projection("order", fields)
+            if advertiser_id:
+                entity_filter = {"advertiser_id": advertiser_id, **(entity_filter or {})}
+            conditions = normalize_filter("order", entity_filter)
+            order = normalize_order_by("order", order_by)
+            # 从本地实体索引读取
+            if (source or DEFAULT_SOURCE) == SOURCE_INDEX and action in ("get", "get_many", "list"):
+                return self._from_entity_index(
+                    "order", action, order_id, None, page_size, max_items, page_token, ids, fields,
+                    conditions, order
+                )
+            
+            if action == "get_many":
+                return self._get_many("order", ids, fields)
+            
+            if action == "bulk_create":
+                return self._bulk_create("order", items)
             
             # 尝试使用新的 google-ads-admanager
             try:
-                from google.ads.admanager import OrderServiceClient
-                order_service = OrderServiceClient(credentials=credentials)
+                order_service = self.clients.get_client("OrderServiceClient")
                 
                 if action == "list":
                     # 列出订单
-                    request = {}
-                    response = order_service.list_orders(request=request)
-                    
-                    orders = []
-                    if hasattr(response, 'orders') and response.orders:
-                        for order in response.orders:
-                            orders.append({
-                                "id": order.id,
-                                "name": order.name,
-                                "advertiserId": order.advertiser_id,
-                                "status": order.status,
-                                "startDateTime": order.start_date_time,
-                                "endDateTime": order.end_date_time
-                            })
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "orders": orders,
-                                    "total": len(orders)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    request = sdk_list_params(conditions, order)
+                    paginator = SdkPaginator(
+                        order_service.list_orders, request, 'orders',
+                        metadata=field_mask("order", fields) if fields else None,
+                        **self._paging_kwargs(page_size, max_items, page_token)
+                    )
+                    projected = self._projected_convert("order", fields)
+                    orders = self._collect_pages(paginator, projected or (lambda order: {
+                        "id": order.id,
+                        "name": order.name,
+                        "advertiserId": order.advertiser_id,
+                        "status": order.status,
+                        "startDateTime": order.start_date_time,
+                        "endDateTime": order.end_date_time
+                    }))
+
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "list",
+                        "orders": orders,
+                        "total": len(orders),
+                        **self._pagination_info(paginator)
+                    })
                     
             except ImportError:
                 # 如果新版本库不可用，使用旧的 googleads
                 client = self._get_admanager_client()
-                order_service = client.GetService('OrderService', version='v202405')
+                order_service = self.clients.get_legacy_service('OrderService')
                 
                 if action == "list":
                     # 列出订单
-                    statement_builder = client.StatementBuilder()
-                    response = order_service.getOrdersByStatement(statement_builder.ToStatement())
-                    
-                    orders = []
-                    if 'results' in response and response['results']:
-                        for order in response['results']:
-                            orders.append({
-                                "id": order.get('id'),
-                                "name": order.get('name'),
-                                "advertiserId": order.get('advertiserId'),
-                                "status": order.get('status'),
-                                "currencyCode": order.get('currencyCode')
-                            })
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "orders": orders,
-                                    "total": len(orders)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    paginator, projected = self._legacy_paginator(
+                        "order", {}, fields, page_size, max_items, page_token, conditions, order
+                    )
+                    orders = self._collect_pages(paginator, projected or (lambda order: {
+                        "id": order.get('id'),
+                        "name": order.get('name'),
+                        "advertiserId": order.get('advertiserId'),
+                        "status": order.get('status'),
+                        "currencyCode": order.get('currencyCode')
+                    }))
+
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "list",
+                        "orders": orders,
+                        "total": len(orders),
+                        **self._pagination_info(paginator)
+                    })
             
-            elif action == "get" and order_id:
-                # 获取订单详情
-                order = order_service.getOrder(order_id)
+                elif action == "get" and order_id:
+                    # 获取订单详情
+                    order = order_service.getOrder(order_id)
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "order": {
-                                    "id": order.get('id'),
-                                    "name": order.get('name'),
-                                    "advertiserId": order.get('advertiserId'),
-                                    "status": order.get('status'),
-                                    "currencyCode": order.get('currencyCode'),
-                                    "startDateTime": order.get('startDateTime'),
-                                    "endDateTime": order.get('endDateTime')
-                                }
-                            }, ensure_ascii=False, indent=2)
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "get",
+                        "order": ENTITY_KINDS["order"].from_legacy(order, fields) if fields else {
+                            "id": order.get('id'),
+                            "name": order.get('name'),
+                            "advertiserId": order.get('advertiserId'),
+                            "status": order.get('status'),
+                            "currencyCode": order.get('currencyCode'),
+                            "startDateTime": order.get('startDateTime'),
+                            "endDateTime": order.get('endDateTime')
                         }
-                    ]
-                }
+                    })
             
-            else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                else:
+                    return self.output.tool_result({
+                        "success": False,
+                        "error": "缺少必需参数或操作不支持"
+                    })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self.output.tool_result({"success": False, "error": str(e)})
 
     def manage_line_items(self, action: str, order_id: str = None,
-                         line_item_id: str = None, line_item_name: str = None) -> Dict[str, Any]:
+                         line_item_id: str = None, line_item_name: str = None,
+                         page_size: int = None, max_items: int = None,
+                         page_token: str = None, source: str = None,
+                         ids: List[str] = None,
+                         items: List[Dict[str, Any]] = None,
+                         fields: List[str] = None, entity_filter: Dict[str, Any] = None,
+                         order_by: str = None) -> Dict[str, Any]:
         """管理Ad Manager行项目"""
         try:
-            # 使用新的认证方法
-            credentials, project = self._get_credentials()
+            fields = normalize_projection("line_item", fields)
+            conditions = normalize_filter("line_item", entity_filter)
+            order = normalize_order_by("line_item", order_by)
+            # 从本地实体索引读取
+            if (source or DEFAULT_SOURCE) == SOURCE_INDEX and action in ("get", "get_many", "list"):
+                return self._from_entity_index(
+                    "line_item", action, line_item_id, order_id, page_size, max_items, page_token, ids, fields,
+                    conditions, order
+                )
+            
+            if action == "get_many":
+                return self._get_many("line_item", ids, fields)
+            
+            if action == "bulk_create":
+                return self._bulk_create("line_item", items)
             
             # 尝试使用新的 google-ads-admanager
             try:
-                from google.ads.admanager import LineItemServiceClient
-                line_item_service = LineItemServiceClient(credentials=credentials)
+                line_item_service = self.clients.get_client("LineItemServiceClient")
                 
                 if action == "list":
                     # 列出行项目
                     request = {}
                     if order_id:
                         request['order_id'] = order_id
+                    request.update(sdk_list_params(conditions, order))
                     
-                    response = line_item_service.list_line_items(request=request)
-                    
-                    line_items = []
-                    if hasattr(response, 'line_items') and response.line_items:
-                        for line_item in response.line_items:
-                            line_items.append({
-                                "id": line_item.id,
-                                "name": line_item.name,
-                                "orderId": line_item.order_id,
-                                "status": line_item.status,
-                                "startDateTime": line_item.start_date_time,
-                                "endDateTime": line_item.end_date_time
-                            })
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "line_items": line_items,
-                                    "total": len(line_items)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    paginator = SdkPaginator(
+                        line_item_service.list_line_items, request, 'line_items',
+                        metadata=field_mask("line_item", fields) if fields else None,
+                        **self._paging_kwargs(page_size, max_items, page_token)
+                    )
+                    projected = self._projected_convert("line_item", fields)
+                    line_items = self._collect_pages(paginator, projected or (lambda line_item: {
+                        "id": line_item.id,
+                        "name": line_item.name,
+                        "orderId": line_item.order_id,
+                        "status": line_item.status,
+                        "startDateTime": line_item.start_date_time,
+                        "endDateTime": line_item.end_date_time
+                    }))
+
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "list",
+                        "line_items": line_items,
+                        "total": len(line_items),
+                        **self._pagination_info(paginator)
+                    })
                     
             except ImportError:
                 # 如果新版本库不可用，使用旧的 googleads
                 client = self._get_admanager_client()
-                line_item_service = client.GetService('LineItemService', version='v202405')
+                line_item_service = self.clients.get_legacy_service('LineItemService')
                 
                 if action == "list":
                     # 列出行项目
-                    statement_builder = client.StatementBuilder()
-                    
-                    if order_id:
-                        statement_builder.Where('orderId = :order_id').WithBindVariable('order_id', order_id)
-                    
-                    response = line_item_service.getLineItemsByStatement(statement_builder.ToStatement())
-                    
-                    line_items = []
-                    if 'results' in response and response['results']:
-                        for line_item in response['results']:
-                            line_items.append({
-                                "id": line_item.get('id'),
-                                "name": line_item.get('name'),
-                                "orderId": line_item.get('orderId'),
-                                "status": line_item.get('status'),
-                                "lineItemType": line_item.get('lineItemType'),
-                                "costType": line_item.get('costType')
-                            })
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "line_items": line_items,
-                                    "total": len(line_items)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    paginator, projected = self._legacy_paginator(
+                        "line_item", {"orderId": order_id}, fields, page_size, max_items, page_token,
+                        conditions, order
+                    )
+                    line_items = self._collect_pages(paginator, projected or (lambda line_item: {
+                        "id": line_item.get('id'),
+                        "name": line_item.get('name'),
+                        "orderId": line_item.get('orderId'),
+                        "status": line_item.get('status'),
+                        "lineItemType": line_item.get('lineItemType'),
+                        "costType": line_item.get('costType')
+                    }))
+
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "list",
+                        "line_items": line_items,
+                        "total": len(line_items),
+                        **self._pagination_info(paginator)
+                    })
             
-            elif action == "get" and line_item_id:
-                # 获取行项目详情
-                line_item = line_item_service.getLineItem(line_item_id)
+                elif action == "get" and line_item_id:
+                    # 获取行项目详情
+                    line_item = line_item_service.getLineItem(line_item_id)
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "line_item": {
-                                    "id": line_item.get('id'),
-                                    "name": line_item.get('name'),
-                                    "orderId": line_item.get('orderId'),
-                                    "status": line_item.get('status'),
-                                    "lineItemType": line_item.get('lineItemType'),
-                                    "costType": line_item.get('costType'),
-                                    "costPerUnit": line_item.get('costPerUnit')
-                                }
-                            }, ensure_ascii=False, indent=2)
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "get",
+                        "line_item": ENTITY_KINDS["line_item"].from_legacy(line_item, fields) if fields else {
+                            "id": line_item.get('id'),
+                            "name": line_item.get('name'),
+                            "orderId": line_item.get('orderId'),
+                            "status": line_item.get('status'),
+                            "lineItemType": line_item.get('lineItemType'),
+                            "costType": line_item.get('costType'),
+                            "costPerUnit": line_item.get('costPerUnit')
                         }
-                    ]
-                }
+                    })
             
-            else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                else:
+                    return self.output.tool_result({
+                        "success": False,
+                        "error": "缺少必需参数或操作不支持"
+                    })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self.output.tool_result({"success": False, "error": str(e)})
 
-    def manage_creatives(self, action: str, creative_id: str = None) -> Dict[str, Any]:
+    def manage_creatives(self, action: str, creative_id: str = None,
+                         page_size: int = None, max_items: int = None,
+                         page_token: str = None, source: str = None,
+                         ids: List[str] = None,
+                         fields: List[str] = None, entity_filter: Dict[str, Any] = None,
+                         order_by: str = None) -> Dict[str, Any]:
         """管理Ad Manager创意"""
         try:
-            # 使用新的认证方法
-            credentials, project = self._get_credentials()
+            fields = normalize_projection("creative", fields)
+            conditions = normalize_filter("creative", entity_filter)
+            order = normalize_order_by("creative", order_by)
+            # 从本地实体索引读取
+            if (source or DEFAULT_SOURCE) == SOURCE_INDEX and action in ("get", "get_many", "list"):
+                return self._from_entity_index(
+                    "creative", action, creative_id, None, page_size, max_items, page_token, ids, fields,
+                    conditions, order
+                )
+            
+            if action == "get_many":
+                return self._get_many("creative", ids, fields)
             
             # 尝试使用新的 google-ads-admanager
             try:
-                from google.ads.admanager import CreativeServiceClient
-                creative_service = CreativeServiceClient(credentials=credentials)
+                creative_service = self.clients.get_client("CreativeServiceClient")
                 
                 if action == "list":
                     # 列出创意
-                    request = {}
-                    response = creative_service.list_creatives(request=request)
-                    
-                    creatives = []
-                    if hasattr(response, 'creatives') and response.creatives:
-                        for creative in response.creatives:
-                            creatives.append({
-                                "id": creative.id,
-                                "name": creative.name,
-                                "advertiserId": creative.advertiser_id,
-                                "size": creative.size,
-                                "isNativeEligible": creative.is_native_eligible
-                            })
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "creatives": creatives,
-                                    "total": len(creatives)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    request = sdk_list_params(conditions, order)
+                    paginator = SdkPaginator(
+                        creative_service.list_creatives, request, 'creatives',
+                        metadata=field_mask("creative", fields) if fields else None,
+                        **self._paging_kwargs(page_size, max_items, page_token)
+                    )
+                    projected = self._projected_convert("creative", fields)
+                    creatives = self._collect_pages(paginator, projected or (lambda creative: {
+                        "id": creative.id,
+                        "name": creative.name,
+                        "advertiserId": creative.advertiser_id,
+                        "size": creative.size,
+                        "isNativeEligible": creative.is_native_eligible
+                    }))
+
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "list",
+                        "creatives": creatives,
+                        "total": len(creatives),
+                        **self._pagination_info(paginator)
+                    })
                     
             except ImportError:
                 # 如果新版本库不可用，使用旧的 googleads
                 client = self._get_admanager_client()
-                creative_service = client.GetService('CreativeService', version='v202405')
+                creative_service = self.clients.get_legacy_service('CreativeService')
                 
                 if action == "list":
                     # 列出创意
-                    statement_builder = client.StatementBuilder()
-                    response = creative_service.getCreativesByStatement(statement_builder.ToStatement())
-                    
-                    creatives = []
-                    if 'results' in response and response['results']:
-                        for creative in response['results']:
-                            creatives.append({
-                                "id": creative.get('id'),
-                                "name": creative.get('name'),
-                                "advertiserId": creative.get('advertiserId'),
-                                "size": creative.get('size'),
-                                "isNativeEligible": creative.get('isNativeEligible')
-                            })
-                    
-                    return {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps({
-                                    "success": True,
-                                    "action": "list",
-                                    "creatives": creatives,
-                                    "total": len(creatives)
-                                }, ensure_ascii=False, indent=2)
-                            }
-                        ]
-                    }
+                    paginator, projected = self._legacy_paginator(
+                        "creative", {}, fields, page_size, max_items, page_token, conditions, order
+                    )
+                    creatives = self._collect_pages(paginator, projected or (lambda creative: {
+                        "id": creative.get('id'),
+                        "name": creative.get('name'),
+                        "advertiserId": creative.get('advertiserId'),
+                        "size": creative.get('size'),
+                        "isNativeEligible": creative.get('isNativeEligible')
+                    }))
+
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "list",
+                        "creatives": creatives,
+                        "total": len(creatives),
+                        **self._pagination_info(paginator)
+                    })
             
-            elif action == "get" and creative_id:
-                # 获取创意详情
-                creative = creative_service.getCreative(creative_id)
+                elif action == "get" and creative_id:
+                    # 获取创意详情
+                    creative = creative_service.getCreative(creative_id)
                 
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "action": "get",
-                                "creative": {
-                                    "id": creative.get('id'),
-                                    "name": creative.get('name'),
-                                    "advertiserId": creative.get('advertiserId'),
-                                    "size": creative.get('size'),
-                                    "isNativeEligible": creative.get('isNativeEligible')
-                                }
-                            }, ensure_ascii=False, indent=2)
+                    return self.output.tool_result({
+                        "success": True,
+                        "action": "get",
+                        "creative": ENTITY_KINDS["creative"].from_legacy(creative, fields) if fields else {
+                            "id": creative.get('id'),
+                            "name": creative.get('name'),
+                            "advertiserId": creative.get('advertiserId'),
+                            "size": creative.get('size'),
+                            "isNativeEligible": creative.get('isNativeEligible')
                         }
-                    ]
-                }
+                    })
             
-            else:
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": False,
-                                "error": "缺少必需参数或操作不支持"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
-                }
+                else:
+                    return self.output.tool_result({
+                        "success": False,
+                        "error": "缺少必需参数或操作不支持"
+                    })
                 
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self.output.tool_result({"success": False, "error": str(e)})
 
-    def generate_report(self, report_type: str, start_date: str = None, 
-                       end_date: str = None) -> Dict[str, Any]:
-        """生成Ad Manager报告"""
+    def manage_entity_index(self, action: str, kind: str = None,
+                            full: bool = False) -> Dict[str, Any]:
+        """查看、同步或清空本地实体索引"""
         try:
-            # 使用新的认证方法
-            credentials, project = self._get_credentials()
+            if kind is not None and kind not in ENTITY_KINDS:
+                raise ValueError(f"不支持的实体类型: {kind}")
+            kinds = [kind] if kind else list(ENTITY_KINDS)
             
-            # 尝试使用新的 google-ads-admanager
-            try:
-                from google.ads.admanager import ReportServiceClient
-                report_service = ReportServiceClient(credentials=credentials)
-                
-                # 创建报告作业
-                report_job = {
-                    'report_query': {
-                        'dimensions': [],
-                        'columns': []
-                    }
+            if action == "status":
+                result = {
+                    "success": True,
+                    "action": "status",
+                    "index": self.entity_sync.stats(),
+                    "hierarchy": self.ad_unit_tree.stats()
                 }
-                
-                # 根据报告类型设置不同的维度和列
-                if report_type == "inventory":
-                    report_job['report_query']['dimensions'] = ['AD_UNIT_NAME']
-                    report_job['report_query']['columns'] = ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
-                elif report_type == "order":
-                    report_job['report_query']['dimensions'] = ['ORDER_NAME']
-                    report_job['report_query']['columns'] = ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
-                elif report_type == "line_item":
-                    report_job['report_query']['dimensions'] = ['LINE_ITEM_NAME']
-                    report_job['report_query']['columns'] = ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
-                
-                # 设置日期范围
-                if start_date and end_date:
-                    report_job['report_query']['date_range_type'] = 'CUSTOM_DATE'
-                    report_job['report_query']['start_date'] = {
-                        'year': int(start_date.split('-')[0]),
-                        'month': int(start_date.split('-')[1]),
-                        'day': int(start_date.split('-')[2])
-                    }
-                    report_job['report_query']['end_date'] = {
-                        'year': int(end_date.split('-')[0]),
-                        'month': int(end_date.split('-')[1]),
-                        'day': int(end_date.split('-')[2])
-                    }
-                else:
-                    report_job['report_query']['date_range_type'] = 'LAST_7_DAYS'
-                
-                # 创建报告作业
-                job = report_service.run_report_job(report_job)
-                
-                return {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": json.dumps({
-                                "success": True,
-                                "report_type": report_type,
-                                "job_id": job.id,
-                                "status": job.status,
-                                "message": "报告作业已创建，请稍后查询结果"
-                            }, ensure_ascii=False, indent=2)
-                        }
-                    ]
+            elif action == "sync":
+                synced = {k: self.entity_sync.sync(k, full=full) for k in kinds}
+                self.entity_sync.start_background()
+                result = {
+                    "success": True,
+                    "action": "sync",
+                    "full": bool(full),
+                    "synced": synced
                 }
-                
-            except ImportError:
-                # 如果新版本库不可用，使用旧的 googleads
-                client = self._get_admanager_client()
-                report_service = client.GetService('ReportService', version='v202405')
+            elif action == "clear":
+                self.entity_sync.stop_background()
+                self.entity_index.clear()
+                self.ad_unit_tree.clear()
+                result = {"success": True, "action": "clear"}
+            else:
+                result = {"success": False, "error": f"不支持的操作: {action}"}
             
-            # 创建报告作业
-            report_job = {
-                'reportQuery': {
-                    'dimensions': [],
-                    'columns': []
-                }
-            }
+            return self.output.tool_result(result)
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def export_entities(self, kind: str, format: str = FORMAT_NDJSON, gzip: bool = False,
+                        path: str = None, resume: bool = False, max_rows: int = None,
+                        page_size: int = None) -> Dict[str, Any]:
+        """把一种实体逐页流式导出到本地文件"""
+        try:
+            if kind not in ENTITY_KINDS:
+                raise ValueError(f"不支持的实体类型: {kind}")
+            if max_rows is not None and int(max_rows) <= 0:
+                raise ValueError("max_rows 必须为正整数")
+            spec = ENTITY_KINDS[kind]
+            
+            if resume:
+                if not path:
+                    raise ValueError("resume 需要提供上一次导出的 path")
+                export = EntityExport.resume(path, kind, spec.fields)
+            else:
+                path = path or default_export_path(kind, format, gzip)
+                if os.path.exists(os.path.expanduser(path)):
+                    raise ValueError(f"文件已存在: {path}（继续未完成的导出请使用 resume=true）")
+                export = EntityExport(kind, path, format, gzip, spec.fields)
             
-            # 根据报告类型设置不同的维度和列
-            if report_type == "inventory":
-                report_job['reportQuery']['dimensions'] = ['AD_UNIT_NAME']
-                report_job['reportQuery']['columns'] = ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
-            elif report_type == "order":
-                report_job['reportQuery']['dimensions'] = ['ORDER_NAME']
-                report_job['reportQuery']['columns'] = ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
-            elif report_type == "line_item":
-                report_job['reportQuery']['dimensions'] = ['LINE_ITEM_NAME']
-                report_job['reportQuery']['columns'] = ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
+            written = 0
+            if not export.completed:
+                paginator, convert = self._entity_paginator(
+                    kind, page_size=page_size, page_token=export.start_token
+                )
+                written = export.write_pages(paginator, convert, max_rows)
+                export.finish()
+                print(f"📦 导出 {kind}: 本次 {written} 行，共 {export.state['rows']} 行 → {export.path}",
+                      file=sys.stderr)
             
-            # 设置日期范围
-            if start_date and end_date:
-                report_job['reportQuery']['dateRangeType'] = 'CUSTOM_DATE'
-                report_job['reportQuery']['startDate'] = {
-                    'year': int(start_date.split('-')[0]),
-                    'month': int(start_date.split('-')[1]),
-                    'day': int(start_date.split('-')[2])
+            return self.output.tool_result({"success": True, "action": "export", **export.summary(written)})
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def get_metrics(self, action: str, metric: str = None, format: str = "json",
+                    path: str = None) -> Dict[str, Any]:
+        """查看、导出或清空运行指标"""
+        try:
+            if action == "get":
+                if format == "prometheus":
+                    return {"content": [{"type": "text", "text": self.metrics.to_prometheus()}]}
+                result = {
+                    "success": True,
+                    "action": "get",
+                    "uptime_seconds": round(self.metrics.uptime(), 1),
+                    "metrics": self.metrics.snapshot(metric)
                 }
-                report_job['reportQuery']['endDate'] = {
-                    'year': int(end_date.split('-')[0]),
-                    'month': int(end_date.split('-')[1]),
-                    'day': int(end_date.split('-')[2])
+            elif action == "dump":
+                path = path or DEFAULT_METRICS_FILE
+                if not path:
+                    raise ValueError("dump 操作需要提供 path 或设置 GOOGLE_ADMANAGER_METRICS_FILE")
+                path = os.path.expanduser(path)
+                result = {
+                    "success": True,
+                    "action": "dump",
+                    "path": path,
+                    "bytes": self.metrics.dump(path)
                 }
+            elif action == "reset":
+                self.metrics.reset()
+                result = {"success": True, "action": "reset"}
             else:
-                report_job['reportQuery']['dateRangeType'] = 'LAST_7_DAYS'
+                result = {"success": False, "error": f"不支持的操作: {action}"}
             
-            # 创建报告作业
-            job = report_service.runReportJob(report_job)
+            return self.output.tool_result(result)
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def get_job_status(self, job_id: str = None, state: str = None,
+                       limit: int = DEFAULT_JOB_LIST_LIMIT, wait: float = 0) -> Dict[str, Any]:
+        """查询后台作业状态，不提供job_id时列出最近的作业"""
+        try:
+            if job_id:
+                result = {"success": True, "job": self.jobs.status(job_id, wait or 0)}
+            else:
+                jobs = self.jobs.list(state, limit)
+                result = {"success": True, "jobs": jobs, "total": len(jobs)}
+            return self.output.tool_result(result)
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def get_job_result(self, job_id: str, wait: float = 0) -> Dict[str, Any]:
+        """已结束作业返回原工具的响应，未结束时返回状态"""
+        try:
+            outcome = self.jobs.result(job_id, wait or 0)
+            if outcome["result"] is not None:
+                return outcome["result"]
+            status = outcome["status"]
+            if status["done"]:
+                return self.output.tool_result({"success": False, "error": status["error"], "job": status})
+            return self.output.tool_result({
+                "success": True,
+                "done": False,
+                "message": "作业尚未结束，稍后再次调用或传入wait等待",
+                "job": status
+            })
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """取消后台作业"""
+        try:
+            return self.output.tool_result({"success": True, "job": self.jobs.cancel(job_id)})
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def manage_client_pool(self, action: str) -> Dict[str, Any]:
+        """查看或重置服务客户端连接池"""
+        try:
+            if action == "status":
+                result = {
+                    "success": True,
+                    "action": "status",
+                    "pool": self.clients.stats(),
+                    "scheduler": self.scheduler.stats(),
+                    "coalescing": self.single_flight.stats(),
+                    "report_planner": self.report_planner.stats(),
+                    "jobs": self.jobs.stats(),
+                    "credentials": self.credential_manager.stats()
+                }
+            elif action == "reset":
+                dropped = self.clients.reset()
+                self.client = None
+                result = {
+                    "success": True,
+                    "action": "reset",
+                    "dropped_clients": dropped
+                }
+            else:
+                result = {"success": False, "error": f"不支持的操作: {action}"}
             
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({
-                            "success": True,
-                            "report_type": report_type,
-                            "job": {
-                                "id": job.get('id'),
-                                "status": job.get('reportJobStatus')
-                            },
-                            "message": "报告作业已创建，请通过报告ID查询结果"
-                        }, ensure_ascii=False, indent=2)
-                    }
-                ]
+            return self.output.tool_result(result)
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def _report_fields(self, report_type: str):
+        """报告类型对应的 (维度, 列)"""
+        if report_type == "inventory":
+            return ['AD_UNIT_NAME'], ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
+        elif report_type == "order":
+            return ['ORDER_NAME'], ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
+        elif report_type == "line_item":
+            return ['LINE_ITEM_NAME'], ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
+        elif report_type == "creative":
+            return ['CREATIVE_NAME'], ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS']
+        elif report_type == "ad_server":
+            return ['DATE'], ['AD_SERVER_IMPRESSIONS', 'AD_SERVER_CLICKS', 'AD_SERVER_CTR',
+                              'AD_SERVER_CPM_AND_CPC_REVENUE', 'AD_SERVER_WITHOUT_CPD_AVERAGE_ECPM']
+        return [], []
+
+    def _report_job(self, dimensions: List[str], columns: List[str], start_date: Optional[str],
+                    end_date: Optional[str], legacy: bool = False,
+                    filters: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """构造报告作业（新版SDK字段为snake_case，旧版为camelCase）"""
+        if legacy:
+            query_key, range_key, start_key, end_key = 'reportQuery', 'dateRangeType', 'startDate', 'endDate'
+        else:
+            query_key, range_key, start_key, end_key = 'report_query', 'date_range_type', 'start_date', 'end_date'
+        query = {'dimensions': list(dimensions), 'columns': list(columns)}
+        
+        # 设置日期范围
+        if start_date and end_date:
+            query[range_key] = 'CUSTOM_DATE'
+            for key, value in ((start_key, start_date), (end_key, end_date)):
+                year, month, day = (int(part) for part in value.split('-'))
+                query[key] = {'year': year, 'month': month, 'day': day}
+        else:
+            query[range_key] = 'LAST_7_DAYS'
+        
+        # 维度过滤：旧版为带绑定变量的PQL语句，新版为报告定义的filters
+        if filters and legacy:
+            statement_builder = self._get_admanager_client().StatementBuilder()
+            query['statement'] = apply_legacy_filters(statement_builder, filters).ToStatement()
+        elif filters:
+            query['filters'] = sdk_filters(filters)
+        return {query_key: query}
+
+    def _run_report_job(self, dimensions: List[str], columns: List[str], start_date: Optional[str],
+                        end_date: Optional[str], timeout: Optional[int],
+                        filters: Optional[List[Dict[str, Any]]] = None):
+        """运行一个报告作业并等待完成，返回 (作业ID, 状态, 下载地址)"""
+        try:
+            report_service = self.clients.get_client("ReportServiceClient")
+            job = report_service.run_report_job(
+                self._report_job(dimensions, columns, start_date, end_date, filters=filters)
+            )
+            status = wait_for_report(
+                lambda: report_service.get_report_job_status(request={"report_job_id": job.id}),
+                timeout=timeout
+            )
+            download_url = report_service.get_report_download_url(
+                request={"report_job_id": job.id, "export_format": EXPORT_FORMAT}
+            )
+            return job.id, status, download_url
+        except ImportError:
+            report_service = self.clients.get_legacy_service('ReportService')
+        
+        job = report_service.runReportJob(
+            self._report_job(dimensions, columns, start_date, end_date, legacy=True, filters=filters)
+        )
+        job_id = job.get('id')
+        status = wait_for_report(lambda: report_service.getReportJobStatus(job_id), timeout=timeout)
+        return job_id, status, report_service.getReportDownloadURL(job_id, EXPORT_FORMAT)
+
+    def _report_shard(self, dimensions: List[str], columns: List[str], start_date: str,
+                      end_date: str, filters: List[Dict[str, Any]], timeout: Optional[int],
+                      use_cache: bool, today) -> Dict[str, Any]:
+        """运行一个日期分片，结果按维度值汇总后缓存；已结束的分片缓存时间更长"""
+        cache_key = report_cache_key(dimensions, columns, start_date, end_date, self.network_code,
+                                     today=today, filters=filters)
+        if use_cache:
+            entry = self.shard_cache.get(cache_key)
+            if entry is not None:
+                return {**entry["value"], "cached": True}
+        job_id, status, download_url = self._run_report_job(dimensions, columns, start_date, end_date,
+                                                            timeout, filters)
+        rollup = ReportRollup().add_all(iter_report_rows(stream_download(download_url)))
+        shard = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "job_id": job_id,
+            "status": status,
+            **rollup.to_dict()
+        }
+        self.shard_cache.put(cache_key, shard, self.shard_cache.ttl_for(end_date, today))
+        return {**shard, "cached": False}
+
+    def _sharded_report(self, report_type: str, dimensions: List[str], columns: List[str],
+                        start_date: str, end_date: str, filters: List[Dict[str, Any]],
+                        shard_by: str, shard_concurrency: Optional[int],
+                        preview_rows: int, timeout: Optional[int], use_cache: bool,
+                        columnar_format: Optional[str], cache_key: str, today) -> Dict[str, Any]:
+        """按日期分片并行运行报告，合并为一份按维度值排序的结果"""
+        shards = split_date_range(start_date, end_date, shard_by)
+        print(f"🧩 报告日期范围切分为{len(shards)}个分片（{shard_by}）", file=sys.stderr)
+        results = run_shards(
+            shards,
+            lambda start, end: self._report_shard(dimensions, columns, start, end, filters, timeout,
+                                                  use_cache, today),
+            shard_concurrency or DEFAULT_SHARD_CONCURRENCY
+        )
+        merged = merge_shard_rows(results)
+        report, columnar = self._summarize_report(
+            lambda sink: summarize_rows(merged.rows(), preview_rows, sink), cache_key, columnar_format
+        )
+        result = {
+            "success": True,
+            "report_type": report_type,
+            "dimensions": dimensions,
+            "columns": columns,
+            "shard_by": shard_by,
+            "shards": [
+                {
+                    "start_date": shard["start_date"],
+                    "end_date": shard["end_date"],
+                    "job_id": shard["job_id"],
+                    "status": shard["status"],
+                    "row_count": len(shard["rows"]),
+                    "cached": shard["cached"]
+                }
+                for shard in results
+            ],
+            "report": report
+        }
+        if columnar:
+            result["columnar"] = columnar
+        return result
+
+    def _cached_report(self, cache_key: str, report_type: str, preview_rows: int,
+                       columnar_format: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """读取缓存的报告结果，缓存的预览行不足或缺少所需的列式文件时视为未命中"""
+        entry = self.report_cache.get(cache_key)
+        if entry is None:
+            return None
+        result = entry["value"]
+        if columnar_format:
+            columnar = result.get("columnar")
+            if not columnar or columnar["format"] != columnar_format or not os.path.exists(columnar["path"]):
+                return None
+        report = dict(result["report"])
+        if report["truncated"] and len(report["preview"]) < preview_rows:
+            return None
+        report["preview"] = report["preview"][:preview_rows]
+        report["truncated"] = report["row_count"] > len(report["preview"])
+        return {
+            **result,
+            "report_type": report_type,
+            "report": report,
+            "cached": True,
+            "cached_at": datetime.fromtimestamp(entry["created_at"]).isoformat()
+        }
+
+    def _summarize_report(self, summarize, cache_key: str, columnar_format: Optional[str]):
+        """调用 summarize(sink) 汇总报告；指定列式格式时在同一次遍历中写入列式文件"""
+        if not columnar_format:
+            return summarize(None), None
+        path = columnar_path(self.report_cache.columnar_directory, cache_key, columnar_format)
+        writer = ColumnarWriter(path, columnar_format)
+        try:
+            report = summarize(writer.write)
+            return report, writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+
+    def _start_report_job(self, report_type: str, dimensions: List[str], columns: List[str],
+                          start_date: Optional[str], end_date: Optional[str],
+                          filters: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """只创建报告作业，不等待结果"""
+        # 尝试使用新的 google-ads-admanager
+        try:
+            report_service = self.clients.get_client("ReportServiceClient")
+            job = report_service.run_report_job(
+                self._report_job(dimensions, columns, start_date, end_date, filters=filters)
+            )
+            return self.output.tool_result({
+                "success": True,
+                "report_type": report_type,
+                "job_id": job.id,
+                "status": job.status,
+                "message": "报告作业已创建，请稍后查询结果"
+            })
+        except ImportError:
+            # 如果新版本库不可用，使用旧的 googleads
+            report_service = self.clients.get_legacy_service('ReportService')
+        
+        job = report_service.runReportJob(
+            self._report_job(dimensions, columns, start_date, end_date, legacy=True, filters=filters)
+        )
+        return self.output.tool_result({
+            "success": True,
+            "report_type": report_type,
+            "job": {
+                "id": job.get('id'),
+                "status": job.get('reportJobStatus')
+            },
+            "message": "报告作业已创建，请通过报告ID查询结果"
+        })
+
+    def _report_rows(self, request: ReportRequest, timeout: Optional[int]):
+        """运行报告作业并返回 (作业信息, 流式解析的行)"""
+        job_id, status, download_url = self._run_report_job(
+            request.dimensions, request.columns, request.start_date, request.end_date, timeout,
+            request.filters
+        )
+        print("⬇️ 正在下载报告结果", file=sys.stderr)
+        return {"id": job_id, "status": status}, iter_report_rows(stream_download(download_url))
+
+    def generate_report(self, report_type: str, start_date: str = None, 
+                       end_date: str = None, wait_for_result: bool = True,
+                       preview_rows: int = DEFAULT_PREVIEW_ROWS,
+                       timeout: int = None, use_cache: bool = True,
+                       columnar_format: str = None, shard_by: str = None,
+                       shard_concurrency: int = None, dimensions: List[str] = None,
+                       columns: List[str] = None,
+                       dimension_filters: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """生成Ad Manager报告，默认等待完成并返回解析后的结果"""
+        try:
+            default_dimensions, default_columns = self._report_fields(report_type)
+            dimensions = normalize_fields(dimensions, "维度", MAX_DIMENSIONS) if dimensions else default_dimensions
+            columns = normalize_fields(columns, "列", MAX_COLUMNS) if columns else default_columns
+            filters = normalize_filters(dimension_filters)
+            if not columns:
+                raise ValueError("报告至少需要一列")
+            if columnar_format and columnar_format not in COLUMNAR_FORMATS:
+                raise ValueError(f"不支持的列式格式: {columnar_format}")
+            if shard_by and not wait_for_result:
+                raise ValueError("分片报告需要等待结果（wait_for_result=true）")
+            if shard_by:
+                check_additive(columns)
+            
+            if not wait_for_result:
+                return self._start_report_job(report_type, dimensions, columns, start_date, end_date, filters)
+            
+            # 相同查询的结果直接从缓存返回；相对日期范围和TTL按网络时区的"今天"计算
+            today = self._network_today()
+            cache_key = report_cache_key(dimensions, columns, start_date, end_date, self.network_code,
+                                         today=today, shard_by=shard_by, filters=filters)
+            if use_cache:
+                cached = self._cached_report(cache_key, report_type, preview_rows, columnar_format)
+                if cached is not None:
+                    return self.output.tool_result(cached)
+            
+            # 长日期范围按分片并行运行，已结束的分片从缓存读取
+            if shard_by:
+                result = self._sharded_report(report_type, dimensions, columns, start_date, end_date,
+                                              filters, shard_by, shard_concurrency, preview_rows, timeout,
+                                              use_cache, columnar_format, cache_key, today)
+                self.report_cache.put(cache_key, result, self.report_cache.ttl_for(end_date, today))
+                return self.output.tool_result({**result, "cached": False})
+            
+            # 同时到达的兼容请求合并为一个更宽的作业，各自在本地投影
+            request = ReportRequest(dimensions, columns, start_date, end_date, filters)
+            job, rows, merged_requests = self.report_planner.execute(
+                request, lambda planned: self._report_rows(planned, timeout)
+            )
+            report, columnar = self._summarize_report(
+                lambda sink: summarize_rows(rows, preview_rows, sink), cache_key, columnar_format
+            )
+            result = {
+                "success": True,
+                "report_type": report_type,
+                "dimensions": dimensions,
+                "columns": columns,
+                "job": job,
+                "report": report
             }
+            if merged_requests > 1:
+                result["merged_requests"] = merged_requests
+            if columnar:
+                result["columnar"] = columnar
+            self.report_cache.put(cache_key, result, self.report_cache.ttl_for(end_date, today))
+            
+            return self.output.tool_result({**result, "cached": False})
             
         except Exception as e:
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps({"success": False, "error": str(e)}, ensure_ascii=False, indent=2)
-                    }
-                ]
-            }
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def manage_report_rollups(self, action: str, name: str = None, dimensions: List[str] = None,
+                              columns: List[str] = None,
+                              dimension_filters: List[Dict[str, Any]] = None,
+                              trailing_days: int = DEFAULT_TRAILING_DAYS, start_date: str = None,
+                              end_date: str = None, granularity: str = GRANULARITY_TOTAL,
+                              refresh: bool = True, limit: int = DEFAULT_ROLLUP_QUERY_LIMIT,
+                              offset: int = 0) -> Dict[str, Any]:
+        """定义、刷新和查询按天物化的报告"""
+        try:
+            if action in ("define", "refresh", "query", "delete") and not name:
+                raise ValueError(f"{action}操作必须提供name")
+            
+            if action == "define":
+                view = self.report_rollups.define(
+                    name,
+                    normalize_fields(dimensions or [], "维度", MAX_DIMENSIONS),
+                    normalize_fields(columns or [], "列", MAX_COLUMNS),
+                    normalize_filters(dimension_filters),
+                    trailing_days
+                )
+                self.report_rollups.start_background()
+                result = {"success": True, "action": "define", "view": view}
+            elif action == "list":
+                result = {"success": True, "action": "list", "views": self.report_rollups.store.views()}
+            elif action == "status":
+                result = {"success": True, "action": "status", "rollups": self.report_rollups.stats()}
+            elif action == "refresh":
+                result = {
+                    "success": True,
+                    "action": "refresh",
+                    **self.report_rollups.refresh(name, start_date, end_date)
+                }
+            elif action == "query":
+                result = {
+                    "success": True,
+                    "action": "query",
+                    **self.report_rollups.query(name, start_date, end_date, granularity,
+                                                refresh, limit, offset)
+                }
+            elif action == "delete":
+                result = {"success": True, "action": "delete", "deleted": self.report_rollups.store.delete(name)}
+            else:
+                result = {"success": False, "error": f"不支持的操作: {action}"}
+            
+            return self.output.tool_result(result)
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
+
+    def query_report_file(self, path: str, columns: List[str] = None, offset: int = 0,
+                          limit: int = DEFAULT_QUERY_LIMIT) -> Dict[str, Any]:
+        """分页读取列式报告文件"""
+        try:
+            if not path:
+                raise ValueError("必须提供path")
+            if not os.path.exists(os.path.expanduser(path)):
+                raise ValueError(f"文件不存在: {path}")
+            return self.output.tool_result({
+                "success": True,
+                **query_columnar(path, columns, offset, limit)
+            })
+        except Exception as e:
+            return self.output.tool_result({"success": False, "error": str(e)})
 
 def main():
     """主函数 - MCP协议服务器"""
     server = MCPAdManagerEnhancedUltimateServer()
     
     try:
-        while True:
-            line = sys.stdin.readline()
-            if not line:
-                break
-            
-            try:
-                request = json.loads(line.strip())
-                method = request.get("method")
-                params = request.get("params", {})
-                request_id = request.get("id")
-                
-                if method == "initialize":
-                    result = server.handle_initialize(params)
-                elif method == "tools/list":
-                    result = server.handle_tools_list()
-                elif method == "tools/call":
-                    result = server.handle_tools_call(
-                        params.get("name"),
-                        params.get("arguments", {})
-                    )
-                else:
-                    result = {"error": f"Unknown method: {method}"}
-                
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": result
-                }
-                
-                print(json.dumps(response))
-                sys.stdout.flush()
-                
-            except json.JSONDecodeError:
-                continue
-            except Exception as e:
-                error_response = {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id") if "request" in locals() else None,
-                    "error": {"code": -32603, "message": str(e)}
-                }
-                print(json.dumps(error_response))
-                sys.stdout.flush()
-                
+        serve(server)
     except KeyboardInterrupt:
         pass
 
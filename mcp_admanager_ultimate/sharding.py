@@ -0,0 +1,167 @@
+"""
+报告日期分片 - 把较长的日期范围按天、周或月切分为多个报告作业
+
+分片按日历对齐（周从周一开始，月为自然月），首尾分片截断到请求的范围。
+各分片并行运行，每个分片的结果按维度值汇总指标列后缓存；已结束的分片
+缓存时间很长，再次查询时只有包含今天的最新分片需要重新运行。合并时按
+维度值排序，结果与分片完成的先后无关。比率、平均值、去重人数等列不能跨分片
+求和，包含这些列的报告不能分片。
+"""
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+SHARD_DAY = "day"
+SHARD_WEEK = "week"
+SHARD_MONTH = "month"
+SHARD_GRANULARITIES = (SHARD_DAY, SHARD_WEEK, SHARD_MONTH)
+
+DEFAULT_SHARD_CONCURRENCY = int(os.getenv("GOOGLE_ADMANAGER_REPORT_SHARD_CONCURRENCY", "3"))
+MAX_SHARD_CONCURRENCY = 8
+MAX_SHARDS = 400
+# 名称包含这些词的列不能跨维度或分片求和
+NON_ADDITIVE_HINTS = ("CTR", "RATE", "ECPM", "ECPC", "AVERAGE", "PERCENT", "RATIO", "SHARE",
+                      "UNIQUE", "REACH", "FREQUENCY")
+# 分片结果缓存的总大小上限（字节），分片保存的是汇总后的完整行
+DEFAULT_SHARD_CACHE_MAX_BYTES = int(os.getenv("GOOGLE_ADMANAGER_REPORT_SHARD_CACHE_MAX_BYTES",
+                                              str(256 * 1024 * 1024)))
+
+SHARD_SCHEMA_PROPERTIES = {
+    "shard_by": {
+        "type": "string",
+        "enum": list(SHARD_GRANULARITIES),
+        "description": "把日期范围按day/week/month切分为多个并行运行的报告作业后合并（可选，需要start_date和end_date）。已结束的分片会被缓存，再次查询时只重新运行最新的分片。指标列按维度值求和，因此不支持CTR、eCPM、比率等不可相加的列"
+    },
+    "shard_concurrency": {
+        "type": "integer",
+        "description": f"同时运行的分片作业数量（默认{DEFAULT_SHARD_CONCURRENCY}，最大{MAX_SHARD_CONCURRENCY}）",
+        "minimum": 1,
+        "maximum": MAX_SHARD_CONCURRENCY
+    }
+}
+
+
+def _parse_date(value: str, name: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}格式应为YYYY-MM-DD: {value}")
+
+
+def _shard_end(start: date, granularity: str) -> date:
+    if granularity == SHARD_DAY:
+        return start
+    if granularity == SHARD_WEEK:
+        return start + timedelta(days=6 - start.weekday())
+    next_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return next_month - timedelta(days=1)
+
+
+def is_additive(column: str) -> bool:
+    return not any(hint in column for hint in NON_ADDITIVE_HINTS)
+
+
+def check_additive(columns: Iterable[str]):
+    """分片结果按维度值求和，不可相加的列会得到错误的值"""
+    non_additive = [c for c in columns if not is_additive(c)]
+    if non_additive:
+        raise ValueError(f"分片报告只支持可相加的列，不支持: {', '.join(non_additive)}")
+
+
+def split_date_range(start_date: str, end_date: str, granularity: str) -> List[Tuple[str, str]]:
+    """按日历切分日期范围，返回按时间排序的 (开始, 结束) 列表"""
+    if granularity not in SHARD_GRANULARITIES:
+        raise ValueError(f"不支持的分片粒度: {granularity}")
+    if not start_date or not end_date:
+        raise ValueError("按日期分片需要同时提供start_date和end_date")
+    start = _parse_date(start_date, "start_date")
+    end = _parse_date(end_date, "end_date")
+    if end < start:
+        raise ValueError("end_date不能早于start_date")
+    shards = []
+    current = start
+    while current <= end:
+        shard_end = min(_shard_end(current, granularity), end)
+        shards.append((current.isoformat(), shard_end.isoformat()))
+        if len(shards) > MAX_SHARDS:
+            raise ValueError(f"分片数量超过上限{MAX_SHARDS}，请使用更大的分片粒度")
+        current = shard_end + timedelta(days=1)
+    return shards
+
+
+def run_shards(shards: Sequence[Tuple[str, str]], run_shard: Callable[[str, str], Dict[str, Any]],
+               max_workers: int = DEFAULT_SHARD_CONCURRENCY) -> List[Dict[str, Any]]:
+    """并行运行分片，结果按分片顺序返回；任一分片失败时抛出其异常"""
+    max_workers = max(1, min(max_workers, MAX_SHARD_CONCURRENCY, len(shards)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-shard") as executor:
+        # 复制调用方的上下文，使分片请求沿用相同的调度优先级
+        futures = [executor.submit(contextvars.copy_context().run, run_shard, start, end)
+                   for start, end in shards]
+        return [future.result() for future in futures]
+
+
+def _sort_key(values: Tuple[Any, ...]) -> Tuple[Tuple[int, Any], ...]:
+    # 数字、字符串、空值分组比较，避免不同类型之间无法排序
+    return tuple((0, v) if isinstance(v, (int, float)) else (2, "") if v is None else (1, str(v))
+                 for v in values)
+
+
+class ReportRollup:
+    """按维度值汇总报告行的指标列（Column.*，没有该前缀时为所有数值列）"""
+
+    def __init__(self):
+        self.columns: List[str] = []
+        self._dimensions: List[str] = []
+        self._metrics: List[str] = []
+        self._rows: Dict[Tuple[Any, ...], List[Any]] = {}
+
+    def add(self, row: Dict[str, Any]):
+        if not self.columns:
+            self._set_columns(list(row), row)
+        key = tuple(row.get(name) for name in self._dimensions)
+        values = [row.get(name) for name in self._metrics]
+        current = self._rows.get(key)
+        if current is None:
+            self._rows[key] = values
+            return
+        for i, value in enumerate(values):
+            if isinstance(value, (int, float)):
+                current[i] = value if current[i] is None else current[i] + value
+
+    def add_all(self, rows: Iterable[Dict[str, Any]]) -> "ReportRollup":
+        for row in rows:
+            self.add(row)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """按维度值排序产出汇总后的行"""
+        for key in sorted(self._rows, key=_sort_key):
+            row = dict(zip(self._dimensions, key))
+            row.update(zip(self._metrics, self._rows[key]))
+            yield {name: row.get(name) for name in self.columns}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """紧凑的可缓存形式：列名加值列表"""
+        return {"columns": self.columns, "rows": [list(row.values()) for row in self.rows()]}
+
+    def _set_columns(self, columns: List[str], row: Dict[str, Any]):
+        self.columns = columns
+        self._metrics = [c for c in columns if c.startswith("Column.")] or [
+            c for c in columns if isinstance(row.get(c), (int, float))
+        ]
+        self._dimensions = [c for c in columns if c not in self._metrics]
+
+
+def merge_shard_rows(shards: Iterable[Dict[str, Any]]) -> ReportRollup:
+    """合并各分片缓存形式的结果"""
+    merged = ReportRollup()
+    for shard in shards:
+        columns = shard.get("columns") or []
+        merged.add_all(dict(zip(columns, values)) for values in shard.get("rows") or [])
+    return merged
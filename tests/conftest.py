@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# 缓存目录等路径在导入时确定，测试数据不能写到用户目录
+os.environ.setdefault("GOOGLE_ADMANAGER_CACHE_DIR", tempfile.mkdtemp(prefix="admanager-tests-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+
+@pytest.fixture
+def make_server(tmp_path, monkeypatch):
+    """用进程内的假后端创建服务器：make_server("legacy" | "sdk", dataset_size, latency)"""
+    from fake_backend import SDK_MODULE, FakeAdManager
+    from suite import build_server
+
+    from mcp_admanager_ultimate.jobs import JobManager, JobStore
+    from mcp_admanager_ultimate.report_cache import ReportCache
+
+    def make(backend_name="legacy", dataset_size=50, latency=0.0):
+        monkeypatch.setitem(sys.modules, SDK_MODULE, None)
+        backend = FakeAdManager(dataset_size, latency, jitter=0)
+        server = build_server(backend, backend_name)
+        server.backend = backend
+        server.report_cache = ReportCache(str(tmp_path / "reports"))
+        server.shard_cache = ReportCache(str(tmp_path / "reports" / "shards"))
+        server.jobs = JobManager(JobStore(str(tmp_path / "jobs.sqlite3")), server._run_job, workers=2)
+        return server
+
+    return make
@@ -0,0 +1,171 @@
+import contextvars
+import json
+
+import pytest
+
+from mcp_admanager_ultimate.batch import (
+    MAX_IDS_PER_CALL,
+    MAX_IDS_PER_FILTER,
+    MAX_IDS_PER_STATEMENT,
+    bulk_create,
+    fetch_in_chunks,
+    match_ids,
+    normalize_ids,
+    validate_create_specs,
+)
+
+
+class ReadTimeout(Exception):
+    pass
+
+
+def _entities(count):
+    return [{"name": f"unit_{i}"} for i in range(count)]
+
+
+def test_all_created_in_one_batch():
+    calls = []
+
+    def create(batch):
+        calls.append(len(batch))
+        return [dict(entity, id=100 + i) for i, entity in enumerate(batch)]
+
+    results = bulk_create(create, _entities(3))
+    assert calls == [3]
+    assert [(r["index"], r["success"], r["id"]) for r in results] == [(0, True, 100), (1, True, 101), (2, True, 102)]
+
+
+def test_missing_created_results_are_reported():
+    def create(batch):
+        return [dict(batch[0], id=1)]
+
+    results = bulk_create(create, _entities(3))
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["success"]
+    assert results[1:] == [
+        {"index": 1, "success": False, "error": "API未返回创建结果"},
+        {"index": 2, "success": False, "error": "API未返回创建结果"},
+    ]
+
+
+def test_validation_error_falls_back_to_single_items():
+    calls = []
+
+    def create(batch):
+        calls.append([e["name"] for e in batch])
+        if any(e["name"] == "unit_1" for e in batch):
+            raise Exception("[UniqueError.NOT_UNIQUE @ name]")
+        return [dict(e, id=i) for i, e in enumerate(batch)]
+
+    results = bulk_create(create, _entities(3))
+    assert calls[0] == ["unit_0", "unit_1", "unit_2"]
+    assert len(calls) == 4
+    assert [r["success"] for r in results] == [True, False, True]
+    assert "NOT_UNIQUE" in results[1]["error"]
+
+
+@pytest.mark.parametrize("error", [
+    ReadTimeout("read timed out"),
+    Exception("[ServerError.SERVER_ERROR @ ]"),
+])
+def test_transient_error_does_not_resubmit(error):
+    calls = []
+
+    def create(batch):
+        calls.append(len(batch))
+        raise error
+
+    results = bulk_create(create, _entities(3))
+    assert calls == [3]
+    assert [r["success"] for r in results] == [False, False, False]
+    assert [r["index"] for r in results] == [0, 1, 2]
+
+
+def test_wrapped_transient_error_does_not_resubmit():
+    calls = []
+
+    def create(batch):
+        calls.append(len(batch))
+        try:
+            raise ReadTimeout("read timed out")
+        except ReadTimeout as e:
+            raise ValueError("调用在重试后仍失败") from e
+
+    bulk_create(create, _entities(2))
+    assert calls == [2]
+
+
+def test_batches_keep_input_order():
+    def create(batch):
+        return [dict(e, id=int(e["name"].split("_")[1])) for e in batch]
+
+    results = bulk_create(create, _entities(7), batch_size=3, max_workers=3)
+    assert [r["id"] for r in results] == list(range(7))
+
+
+def test_validate_create_specs_reports_problems():
+    entities, errors = validate_create_specs("ad_unit", [
+        {"name": "a", "parentId": "12"},
+        {"name": "a", "parentId": "12"},
+        {"parentId": "x"},
+    ])
+    assert entities == [{"name": "a", "parentId": 12, "targetWindow": "BLANK", "sizes": []}]
+    assert [e["index"] for e in errors] == [1, 2]
+
+
+def test_line_item_names_are_unique_per_order():
+    spec = {"lineItemType": "STANDARD", "costType": "CPM", "startDateTime": "2024-01-01T00:00:00",
+            "endDateTime": "2024-01-31T23:59:59"}
+    entities, errors = validate_create_specs("line_item", [
+        {**spec, "name": "banner", "orderId": "1"},
+        {**spec, "name": "banner", "orderId": "2"},
+        {**spec, "name": "banner", "orderId": 1},
+    ])
+    assert [e["orderId"] for e in entities] == [1, 2]
+    assert errors == [{"index": 2, "error": "name 与第 0 项重复"}]
+
+    _, errors = validate_create_specs("order", [
+        {"name": "spring", "advertiserId": "1", "traffickerId": "9"},
+        {"name": "spring", "advertiserId": "2", "traffickerId": "9"},
+    ])
+    assert [e["index"] for e in errors] == [1]
+
+
+def test_normalize_ids():
+    assert normalize_ids(["12", 7, " 012 ", "7"]) == ["12", "7"]
+    assert normalize_ids("5") == ["5"]
+    for ids in (None, [], ["1", "x"], [str(i) for i in range(MAX_IDS_PER_CALL + 1)]):
+        with pytest.raises(ValueError):
+            normalize_ids(ids)
+
+
+def test_fetch_in_chunks_keeps_context_and_matches_order():
+    priority = contextvars.ContextVar("priority", default=None)
+    chunks = []
+
+    def fetch_chunk(chunk):
+        chunks.append((list(chunk), priority.get()))
+        return [{"id": int(i)} for i in chunk if i != "3"]
+
+    priority.set("bulk")
+    ids = [str(i) for i in range(7, 0, -1)]
+    records = fetch_in_chunks(ids, 3, fetch_chunk, max_workers=2)
+    assert sorted(len(chunk) for chunk, _ in chunks) == [1, 3, 3]
+    assert {p for _, p in chunks} == {"bulk"}
+    found, missing = match_ids(ids, records)
+    assert [r["id"] for r in found] == [7, 6, 5, 4, 2, 1]
+    assert missing == ["3"]
+
+
+@pytest.mark.parametrize("backend, chunk_size", [("sdk", MAX_IDS_PER_FILTER), ("legacy", MAX_IDS_PER_STATEMENT)])
+def test_get_many_fetches_in_chunks(make_server, backend, chunk_size):
+    server = make_server(backend, dataset_size=chunk_size + 50)
+    ids = [str(r["id"]) for r in server.backend.entities["line_items"]][::-1] + ["999"]
+    calls = server.backend.calls
+    result = json.loads(server.handle_tools_call(
+        "manage_line_items", {"action": "get_many", "ids": ids}
+    )["content"][0]["text"])
+    assert result["success"] is True
+    assert [str(r["id"]) for r in result["line_items"]] == ids[:-1]
+    assert result["missing_ids"] == ["999"]
+    assert server.backend.calls - calls == 2
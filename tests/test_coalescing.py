@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from mcp_admanager_ultimate.coalescing import SingleFlight, coalesce_key
+
+
+def test_coalesce_key():
+    assert coalesce_key("manage_orders", {"action": "list", "page_size": 5}) == \
+        coalesce_key("manage_orders", {"page_size": 5, "action": "list", "page_token": None})
+    assert coalesce_key("manage_orders", {"action": "list"}) != coalesce_key("manage_line_items", {"action": "list"})
+    for action in ("create", "bulk_create", "sync", "refresh", "invalidate"):
+        assert coalesce_key("manage_orders", {"action": action}) is None
+    assert coalesce_key("export_entities", {"kind": "order"}) is None
+    assert coalesce_key("manage_orders", {"action": "list", "x": object()}) is None
+
+
+def _run_concurrently(flight, key, fn, followers):
+    """领头调用进入 fn 后再启动跟随的调用，返回每个调用的结果或异常"""
+    started = threading.Event()
+    release = threading.Event()
+    outcomes = []
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    def call(target):
+        try:
+            outcomes.append(flight.do(key, target))
+        except Exception as e:
+            outcomes.append(e)
+
+    leader = threading.Thread(target=call, args=(leader_fn,))
+    leader.start()
+    assert started.wait(5)
+    threads = [threading.Thread(target=call, args=(fn,)) for _ in range(followers)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] < followers:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in [leader] + threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_followers_share_the_result():
+    flight = SingleFlight(enabled=True)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    outcomes = _run_concurrently(flight, "k", fn, followers=3)
+    assert calls == [1]
+    assert outcomes == [{"n": 1}] * 4
+    assert all(o is outcomes[0] for o in outcomes)
+    assert flight.stats() == {"enabled": True, "in_flight": 0, "executed": 1, "coalesced": 3}
+    # 完成后到达的调用重新执行
+    assert flight.do("k", fn) == {"n": 2}
+
+
+def test_followers_share_the_error():
+    flight = SingleFlight(enabled=True)
+
+    def fn():
+        raise ValueError("boom")
+
+    outcomes = _run_concurrently(flight, "k", fn, followers=2)
+    assert len(outcomes) == 3
+    assert all(isinstance(o, ValueError) and str(o) == "boom" for o in outcomes)
+
+
+def test_mutating_and_disabled_calls_always_execute():
+    calls = []
+    enabled = SingleFlight(enabled=True)
+    disabled = SingleFlight(enabled=False)
+    enabled.do(None, lambda: calls.append("mutating"))
+    disabled.do("k", lambda: calls.append("disabled"))
+    assert calls == ["mutating", "disabled"]
+    assert enabled.stats()["executed"] == disabled.stats()["executed"] == 0
+
+
+@pytest.mark.parametrize("action", ["list", "bulk_create"])
+def test_server_coalesces_only_read_only_calls(make_server, action):
+    server = make_server()
+    server.scheduler.network_rate = server.scheduler.service_rate = 1000
+    server.backend.latency = 0.05
+    arguments = {"action": action, "max_items": 3}
+    if action == "bulk_create":
+        arguments = {"action": action, "items": [{"name": "unit"}]}
+    threads = [threading.Thread(target=server.handle_tools_call, args=("manage_inventory", arguments))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    stats = server.single_flight.stats()
+    if action == "list":
+        assert stats["executed"] + stats["coalesced"] == 3
+        assert stats["coalesced"] >= 1
+    else:
+        assert stats["executed"] == stats["coalesced"] == 0
+        assert sum(1 for u in server.backend.entities["ad_units"] if u["name"] == "unit") == 3
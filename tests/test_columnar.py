@@ -0,0 +1,98 @@
+import os
+from datetime import date
+
+import pytest
+
+from mcp_admanager_ultimate.columnar import (
+    TYPE_DECIMAL,
+    TYPE_INT,
+    TYPE_STRING,
+    column_type,
+)
+from mcp_admanager_ultimate.report_cache import ReportCache
+
+
+@pytest.mark.parametrize("name, sample, expected", [
+    ("Dimension.AD_UNIT_ID", [], TYPE_INT),
+    ("Dimension.AD_UNIT_NAME", [1, 2], TYPE_STRING),
+    ("Column.AD_SERVER_IMPRESSIONS", [None, None], TYPE_INT),
+    ("Column.AD_SERVER_IMPRESSIONS", [1.5], TYPE_INT),
+    ("Column.AD_SERVER_CPM_AND_CPC_REVENUE", [100, 200], TYPE_DECIMAL),
+    ("Column.AD_SERVER_CTR", [0], TYPE_DECIMAL),
+    ("clicks", [1, 2], TYPE_INT),
+    ("revenue", [1, 2.5], TYPE_DECIMAL),
+    ("note", [None, None], TYPE_STRING),
+    ("note", [1, "x"], TYPE_STRING),
+])
+def test_column_type(name, sample, expected):
+    assert column_type(name, sample) == expected
+
+
+def test_later_batches_do_not_fail_the_write(tmp_path):
+    pytest.importorskip("pyarrow")
+    from mcp_admanager_ultimate.columnar import ColumnarWriter, query_columnar
+
+    writer = ColumnarWriter(str(tmp_path / "report.parquet"), "parquet", batch_rows=2)
+    rows = [
+        {"Dimension.AD_UNIT_ID": 1, "Column.AD_SERVER_CPM_AND_CPC_REVENUE": 10, "note": None},
+        {"Dimension.AD_UNIT_ID": 2, "Column.AD_SERVER_CPM_AND_CPC_REVENUE": 20, "note": None},
+        {"Dimension.AD_UNIT_ID": "-", "Column.AD_SERVER_CPM_AND_CPC_REVENUE": 1.25, "note": "late"},
+    ]
+    for row in rows:
+        writer.write(row)
+    info = writer.close()
+    assert info["rows"] == 3
+    assert info["invalid_values"] == {"Dimension.AD_UNIT_ID": 1}
+    result = query_columnar(info["path"], offset=2)
+    assert result["rows"] == [{
+        "Dimension.AD_UNIT_ID": None,
+        "Column.AD_SERVER_CPM_AND_CPC_REVENUE": "1.250000000",
+        "note": "late",
+    }]
+
+
+def test_cache_eviction_counts_columnar_files(tmp_path):
+    cache = ReportCache(str(tmp_path / "reports"), max_bytes=4096)
+    cache.put("old", {"n": 1}, ttl=60)
+    os.makedirs(cache.columnar_directory)
+    with open(os.path.join(cache.columnar_directory, "old.parquet"), "wb") as f:
+        f.write(b"\0" * 3000)
+    os.utime(cache._path("old"), (1, 1))
+    assert cache.stats()["bytes"] > 3000
+
+    cache.put("new", {"n": 2}, ttl=60)
+    with open(os.path.join(cache.columnar_directory, "new.parquet"), "wb") as f:
+        f.write(b"\0" * 3000)
+    cache.put("newer", {"n": 3}, ttl=60)
+
+    assert cache.get("old") is None
+    assert not os.path.exists(os.path.join(cache.columnar_directory, "old.parquet"))
+    assert cache.stats()["bytes"] <= 4096
+
+
+def test_orphan_columnar_files_are_evicted(tmp_path):
+    cache = ReportCache(str(tmp_path / "reports"), max_bytes=1024)
+    os.makedirs(cache.columnar_directory)
+    orphan = os.path.join(cache.columnar_directory, "orphan.arrow")
+    with open(orphan, "wb") as f:
+        f.write(b"\0" * 2000)
+    os.utime(orphan, (1, 1))
+    cache.put("key", {"n": 1}, ttl=60)
+    assert not os.path.exists(orphan)
+    assert cache.get("key") is not None
+
+
+def test_recent_ranges_are_not_cached_as_historical():
+    cache = ReportCache(historical_ttl=100, recent_ttl=1)
+    today = date(2024, 3, 10)
+    assert cache.ttl_for("2024-03-09", today) == 1
+    assert cache.ttl_for("2024-03-07", today) == 1
+    assert cache.ttl_for("2024-03-06", today) == 100
+    assert cache.ttl_for(None, today) == 1
+
+
+def test_put_removes_temporary_file_on_serialization_error(tmp_path):
+    cache = ReportCache(str(tmp_path / "reports"))
+    cache.put("key", {"value": object()}, ttl=60)
+    assert cache.get("key") is None
+    assert os.listdir(cache.directory) == []
@@ -0,0 +1,73 @@
+import sys
+import threading
+import types
+from datetime import datetime, timedelta, timezone
+
+from mcp_admanager_ultimate.credentials import CredentialManager
+
+
+def _utcnow():
+    # google-auth 的 expiry 为不带时区的UTC时间
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class Credentials:
+    def __init__(self, on_refresh):
+        self.on_refresh = on_refresh
+        self.token = "old"
+        self.expiry = _utcnow() + timedelta(minutes=30)
+
+    @property
+    def valid(self):
+        return self.token is not None
+
+    def refresh(self, request):
+        self.on_refresh()
+        self.token = "new"
+        self.expiry = _utcnow() + timedelta(hours=1)
+
+
+def _transport(monkeypatch):
+    requests = types.ModuleType("google.auth.transport.requests")
+    requests.Request = object
+    for name in ("google", "google.auth", "google.auth.transport"):
+        monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+    monkeypatch.setitem(sys.modules, "google.auth.transport.requests", requests)
+
+
+def test_background_refresh_does_not_block_callers(monkeypatch):
+    _transport(monkeypatch)
+    manager = CredentialManager()
+    in_refresh = threading.Event()
+    release = threading.Event()
+
+    def on_refresh():
+        in_refresh.set()
+        release.wait(5)
+
+    # 客户端和共享会话创建时拿到的对象
+    held = Credentials(on_refresh)
+    manager._credentials = held
+    worker = threading.Thread(target=manager._background_refresh)
+    worker.start()
+    assert in_refresh.wait(5)
+    # 刷新进行中，调用方仍然立即拿到旧令牌
+    credentials, _ = manager.get_credentials()
+    assert credentials is held and credentials.token == "old"
+    release.set()
+    worker.join(5)
+
+    credentials, _ = manager.get_credentials()
+    assert credentials is held
+    assert held.token == "new"
+    assert manager.stats()["refresh_count"] == 1
+    manager.close()
+
+
+def test_background_refresh_is_dropped_after_invalidate(monkeypatch):
+    _transport(monkeypatch)
+    manager = CredentialManager()
+    manager._credentials = Credentials(manager.invalidate)
+    manager._background_refresh()
+    assert manager.stats()["loaded"] is False
+    assert manager.stats()["refresh_count"] == 0
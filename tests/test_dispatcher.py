@@ -0,0 +1,70 @@
+import io
+import json
+import time
+
+from mcp_admanager_ultimate.dispatcher import RequestDispatcher
+
+
+def _call(dispatcher, request_id, name, arguments):
+    dispatcher.handle_line(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+                                       "params": {"name": name, "arguments": arguments}}))
+
+
+def _cancel(dispatcher, request_id):
+    dispatcher.handle_line(json.dumps({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                                       "params": {"requestId": request_id}}))
+
+
+def _wait_for_calls(backend, count):
+    deadline = time.time() + 5
+    while backend.calls < count and time.time() < deadline:
+        time.sleep(0.005)
+
+
+def _responses(stdout):
+    return {m["id"]: json.loads(m["result"]["content"][0]["text"])
+            for m in map(json.loads, stdout.getvalue().splitlines())}
+
+
+def _drain(dispatcher):
+    dispatcher._executor.shutdown(wait=True)
+
+
+LIST_ALL = {"action": "list", "page_size": 1, "max_items": 200}
+
+
+def test_cancel_stops_running_call(make_server):
+    server = make_server(dataset_size=1000, latency=0.01)
+    stdout = io.StringIO()
+    dispatcher = RequestDispatcher(server, max_concurrency=2, stdout=stdout)
+    _call(dispatcher, 1, "manage_orders", LIST_ALL)
+    _wait_for_calls(server.backend, 3)
+    _cancel(dispatcher, 1)
+    _drain(dispatcher)
+
+    # 每页一次调用，取消后不再翻页
+    assert server.backend.calls < 20
+    assert stdout.getvalue() == ""
+    assert dispatcher.stats()["in_flight"] == 0
+
+
+def test_coalesced_caller_reruns_when_leader_is_cancelled(make_server):
+    server = make_server(dataset_size=100, latency=0.01)
+    server.scheduler.network_rate = server.scheduler.service_rate = 1000
+    stdout = io.StringIO()
+    dispatcher = RequestDispatcher(server, max_concurrency=2, stdout=stdout)
+    arguments = {"action": "list", "page_size": 1, "max_items": 20}
+    _call(dispatcher, 1, "manage_orders", arguments)
+    _wait_for_calls(server.backend, 2)
+    _call(dispatcher, 2, "manage_orders", arguments)
+    deadline = time.time() + 5
+    while not server.single_flight.stats()["coalesced"] and time.time() < deadline:
+        time.sleep(0.001)
+    _cancel(dispatcher, 1)
+    _drain(dispatcher)
+
+    responses = _responses(stdout)
+    assert list(responses) == [2]
+    assert responses[2]["success"] is True
+    assert len(responses[2]["orders"]) == 20
+    assert server.single_flight.stats()["executed"] == 2
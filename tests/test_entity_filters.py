@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from mcp_admanager_ultimate.entity_filters import (
+    OP_CONTAINS,
+    OP_EQUALS,
+    OP_GTE,
+    OP_IN,
+    OP_LTE,
+    apply_legacy_filter,
+    index_where,
+    normalize_filter,
+    normalize_order_by,
+    sdk_filter,
+    sdk_list_params,
+)
+from mcp_admanager_ultimate.entity_index import EntityIndex, plain_value
+
+
+class StatementBuilder:
+    def __init__(self):
+        self.where = None
+        self.order = None
+        self.values = {}
+
+    def Where(self, clause):
+        self.where = clause
+        return self
+
+    def WithBindVariable(self, key, value):
+        self.values[key] = value
+        return self
+
+    def OrderBy(self, field, ascending=True):
+        self.order = (field, ascending)
+        return self
+
+
+def test_normalize_filter():
+    conditions = normalize_filter("order", {
+        "status": ["paused", "DRAFT", "PAUSED"],
+        "advertiser_id": 42,
+        "name_contains": "Spring",
+        "start_after": "2024-03-01",
+        "end_before": "2024-03-31",
+        "modified_since": "2024-01-02T03:04:05Z",
+        "end_after": None,
+    })
+    assert conditions == [
+        ("status", OP_IN, ["PAUSED", "DRAFT"]),
+        ("advertiserId", OP_EQUALS, "42"),
+        ("name", OP_CONTAINS, "Spring"),
+        ("startDateTime", OP_GTE, "2024-03-01T00:00:00"),
+        ("endDateTime", OP_LTE, "2024-03-31T23:59:59"),
+        ("lastModifiedDateTime", OP_GTE, "2024-01-02T03:04:05"),
+    ]
+    assert normalize_filter("creative", None) == []
+
+
+@pytest.mark.parametrize("kind, expression", [
+    ("creative", {"status": "ACTIVE"}),
+    ("line_item", {"advertiser_id": "1"}),
+    ("order", {"advertiser_id": "abc"}),
+    ("order", {"status": "bad status"}),
+    ("order", {"start_after": "March"}),
+    ("order", "status=ACTIVE"),
+])
+def test_normalize_filter_rejects_invalid(kind, expression):
+    with pytest.raises(ValueError):
+        normalize_filter(kind, expression)
+
+
+def test_normalize_order_by():
+    assert normalize_order_by("order", "startDateTime desc") == ("startDateTime", False)
+    assert normalize_order_by("order", "name") == ("name", True)
+    assert normalize_order_by("order", None) is None
+    for value in ("size", "name sideways", "name asc extra"):
+        with pytest.raises(ValueError):
+            normalize_order_by("creative", value)
+
+
+def test_legacy_filter_uses_bind_variables():
+    conditions = normalize_filter("line_item", {"status": ["READY", "PAUSED"], "name_contains": "x'; --"})
+    statement = apply_legacy_filter(StatementBuilder(), [("orderId", OP_EQUALS, "7")] + conditions,
+                                    ("name", True), lambda field: field[0].upper() + field[1:])
+    assert statement.where == "OrderId = :f0 AND Status IN (:f1_0, :f1_1) AND Name LIKE :f2"
+    assert statement.values == {"f0": "7", "f1_0": "READY", "f1_1": "PAUSED", "f2": "%x'; --%"}
+    assert statement.order == ("Name", True)
+
+
+def test_sdk_filter():
+    conditions = normalize_filter("order", {
+        "status": ["APPROVED", "PAUSED"],
+        "advertiser_id": "42",
+        "name_contains": 'say "hi"',
+        "start_after": "2024-03-01",
+        "modified_since": "2024-01-02",
+    })
+    assert sdk_filter(conditions) == (
+        '(status = "APPROVED" OR status = "PAUSED") AND advertiser_id = 42'
+        ' AND name = "*say \\"hi\\"*" AND start_date_time >= "2024-03-01T00:00:00Z"'
+        ' AND update_time >= "2024-01-02T00:00:00Z"'
+    )
+    assert sdk_filter([]) is None
+    assert sdk_list_params([], ("lastModifiedDateTime", False)) == {"order_by": "update_time desc"}
+
+
+def _index(records):
+    index = EntityIndex(":memory:")
+    index.upsert("order", records)
+    return index
+
+
+def test_index_where_filters_and_sorts():
+    index = _index([
+        {"id": 1, "name": "spring_sale", "advertiserId": 5, "status": "APPROVED",
+         "startDateTime": "2024-03-05T00:00:00"},
+        {"id": 2, "name": "Summer_100%", "advertiserId": 6, "status": "PAUSED",
+         "startDateTime": "2024-06-01T00:00:00"},
+        {"id": 3, "name": "spring_promo", "advertiserId": 5, "status": "PAUSED",
+         "startDateTime": "2024-03-31T12:00:00"},
+    ])
+
+    def ids(expression, order=None):
+        where = index_where(normalize_filter("order", expression))
+        return [r["id"] for r in index.list("order", where=where, order=order)]
+
+    assert ids({"advertiser_id": "5"}) == [1, 3]
+    assert ids({"status": ["PAUSED"], "start_before": "2024-03-31"}) == [3]
+    assert ids({"name_contains": "100%"}) == [2]
+    assert ids({"name_contains": "_"}, ("startDateTime", False)) == [2, 3, 1]
+    with pytest.raises(ValueError):
+        index_where(normalize_filter("order", {"modified_since": "2024-01-01"}))
+
+
+def test_legacy_datetimes_are_indexed_as_iso_text():
+    legacy = SimpleNamespace(date=SimpleNamespace(year=2024, month=3, day=31), hour=23, minute=5,
+                             second=0, timeZoneId="America/New_York")
+    assert plain_value(legacy) == "2024-03-31T23:05:00"
+    assert plain_value({"date": {"year": 2024, "month": 1, "day": 2}, "hour": 0, "minute": 0,
+                        "second": 0}) == "2024-01-02T00:00:00"
+    assert plain_value(datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)) == "2024-01-02T03:04:05"
+    assert plain_value({"currencyCode": "USD", "microAmount": 1}) == {"currencyCode": "USD", "microAmount": 1}
+
+    index = _index([{"id": 1, "name": "a", "startDateTime": plain_value(legacy)}])
+    where = index_where(normalize_filter("order", {"start_after": "2024-03-31", "start_before": "2024-03-31"}))
+    assert [r["id"] for r in index.list("order", where=where)] == [1]
+
+
+def test_sync_state_is_timezone_aware_utc():
+    index = EntityIndex(":memory:")
+    index.mark_synced("order", datetime(2024, 1, 2, 3, 4, 5))
+    assert index.sync_state("order")[0] == datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    index.mark_synced("order", datetime(2024, 1, 2, 8, 4, 5, tzinfo=timezone(timedelta(hours=5))))
+    synced_at = index.sync_state("order")[0]
+    assert synced_at == datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert synced_at.utcoffset() == timedelta(0)
@@ -0,0 +1,87 @@
+import csv
+import gzip
+import io
+import json
+import os
+
+import pytest
+
+from mcp_admanager_ultimate.export import (
+    FORMAT_CSV,
+    FORMAT_NDJSON,
+    EntityExport,
+    checkpoint_path,
+    encode_page,
+)
+from mcp_admanager_ultimate.pagination import Page
+
+RECORDS = [{"id": i, "name": f"order_{i}", "budget": {"microAmount": i}} for i in range(7)]
+
+
+def _pages(records, size, start=0):
+    for number, offset in enumerate(range(start, len(records), size), 1):
+        end = offset + size
+        yield Page(records[offset:end], f"offset:{end}" if end < len(records) else None, number)
+
+
+def test_encode_page():
+    assert encode_page(RECORDS[:1], FORMAT_NDJSON, []) == \
+        b'{"id":0,"name":"order_0","budget":{"microAmount":0}}\n'
+    data = encode_page([{"id": 1, "name": "a,b", "budget": None}], FORMAT_CSV, ["id", "name", "budget"], header=True)
+    assert data == b'id,name,budget\n1,"a,b",\n'
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_interrupted_export_resumes_without_duplicates(tmp_path, compress):
+    path = str(tmp_path / "orders.csv")
+    fields = ["id", "name", "budget"]
+    export = EntityExport("order", path, FORMAT_CSV, compress, fields)
+    assert export.write_pages(_pages(RECORDS, 3), dict, max_rows=2) == 3
+    assert not export.completed
+    # 模拟写到一半时中断：检查点之后的残留内容在续传时被截断
+    with open(path, "ab") as f:
+        f.write(b"partial")
+
+    resumed = EntityExport.resume(path, "order", fields)
+    assert resumed.start_token == "offset:3"
+    assert resumed.write_pages(_pages(RECORDS, 3, start=3), dict) == 4
+    resumed.finish()
+    assert resumed.completed
+    assert not os.path.exists(checkpoint_path(path))
+
+    with open(path, "rb") as f:
+        data = f.read()
+    text = (gzip.decompress(data) if compress else data).decode("utf-8")
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert [int(r["id"]) for r in rows] == list(range(7))
+    assert json.loads(rows[6]["budget"]) == {"microAmount": 6}
+
+
+def test_resume_rejects_other_kind(tmp_path):
+    path = str(tmp_path / "orders.ndjson")
+    EntityExport("order", path).write_pages(_pages(RECORDS, 3), dict, max_rows=1)
+    with pytest.raises(ValueError):
+        EntityExport.resume(path, "line_item")
+
+
+@pytest.mark.parametrize("backend", ["legacy", "sdk"])
+def test_export_entities_tool_resumes(make_server, tmp_path, backend):
+    server = make_server(backend)
+    path = str(tmp_path / "orders.ndjson")
+
+    def export(**arguments):
+        return json.loads(server.handle_tools_call(
+            "export_entities", {"kind": "order", "path": path, "page_size": 4, **arguments}
+        )["content"][0]["text"])
+
+    first = export(max_rows=4)
+    assert first["success"] is True
+    assert (first["rows_written"], first["completed"]) == (4, False)
+    assert export()["success"] is False
+    second = export(resume=True)
+    assert second["completed"] is True
+    assert second["checkpoint"] is None
+
+    with open(path, encoding="utf-8") as f:
+        ids = [int(json.loads(line)["id"]) for line in f]
+    assert ids == [o["id"] for o in server.backend.entities["orders"]]
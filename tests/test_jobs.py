@@ -0,0 +1,104 @@
+import json
+import threading
+
+from mcp_admanager_ultimate.jobs import (
+    STATE_CANCELLED,
+    STATE_SUCCEEDED,
+    JobManager,
+    JobStore,
+    raise_if_cancelled,
+)
+
+
+def _response(payload):
+    return {"content": [{"type": "text", "text": json.dumps(payload)}]}
+
+
+def _payload(response):
+    return json.loads(response["content"][0]["text"])
+
+
+def _manager(run_tool, tmp_path):
+    return JobManager(JobStore(str(tmp_path / "jobs.sqlite3")), run_tool, workers=1)
+
+
+def test_job_finished_after_cancel_request_keeps_result(tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    def run_tool(tool, arguments):
+        started.set()
+        release.wait(5)
+        # 创建已经提交，之后不再检查取消标记
+        return _response({"success": True, "results": [{"index": 0, "success": True, "id": 1}]})
+
+    manager = _manager(run_tool, tmp_path)
+    job_id = manager.submit("manage_orders", {"action": "bulk_create"})["job_id"]
+    assert started.wait(5)
+    manager.cancel(job_id)
+    release.set()
+    result = manager.result(job_id, wait=5)
+    assert result["status"]["state"] == STATE_SUCCEEDED
+    assert result["status"]["cancel_requested"] is True
+    assert json.loads(result["result"]["content"][0]["text"])["results"][0]["id"] == 1
+
+
+def test_job_interrupted_by_cancel_is_cancelled(tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    def run_tool(tool, arguments):
+        started.set()
+        release.wait(5)
+        try:
+            raise_if_cancelled()
+        except Exception as e:
+            # 工具把异常转换为失败响应
+            return _response({"success": False, "error": str(e)})
+        return _response({"success": True})
+
+    manager = _manager(run_tool, tmp_path)
+    job_id = manager.submit("generate_report", {"report_type": "inventory"})["job_id"]
+    assert started.wait(5)
+    manager.cancel(job_id)
+    release.set()
+    status = manager.status(job_id, wait=5)
+    assert status["state"] == STATE_CANCELLED
+    assert status["error"] == "作业已取消"
+
+
+def test_queued_job_cancelled_before_running(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def run_tool(tool, arguments):
+        calls.append(arguments)
+        release.wait(5)
+        return _response({"success": True})
+
+    manager = _manager(run_tool, tmp_path)
+    first = manager.submit("generate_report", {"n": 1})["job_id"]
+    second = manager.submit("generate_report", {"n": 2})["job_id"]
+    assert manager.cancel(second)["state"] == STATE_CANCELLED
+    release.set()
+    assert manager.status(first, wait=5)["state"] == STATE_SUCCEEDED
+    assert calls == [{"n": 1}]
+
+
+def _tool_calls(server, tool, action):
+    rows = server.metrics.snapshot("tool_call").get("tool_call", [])
+    return sum(r["count"] for r in rows if r["labels"] == {"tool": tool, "action": action})
+
+
+def test_background_job_runs_outside_coalescing(make_server):
+    server = make_server()
+    arguments = {"action": "list", "max_items": 5}
+    before = _tool_calls(server, "manage_orders", "list")
+    job = _payload(server.handle_tools_call("manage_orders", {**arguments, "background": True}))["job"]
+    result = server.jobs.result(job["job_id"], wait=5)
+
+    assert result["status"]["state"] == STATE_SUCCEEDED
+    assert len(_payload(result["result"])["orders"]) == 5
+    # 作业不经过请求合并，也不再记录第二个 tool_call 指标
+    assert server.single_flight.stats()["executed"] == 0
+    assert _tool_calls(server, "manage_orders", "list") == before + 1
@@ -0,0 +1,38 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+
+class NoTokenCredentials:
+    """访问 identity 或 get_credentials 会换取令牌"""
+
+    configured_source = "/secrets/service-account.json"
+
+    @property
+    def identity(self):
+        raise AssertionError("计算缓存键不应加载凭据")
+
+    def get_credentials(self):
+        return None, None
+
+
+def test_network_today_resolves_time_zone_once(make_server):
+    server = make_server("sdk")
+    server.credential_manager = NoTokenCredentials()
+    assert server._cache_identity() == "/secrets/service-account.json:default"
+
+    today = server._network_today()
+    assert today == datetime.now(ZoneInfo("America/New_York")).date()
+    assert server.network_cache.time_zone(server._cache_identity()) == "America/New_York"
+    calls = server.backend.calls
+    server._network_today()
+    assert server.backend.calls == calls
+
+
+def test_failed_time_zone_lookup_is_not_repeated(make_server):
+    # 旧版库需要 GOOGLE_ADMANAGER_NETWORK_CODE，未设置时查询失败，回退到本地日期
+    server = make_server("legacy")
+    server.credential_manager = NoTokenCredentials()
+    server._network_today()
+    server._network_today()
+    assert server.backend.calls == 0
+    assert server.network_cache.stats()["misses"] == 1
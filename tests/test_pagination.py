@@ -0,0 +1,119 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from mcp_admanager_ultimate.pagination import (
+    MAX_PAGE_SIZE,
+    PqlPaginator,
+    SdkPaginator,
+    StatementPaginator,
+    decode_offset_token,
+    encode_offset_token,
+    normalize_page_size,
+)
+
+RECORDS = [{"id": i} for i in range(12)]
+
+
+class StatementBuilder:
+    limit = None
+    offset = None
+
+    def ToStatement(self):
+        return {"limit": self.limit, "offset": self.offset}
+
+
+def _by_statement(records, calls):
+    def fetch(statement):
+        calls.append((statement["offset"], statement["limit"]))
+        page = records[statement["offset"]:statement["offset"] + statement["limit"]]
+        return {"results": page, "totalResultSetSize": len(records)}
+    return fetch
+
+
+def test_offset_token_round_trip():
+    assert decode_offset_token(encode_offset_token(1500)) == 1500
+    assert decode_offset_token(None) == 0
+    for token in ("1500", "offset:", "offset:x", "offset:-1"):
+        with pytest.raises(ValueError):
+            decode_offset_token(token)
+
+
+def test_normalize_page_size():
+    assert normalize_page_size(5) == 5
+    assert normalize_page_size(MAX_PAGE_SIZE * 2) == MAX_PAGE_SIZE
+    with pytest.raises(ValueError):
+        normalize_page_size(0)
+
+
+def test_statement_paginator_resumes_mid_page():
+    calls = []
+    first = StatementPaginator(_by_statement(RECORDS, calls), StatementBuilder(), page_size=5, max_items=7)
+    items = list(first.items())
+    # 最后一页只请求剩余的数量，游标正好接在第7条之后
+    assert calls == [(0, 5), (5, 2)]
+    assert first.next_page_token == "offset:7"
+
+    rest = StatementPaginator(_by_statement(RECORDS, calls), StatementBuilder(), page_size=5,
+                              page_token=first.next_page_token)
+    items += list(rest.items())
+    assert items == RECORDS
+    assert rest.next_page_token is None
+    assert rest.pages_fetched == 1
+
+
+def test_statement_paginator_stops_at_total():
+    calls = []
+    paginator = StatementPaginator(_by_statement(RECORDS, calls), StatementBuilder(), page_size=6)
+    assert [len(page.items) for page in paginator] == [6, 6]
+    assert paginator.next_page_token is None
+    assert len(calls) == 2
+
+
+def test_pql_paginator_converts_rows():
+    rows = [{"values": [{"value": str(i)}]} for i in range(3)]
+
+    def select(statement):
+        page = rows[statement["offset"]:statement["offset"] + statement["limit"]]
+        return {"columnTypes": [{"labelName": "id"}], "rows": page}
+
+    paginator = PqlPaginator(select, StatementBuilder(), lambda v: int(v["value"]), page_size=2)
+    assert list(paginator.items()) == [{"id": 0}, {"id": 1}, {"id": 2}]
+    assert paginator.pages_fetched == 2
+
+
+def test_sdk_paginator_passes_tokens():
+    requests = []
+
+    def list_method(request):
+        requests.append(request)
+        start = int(request.get("page_token", 0))
+        end = start + request["page_size"]
+        return SimpleNamespace(orders=RECORDS[start:end],
+                               next_page_token=str(end) if end < len(RECORDS) else "")
+
+    paginator = SdkPaginator(list_method, {"parent": "networks/1"}, "orders", page_size=5, max_items=8)
+    assert list(paginator.items()) == RECORDS[:8]
+    assert paginator.next_page_token == "8"
+    assert [r.get("page_token") for r in requests] == [None, "5"]
+    assert requests[1] == {"parent": "networks/1", "page_size": 3, "page_token": "5"}
+
+
+@pytest.mark.parametrize("backend", ["legacy", "sdk"])
+def test_list_action_resumes_with_next_page_token(make_server, backend):
+    server = make_server(backend)
+    all_ids = [o["id"] for o in server.backend.entities["orders"]]
+    seen = []
+    token = None
+    while True:
+        arguments = {"action": "list", "page_size": 3, "max_items": 4}
+        if token:
+            arguments["page_token"] = token
+        result = json.loads(server.handle_tools_call("manage_orders", arguments)["content"][0]["text"])
+        assert result["success"] is True
+        seen += [int(o["id"]) for o in result["orders"]]
+        token = result["next_page_token"]
+        if not token:
+            break
+    assert seen == all_ids
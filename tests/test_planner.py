@@ -0,0 +1,102 @@
+import threading
+
+from mcp_admanager_ultimate.planner import ReportPlanner, ReportRequest, project_all, project_rows
+
+ROWS = [
+    {"Dimension.DATE": "2024-03-01", "Dimension.AD_UNIT_NAME": "a", "Dimension.AD_UNIT_ID": 1,
+     "Column.AD_SERVER_CLICKS": 1, "Column.AD_SERVER_IMPRESSIONS": 10},
+    {"Dimension.DATE": "2024-03-02", "Dimension.AD_UNIT_NAME": "a", "Dimension.AD_UNIT_ID": 1,
+     "Column.AD_SERVER_CLICKS": 2, "Column.AD_SERVER_IMPRESSIONS": 20},
+]
+
+
+def _request(dimensions, columns):
+    return ReportRequest(dimensions, columns, "2024-03-01", "2024-03-02")
+
+
+def test_single_request_does_not_wait():
+    sleeps = []
+    planner = ReportPlanner(window=0.1, sleep=sleeps.append)
+    job, rows, merged = planner.execute(
+        _request(["AD_UNIT_NAME"], ["AD_SERVER_CLICKS"]), lambda request: ({"id": 1}, iter(ROWS))
+    )
+    assert sleeps == []
+    assert merged == 1
+    assert list(rows) == [
+        {"Dimension.AD_UNIT_NAME": "a", "Dimension.AD_UNIT_ID": 1, "Column.AD_SERVER_CLICKS": 1},
+        {"Dimension.AD_UNIT_NAME": "a", "Dimension.AD_UNIT_ID": 1, "Column.AD_SERVER_CLICKS": 2},
+    ]
+
+
+def test_merged_and_single_paths_return_the_same_columns():
+    single = next(project_rows(ROWS, ["AD_UNIT_NAME"], ["AD_SERVER_CLICKS"]))
+    assert single == {"Dimension.AD_UNIT_NAME": "a", "Dimension.AD_UNIT_ID": 1, "Column.AD_SERVER_CLICKS": 3}
+
+
+def test_projections_are_built_in_one_streaming_pass():
+    consumed = []
+
+    def stream():
+        for row in ROWS:
+            consumed.append(row)
+            yield row
+
+    requests = [_request(["DATE"], ["AD_SERVER_CLICKS"]), _request(["AD_UNIT_NAME"], ["AD_SERVER_IMPRESSIONS"])]
+    by_date, by_unit = project_all(stream(), requests)
+    assert len(consumed) == len(ROWS)
+    assert list(by_date.rows()) == [
+        {"Dimension.DATE": "2024-03-01", "Column.AD_SERVER_CLICKS": 1},
+        {"Dimension.DATE": "2024-03-02", "Column.AD_SERVER_CLICKS": 2},
+    ]
+    assert list(by_unit.rows()) == [
+        {"Dimension.AD_UNIT_NAME": "a", "Dimension.AD_UNIT_ID": 1, "Column.AD_SERVER_IMPRESSIONS": 30}
+    ]
+
+
+def test_requests_arriving_while_one_runs_are_merged():
+    release = threading.Event()
+    second_waiting = threading.Event()
+    upstream = []
+
+    def run(request):
+        upstream.append(request)
+        if len(upstream) == 1:
+            release.wait(5)
+        return {"id": len(upstream)}, iter(ROWS)
+
+    def sleep(seconds):
+        second_waiting.set()
+        third.start()
+        while not planner.stats()["merged"]:
+            threading.Event().wait(0.01)
+
+    planner = ReportPlanner(window=0.1, sleep=sleep)
+    results = {}
+
+    def call(name, dimensions, columns):
+        job, rows, merged = planner.execute(_request(dimensions, columns), run)
+        results[name] = (job, list(rows), merged)
+
+    first = threading.Thread(target=call, args=("first", ["DATE"], ["AD_SERVER_IMPRESSIONS"]))
+    third = threading.Thread(target=call, args=("third", ["DATE"], ["AD_SERVER_CLICKS"]))
+    first.start()
+    while not upstream:
+        threading.Event().wait(0.01)
+    # 第一个请求在运行时到达的请求等待窗口，第三个请求在窗口内加入
+    call("second", ["AD_UNIT_NAME"], ["AD_SERVER_IMPRESSIONS"])
+    release.set()
+    first.join(5)
+    third.join(5)
+
+    assert second_waiting.is_set()
+    assert len(upstream) == 2
+    assert results["first"][2] == 1
+    assert results["second"][2] == results["third"][2] == 2
+    assert results["second"][1] == [
+        {"Dimension.AD_UNIT_NAME": "a", "Dimension.AD_UNIT_ID": 1, "Column.AD_SERVER_IMPRESSIONS": 30}
+    ]
+    assert results["third"][1] == [
+        {"Dimension.DATE": "2024-03-01", "Column.AD_SERVER_CLICKS": 1},
+        {"Dimension.DATE": "2024-03-02", "Column.AD_SERVER_CLICKS": 2},
+    ]
+    assert planner.stats()["upstream_jobs"] == 2
@@ -0,0 +1,96 @@
+from datetime import date, timedelta
+
+import pytest
+
+from mcp_admanager_ultimate.rollups import (
+    GRANULARITY_DAY,
+    GRANULARITY_MONTH,
+    GRANULARITY_WEEK,
+    RollupMaterializer,
+    RollupStore,
+    contiguous_spans,
+)
+
+TODAY = date(2024, 3, 10)
+
+
+def _materializer(refetch_interval=900):
+    requests = []
+
+    def run_report(request):
+        requests.append((request.start_date, request.end_date))
+        start, end = date.fromisoformat(request.start_date), date.fromisoformat(request.end_date)
+        rows = []
+        for i in range((end - start).days + 1):
+            day = start + timedelta(days=i)
+            for unit in ("a", "b"):
+                rows.append({"Dimension.DATE": day.isoformat(), "Dimension.AD_UNIT_NAME": unit,
+                             "Column.AD_SERVER_CLICKS": day.day, "Column.AD_SERVER_IMPRESSIONS": 10})
+        return {"id": len(requests)}, iter(rows)
+
+    materializer = RollupMaterializer(RollupStore(":memory:"), run_report, lambda: TODAY,
+                                      final_after_days=3, refetch_interval=refetch_interval,
+                                      refresh_interval=0)
+    materializer.define("units", ["AD_UNIT_NAME"], ["AD_SERVER_CLICKS", "AD_SERVER_IMPRESSIONS"], [],
+                        trailing_days=7)
+    return materializer, requests
+
+
+def test_contiguous_spans():
+    days = ["2024-03-05", "2024-03-01", "2024-03-02", "2024-03-03", "2024-03-07"]
+    assert contiguous_spans(days) == [("2024-03-01", "2024-03-03"), ("2024-03-05", "2024-03-05"),
+                                      ("2024-03-07", "2024-03-07")]
+    assert contiguous_spans(days[1:4], max_days=2) == [("2024-03-01", "2024-03-02"), ("2024-03-03", "2024-03-03")]
+
+
+def test_define_rejects_unsupported_views():
+    materializer, _ = _materializer()
+    with pytest.raises(ValueError):
+        materializer.define("by_day", ["DATE"], ["AD_SERVER_CLICKS"], [])
+    with pytest.raises(ValueError):
+        materializer.define("ctr", ["AD_UNIT_NAME"], ["AD_SERVER_CTR"], [])
+
+
+def test_refresh_fetches_only_missing_days():
+    materializer, requests = _materializer()
+    result = materializer.query("units")
+    assert (result["start_date"], result["end_date"]) == ("2024-03-04", "2024-03-10")
+    assert result["fetched_days"] == 7
+    assert requests == [("2024-03-04", "2024-03-10")]
+
+    assert materializer.query("units")["fetched_days"] == 0
+    materializer.query("units", "2024-03-01", "2024-03-10")
+    assert requests[1:] == [("2024-03-01", "2024-03-03")]
+    assert materializer.stats()["views"]["units"]["final_days"] == 6
+
+
+def test_only_recent_days_are_refetched():
+    materializer, requests = _materializer(refetch_interval=0)
+    materializer.refresh("units")
+    refreshed = materializer.refresh("units")
+    # 早于今天3天的日期已最终确定，只重新拉取最近的日期
+    assert refreshed["fetched_days"] == 4
+    assert requests[1] == ("2024-03-07", "2024-03-10")
+
+
+def test_query_aggregates_locally():
+    materializer, requests = _materializer()
+    total = materializer.query("units", "2024-03-01", "2024-03-10")
+    assert total["rows"] == [
+        {"Dimension.AD_UNIT_NAME": "a", "Column.AD_SERVER_CLICKS": 55, "Column.AD_SERVER_IMPRESSIONS": 100},
+        {"Dimension.AD_UNIT_NAME": "b", "Column.AD_SERVER_CLICKS": 55, "Column.AD_SERVER_IMPRESSIONS": 100},
+    ]
+    assert total["totals"] == {"Column.AD_SERVER_CLICKS": 110, "Column.AD_SERVER_IMPRESSIONS": 200}
+    jobs = len(requests)
+
+    weeks = materializer.query("units", "2024-03-01", "2024-03-10", GRANULARITY_WEEK)
+    assert [(r["period"], r["Column.AD_SERVER_CLICKS"]) for r in weeks["rows"] if r["Dimension.AD_UNIT_NAME"] == "a"] == [
+        ("2024-02-26", 1 + 2 + 3), ("2024-03-04", sum(range(4, 11)))
+    ]
+    months = materializer.query("units", "2024-03-01", "2024-03-10", GRANULARITY_MONTH, limit=1)
+    assert months["rows"] == [{"period": "2024-03", "Dimension.AD_UNIT_NAME": "a",
+                               "Column.AD_SERVER_CLICKS": 55, "Column.AD_SERVER_IMPRESSIONS": 100}]
+    assert months["next_offset"] == 1
+    days = materializer.query("units", "2024-03-09", "2024-03-10", GRANULARITY_DAY)
+    assert days["total_groups"] == 4
+    assert len(requests) == jobs
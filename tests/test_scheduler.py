@@ -0,0 +1,93 @@
+import pytest
+
+from mcp_admanager_ultimate.scheduler import RequestScheduler, is_read_method, is_retryable
+
+
+class Timeout(Exception):
+    pass
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+class HttpError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+@pytest.mark.parametrize("method, read", [
+    ("getAdUnitsByStatement", True),
+    ("getReportDownloadURL", True),
+    ("list_line_items", True),
+    ("select", True),
+    ("createOrders", False),
+    ("createLineItems", False),
+    ("runReportJob", False),
+    ("create_order", False),
+    ("run_report_job", False),
+])
+def test_is_read_method(method, read):
+    assert is_read_method(method) is read
+
+
+@pytest.mark.parametrize("error", [
+    Timeout(),
+    ConnectionResetError(),
+    HttpError(503),
+    Exception("[ServerError.SERVER_ERROR @ ]"),
+])
+def test_transient_errors_retry_only_read_methods(error):
+    assert is_retryable(error, "getOrdersByStatement")
+    assert is_retryable(error, "list_orders")
+    assert not is_retryable(error, "createOrders")
+    assert not is_retryable(error, "createLineItems")
+    assert not is_retryable(error, "runReportJob")
+    assert not is_retryable(error, "create_line_item")
+
+
+@pytest.mark.parametrize("error", [
+    ResourceExhausted(),
+    HttpError(429),
+    Exception("[QuotaError.EXCEEDED_QUOTA @ ]"),
+])
+def test_rejected_requests_retry_mutations(error):
+    assert is_retryable(error, "createOrders")
+    assert is_retryable(error, "getOrdersByStatement")
+
+
+def test_non_transient_errors_are_not_retried():
+    error = Exception("[RequiredError.REQUIRED @ name]")
+    assert not is_retryable(error, "getOrdersByStatement")
+    assert not is_retryable(error, "createOrders")
+
+
+def test_scheduler_does_not_resend_timed_out_create():
+    scheduler = RequestScheduler(network_rate=1000, network_burst=100, service_rate=1000,
+                                 service_burst=100, sleep=lambda delay: None)
+    calls = []
+
+    def createOrders(orders):
+        calls.append(orders)
+        raise Timeout()
+
+    with pytest.raises(Timeout):
+        scheduler.call_method("OrderService", "1", "createOrders", createOrders, [{"name": "a"}])
+    assert len(calls) == 1
+
+
+def test_scheduler_retries_timed_out_read():
+    scheduler = RequestScheduler(network_rate=1000, network_burst=100, service_rate=1000,
+                                 service_burst=100, sleep=lambda delay: None)
+    calls = []
+
+    def getOrdersByStatement(statement):
+        calls.append(statement)
+        if len(calls) < 3:
+            raise Timeout()
+        return {"results": []}
+
+    assert scheduler.call_method("OrderService", "1", "getOrdersByStatement",
+                                 getOrdersByStatement, {}) == {"results": []}
+    assert len(calls) == 3
@@ -0,0 +1,81 @@
+import pytest
+
+from mcp_admanager_ultimate.sharding import (
+    check_additive,
+    is_additive,
+    merge_shard_rows,
+    split_date_range,
+)
+
+
+def test_split_by_week_aligns_to_monday():
+    assert split_date_range("2024-01-03", "2024-01-16", "week") == [
+        ("2024-01-03", "2024-01-07"),
+        ("2024-01-08", "2024-01-14"),
+        ("2024-01-15", "2024-01-16"),
+    ]
+
+
+def test_split_by_month_handles_year_end():
+    assert split_date_range("2023-12-15", "2024-02-10", "month") == [
+        ("2023-12-15", "2023-12-31"),
+        ("2024-01-01", "2024-01-31"),
+        ("2024-02-01", "2024-02-10"),
+    ]
+
+
+def test_split_single_day():
+    assert split_date_range("2024-03-01", "2024-03-01", "day") == [("2024-03-01", "2024-03-01")]
+
+
+@pytest.mark.parametrize("start, end, granularity", [
+    ("2024-02-01", "2024-01-01", "day"),
+    ("2024-01-01", None, "day"),
+    ("2024-01-01", "2024-01-02", "year"),
+    ("2024/01/01", "2024-01-02", "day"),
+    ("2020-01-01", "2024-01-01", "day"),
+])
+def test_split_rejects_invalid_ranges(start, end, granularity):
+    with pytest.raises(ValueError):
+        split_date_range(start, end, granularity)
+
+
+def test_merge_sums_metrics_by_dimension_and_sorts():
+    shards = [
+        {"columns": ["Dimension.AD_UNIT_ID", "Column.AD_SERVER_IMPRESSIONS"],
+         "rows": [[2, 10], [1, 5]]},
+        {"columns": ["Dimension.AD_UNIT_ID", "Column.AD_SERVER_IMPRESSIONS"],
+         "rows": [[1, 7], [3, None]]},
+    ]
+    merged = merge_shard_rows(shards)
+    assert list(merged.rows()) == [
+        {"Dimension.AD_UNIT_ID": 1, "Column.AD_SERVER_IMPRESSIONS": 12},
+        {"Dimension.AD_UNIT_ID": 2, "Column.AD_SERVER_IMPRESSIONS": 10},
+        {"Dimension.AD_UNIT_ID": 3, "Column.AD_SERVER_IMPRESSIONS": None},
+    ]
+
+
+def test_merge_ignores_empty_shards():
+    shards = [{"columns": [], "rows": []},
+              {"columns": ["Dimension.DATE", "Column.AD_SERVER_CLICKS"], "rows": [["2024-01-01", 3]]}]
+    assert merge_shard_rows(shards).to_dict() == {
+        "columns": ["Dimension.DATE", "Column.AD_SERVER_CLICKS"],
+        "rows": [["2024-01-01", 3]],
+    }
+
+
+@pytest.mark.parametrize("column, additive", [
+    ("AD_SERVER_IMPRESSIONS", True),
+    ("AD_SERVER_CPM_AND_CPC_REVENUE", True),
+    ("AD_SERVER_CTR", False),
+    ("AD_SERVER_AVERAGE_ECPM", False),
+    ("UNIQUE_REACH", False),
+])
+def test_is_additive(column, additive):
+    assert is_additive(column) is additive
+
+
+def test_check_additive_rejects_ratio_columns():
+    check_additive(["AD_SERVER_IMPRESSIONS", "AD_SERVER_CLICKS"])
+    with pytest.raises(ValueError, match="AD_SERVER_CTR"):
+        check_additive(["AD_SERVER_IMPRESSIONS", "AD_SERVER_CTR"])